@@ -3,13 +3,24 @@
 python 3.7以上を要求
 """
 
+import argparse
+import functools
 import json
+import os
 import sys
+import time
 
 import my_mod.load_db
 import my_mod.cmd_def
 import my_mod.tlm_def
+import my_mod.tlm_decoder
+import my_mod.tlm_layout
 import my_mod.tlm_buffer
+import my_mod.manifest
+import my_mod.task_graph
+import my_mod.db_fingerprint
+import my_mod.db_watcher
+import my_mod.util
 
 
 # import pprint
@@ -23,31 +34,318 @@ DEBUG = 0
 # 0 : Release
 # 1 : all
 SETTING_FILE_PATH = "settings.json"
+MANIFEST_FILE_PATH = "codegen_manifest.json"
 
 
 def main():
-    with open(SETTING_FILE_PATH, mode="r") as fh:
-        settings = json.load(fh)
+    args = ParseArgs_()
+
+    if args.watch:
+        Watch_(args)
+        sys.exit(0)
+
+    settings = LoadSettings_()
     # print(settings["path_to_src"]);
 
-    cmd_db = my_mod.load_db.LoadCmdDb(settings)
-    tlm_db = my_mod.load_db.LoadTlmDb(settings)
-    # pprint.pprint(cmd_db)
-    # pprint.pprint(tlm_db)
-    # print(tlm_db)
+    if args.force:
+        manifest = my_mod.manifest.CreateManifest()
+    else:
+        manifest = my_mod.manifest.LoadManifest(MANIFEST_FILE_PATH)
 
-    my_mod.cmd_def.GenerateCmdDef(settings, cmd_db["sgc"])
-    my_mod.cmd_def.GenerateBctDef(settings, cmd_db["bct"])
-    my_mod.tlm_def.GenerateTlmDef(settings, tlm_db["tlm"])
+    # 入力が変化した generator のみ再実行する
+    generators = SelectOutdatedGenerators_(settings, manifest, ListGenerators_(settings))
+    errors = RunGenerators_(
+        settings,
+        manifest,
+        generators,
+        {
+            "cmd": functools.partial(my_mod.load_db.LoadCmdDb, settings),
+            "tlm": functools.partial(my_mod.load_db.LoadTlmDb, settings),
+        },
+    )
 
-    if settings["is_main_obc"]:
-        my_mod.cmd_def.GenerateOtherObcCmdDef(settings, cmd_db["other_obc"])
-        my_mod.tlm_def.GenerateOtherObcTlmDef(settings, tlm_db["other_obc"])
-        my_mod.tlm_buffer.GenerateTlmBuffer(settings, tlm_db["other_obc"])
+    my_mod.manifest.SaveManifest(MANIFEST_FILE_PATH, manifest)
+    my_mod.db_fingerprint.SaveCache()
 
-    print("Completed!")
+    if errors:
+        ReportErrors_(errors)
+        sys.exit(1)
+
+    print("Completed! (" + str(len(generators)) + " generator(s) executed)")
     sys.exit(0)
 
 
+def ParseArgs_():
+    parser = argparse.ArgumentParser(description="tlm-cmd-db から C2A のコードを生成する")
+    parser.add_argument("--force", action="store_true", help="manifest を無視してすべてのファイルを再生成する")
+    parser.add_argument(
+        "--watch", action="store_true", help="tlm-cmd-db を監視し，CSV が変化するたびに該当するファイルのみ再生成する"
+    )
+    parser.add_argument("--interval", type=float, default=0.2, help="--watch での監視間隔 [s]（デフォルト 0.2）")
+    return parser.parse_args()
+
+
+def LoadSettings_():
+    with open(SETTING_FILE_PATH, mode="r") as fh:
+        return json.load(fh)
+
+
+def Watch_(args):
+    # パース済みの DB をメモリ上に保持し，CSV が変化するたびに，変化した CSV のみ再パースして，
+    # 入力ハッシュが manifest と異なる generator のみ再実行する．settings.json が変化した場合は DB を読み直す
+    # 失敗した generator は manifest に記録されないので，次の変更時に再実行される
+    if args.force:
+        manifest = my_mod.manifest.CreateManifest()
+    else:
+        manifest = my_mod.manifest.LoadManifest(MANIFEST_FILE_PATH)
+
+    settings = LoadSettings_()  # settings.json が無い場合などは，ここで終了する
+    settings_stat = None
+    watcher = None
+    is_db_loaded = False  # False の場合は，CSV の変化を待たずに生成する
+    # 前回 CSV のパースに失敗したときの Scan の結果．CSV がさらに変化するまで再パースしない
+    failed_stats = None
+
+    print("Watching tlm-cmd-db... (Ctrl+C で終了)")
+    try:
+        while True:
+            try:
+                stat = os.stat(SETTING_FILE_PATH)
+                if settings_stat != (stat.st_size, stat.st_mtime_ns):
+                    settings_stat = (stat.st_size, stat.st_mtime_ns)
+                    settings = LoadSettings_()
+                    watcher = my_mod.db_watcher.DbWatcher(settings)
+                    is_db_loaded = False
+
+                stats = watcher.Scan()
+                if is_db_loaded:
+                    if not watcher.GetChangedPaths(stats) or stats == failed_stats:
+                        time.sleep(args.interval)
+                        continue
+                    # CSV の出力途中で読まないように，変化が落ち着くまで待つ
+                    while True:
+                        time.sleep(args.interval)
+                        next_stats = watcher.Scan()
+                        if next_stats == stats:
+                            break
+                        stats = next_stats
+
+                start = time.perf_counter()
+                failed_stats = stats
+                watcher.Update(stats)
+                failed_stats = None
+                # GetDbHash のメモ化を破棄する（生成ファイルのヘッダに最新の MD5 を出力するため）
+                my_mod.db_fingerprint.ClearCache()
+
+                # 差分生成と同じ入力ハッシュで判定する（ヘッダに出力する DB 全体の MD5 なども入力に含まれる）
+                generators = SelectOutdatedGenerators_(
+                    settings, manifest, ListGenerators_(settings)
+                )
+                is_db_loaded = True
+
+                errors = RunGenerators_(
+                    settings,
+                    manifest,
+                    generators,
+                    {"cmd": watcher.GetCmdDb, "tlm": watcher.GetTlmDb},
+                )
+                my_mod.manifest.SaveManifest(MANIFEST_FILE_PATH, manifest)
+                my_mod.db_fingerprint.SaveCache()
+
+                if errors:
+                    ReportErrors_(errors)
+                print(
+                    "Regenerated: "
+                    + (", ".join(generator["key"] for generator, _ in generators) or "(none)")
+                    + " ("
+                    + str(round((time.perf_counter() - start) * 1000))
+                    + " ms)"
+                )
+            except SystemExit:
+                pass  # DB の不整合など．メッセージは出力済みなので，次の変更を待つ
+            except Exception as e:
+                print("Error: " + repr(e), file=sys.stderr)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def SelectOutdatedGenerators_(settings, manifest, all_generators):
+    # 戻り値: [(generator, input_hash)]．manifest 上で最新でない generator のみ
+    generators = []
+    for generator in all_generators:
+        input_hash = my_mod.manifest.CalcInputHash(
+            settings, generator["key"], generator["input_files"], generator["note_inputs"]
+        )
+        if my_mod.manifest.IsUpToDate(manifest, settings, generator["key"], input_hash):
+            continue
+        generators.append((generator, input_hash))
+    return generators
+
+
+def RunGenerators_(settings, manifest, generators, db_loaders):
+    # generators: [(generator, input_hash)]
+    # db_loaders: {"cmd" or "tlm": DB を返す関数}
+    # 戻り値:     失敗したタスクの [(タスク名, 例外)]
+    # DB の読み込みと各 generator をタスクグラフとして worker pool で実行する
+    # generator は (OBC, 生成物) ごとに独立しているので，並列に実行できる
+    tasks = {}
+    for db, load_db in db_loaders.items():
+        if any(generator["db"] == db for generator, _ in generators):
+            tasks["db:" + db] = {"deps": [], "func": functools.partial(LoadDb_, load_db)}
+    for generator, _ in generators:
+        tasks[generator["key"]] = {
+            "deps": ["db:" + generator["db"]],
+            "func": functools.partial(RunGenerator_, generator, settings),
+        }
+    results, errors = my_mod.task_graph.RunTasks(tasks, settings.get("num_workers", 1))
+
+    # 失敗した generator は manifest に記録しない（次回再実行される）
+    for generator, input_hash in generators:
+        if generator["key"] in results:
+            outputs = results[generator["key"]]
+            my_mod.manifest.RecordGenerator(
+                manifest, settings, generator["key"], input_hash, outputs
+            )
+    return errors
+
+
+def ReportErrors_(errors):
+    for name, e in errors:
+        if isinstance(e, my_mod.util.GenerateError):
+            print("Error: " + str(e) + " (" + name + ")", file=sys.stderr)
+        elif not isinstance(e, SystemExit):  # sys.exit の場合，メッセージは出力済み
+            print("Error: " + repr(e) + " (" + name + ")", file=sys.stderr)
+    print(
+        "Error: " + str(len(errors)) + " task(s) failed: " + ", ".join(n for n, _ in errors),
+        file=sys.stderr,
+    )
+
+
+def LoadDb_(load_db, dep_results):
+    return load_db()
+
+
+def RunGenerator_(generator, settings, dep_results):
+    # 戻り値: generator が出力したファイルの {ファイルパス: MD5}
+    with my_mod.util.RecordOutputs() as outputs:
+        generator["func"](settings, dep_results["db:" + generator["db"]])
+    return outputs
+
+
+def ListGenerators_(settings):
+    # key:         manifest のキー兼タスク名
+    # db:          generator が必要とする DB ("cmd" or "tlm")
+    # input_files: generator の入力となる CSV（これらと settings が変化しない限り再生成しない）
+    # note_inputs: 生成ファイルのヘッダに出力される DB 全体の MD5 など（input_files と同様に入力とする）
+    cmd_db_path = settings["path_to_db"] + r"CMD_DB/"
+    tlm_db_path = settings["path_to_db"] + r"TLM_DB/calced_data/"
+    sgc_db_path, bct_db_path = my_mod.load_db.GetCmdCsvPaths(cmd_db_path, settings["db_prefix"])
+    note_inputs = my_mod.util.GetSettingNoteInputs(settings["path_to_db"], False)
+
+    generators = [
+        {
+            "key": "cmd_def",
+            "db": "cmd",
+            "input_files": [sgc_db_path],
+            "note_inputs": note_inputs,
+            "func": lambda settings, db: my_mod.cmd_def.GenerateCmdDef(settings, db["sgc"]),
+        },
+        {
+            "key": "bct_def",
+            "db": "cmd",
+            "input_files": [bct_db_path],
+            "note_inputs": note_inputs,
+            "func": lambda settings, db: my_mod.cmd_def.GenerateBctDef(settings, db["bct"]),
+        },
+        {
+            "key": "tlm_def",
+            "db": "tlm",
+            "input_files": my_mod.load_db.GetTlmCsvPaths(tlm_db_path, settings["db_prefix"]),
+            "note_inputs": note_inputs,
+            "func": lambda settings, db: my_mod.tlm_def.GenerateTlmDef(settings, db["tlm"]),
+        },
+    ]
+
+    if "tlm_layout_report_path" in settings:
+        generators.append(
+            {
+                "key": "tlm_layout_report",
+                "db": "tlm",
+                "input_files": my_mod.load_db.GetTlmCsvPaths(tlm_db_path, settings["db_prefix"]),
+                "note_inputs": [],  # ヘッダを出力しない
+                "func": lambda settings, db: my_mod.tlm_layout.GenerateTlmLayoutReport(
+                    settings, db["tlm"]
+                ),
+            }
+        )
+
+    if "tlm_decoder_path" in settings:
+        generators.append(
+            {
+                "key": "tlm_decoder",
+                "db": "tlm",
+                "input_files": my_mod.load_db.GetTlmCsvPaths(tlm_db_path, settings["db_prefix"]),
+                "note_inputs": note_inputs,
+                "func": lambda settings, db: my_mod.tlm_decoder.GenerateTlmDecoder(
+                    settings, db["tlm"]
+                ),
+            }
+        )
+
+    if not settings["is_main_obc"]:
+        return generators
+
+    for i in range(len(settings["other_obc_data"])):
+        if not settings["other_obc_data"][i]["is_enable"]:
+            continue
+        generators += ListOtherObcGenerators_(settings, i)
+
+    return generators
+
+
+def ListOtherObcGenerators_(settings, obc_idx):
+    # 他 OBC の generator は OBC ごとに分け，key は "生成物/OBC 名" とする
+    other_obc_settings = settings["other_obc_data"][obc_idx]
+    obc_name = other_obc_settings["name"]
+    other_obc_sgc_db_path, _ = my_mod.load_db.GetCmdCsvPaths(
+        other_obc_settings["path_to_db"] + r"CMD_DB/", other_obc_settings["db_prefix"]
+    )
+    other_obc_tlm_db_paths = my_mod.load_db.GetTlmCsvPaths(
+        other_obc_settings["path_to_db"] + r"TLM_DB/calced_data/", other_obc_settings["db_prefix"]
+    )
+    note_inputs = my_mod.util.GetSettingNoteInputs(other_obc_settings["path_to_db"], True)
+
+    return [
+        {
+            "key": "other_obc_cmd_def/" + obc_name,
+            "db": "cmd",
+            "input_files": [other_obc_sgc_db_path],
+            "note_inputs": note_inputs,
+            "func": lambda settings, db: my_mod.cmd_def.GenerateOtherObcCmdDefOfObc(
+                settings, obc_idx, db["other_obc"][obc_name]
+            ),
+        },
+        {
+            "key": "other_obc_tlm_def/" + obc_name,
+            "db": "tlm",
+            "input_files": other_obc_tlm_db_paths,
+            "note_inputs": note_inputs,
+            "func": lambda settings, db: my_mod.tlm_def.GenerateOtherObcTlmDefOfObc(
+                settings, obc_idx, db["other_obc"][obc_name]
+            ),
+        },
+        {
+            "key": "tlm_buffer/" + obc_name,
+            "db": "tlm",
+            "input_files": other_obc_tlm_db_paths,
+            "note_inputs": note_inputs,
+            "func": lambda settings, db: my_mod.tlm_buffer.GenerateTlmBufferOfObc(
+                settings, obc_idx, db["other_obc"][obc_name]
+            ),
+        },
+    ]
+
+
 if __name__ == "__main__":
     main()
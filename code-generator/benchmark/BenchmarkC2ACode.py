@@ -0,0 +1,263 @@
+# coding: UTF-8
+"""
+code-generator のベンチマーク
+synthetic_db で生成した DB に対して，各ステージ（ハッシュ計算，DB の読み込み，各 generator）の
+実行時間とピークメモリを計測し，結果を JSON で出力する
+python 3.8以上を要求
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# my_mod を import するため
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import my_mod.cmd_def  # noqa: E402
+import my_mod.db_fingerprint  # noqa: E402
+import my_mod.load_db  # noqa: E402
+import my_mod.tlm_buffer  # noqa: E402
+import my_mod.tlm_def  # noqa: E402
+
+import synthetic_db  # noqa: E402
+
+RESULT_VERSION = 1
+MAIN_DB_PREFIX = "BENCH_MOBC"
+
+
+def main():
+    args = ParseArgs_()
+
+    work_dir = args.work_dir
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix="c2a_codegen_bench_")
+    work_dir = os.path.abspath(work_dir).replace("\\", "/") + "/"
+
+    try:
+        settings = SetupWorkDir_(work_dir, args)
+        stages = ListStages_(settings)
+        result = RunBenchmark_(stages, args.repeat)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    result = {
+        "version": RESULT_VERSION,
+        "params": {
+            "cmd_num": args.cmd_num,
+            "tlm_num": args.tlm_num,
+            "field_num": args.field_num,
+            "sub_obc_num": args.sub_obc_num,
+            "repeat": args.repeat,
+            "num_workers": args.num_workers,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "stages": result,
+    }
+
+    PrintResult_(result)
+    if args.output is not None:
+        with open(args.output, mode="w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+
+
+def ParseArgs_():
+    parser = argparse.ArgumentParser(description="code-generator のベンチマーク")
+    parser.add_argument("--cmd-num", type=int, default=2000, help="OBC ごとのコマンド数")
+    parser.add_argument("--tlm-num", type=int, default=64, help="OBC ごとのテレメ数（最大 256）")
+    parser.add_argument("--field-num", type=int, default=100, help="テレメごとの要素数")
+    parser.add_argument("--sub-obc-num", type=int, default=2, help="sub OBC の数")
+    parser.add_argument("--repeat", type=int, default=5, help="各ステージの計測回数")
+    parser.add_argument(
+        "--num-workers", type=int, default=1, help="settings の num_workers（0 の場合は CPU 数）"
+    )
+    parser.add_argument("--output", help="結果の JSON の出力先")
+    parser.add_argument("--work-dir", help="DB と生成コードの出力先（省略時は一時ディレクトリを使い，終了時に削除）")
+    return parser.parse_args()
+
+
+def SetupWorkDir_(work_dir, args):
+    # 戻り値: GenerateC2ACode.py と同じ形式の settings
+    settings = CreateObcSettings_(work_dir, MAIN_DB_PREFIX)
+    settings["path_to_src"] = work_dir + "src/"
+    settings["is_main_obc"] = 1
+    settings["num_workers"] = args.num_workers
+    # 毎回 CSV をパースするステージを計測するため，スナップショットは使わない
+    settings["is_db_snapshot_enabled"] = 0
+    settings["other_obc_data"] = []
+    for i in range(args.sub_obc_num):
+        name = "BOBC" + str(i)
+        other_obc_settings = CreateObcSettings_(work_dir, "BENCH_" + name)
+        other_obc_settings.update(
+            {
+                "name": name,
+                "is_enable": 1,
+                "max_tlm_num": synthetic_db.MAX_TLM_NUM,
+                "driver_path": "bench/",
+                "driver_type": name + "_Driver",
+                "driver_name": name.lower() + "_driver",
+                "code_when_tlm_not_found": "// TLM NOT FOUND",
+            }
+        )
+        settings["other_obc_data"].append(other_obc_settings)
+
+    os.makedirs(settings["path_to_src"] + "src_user/tlm_cmd/", exist_ok=True)
+    os.makedirs(settings["path_to_src"] + "src_user/component_driver/bench/", exist_ok=True)
+
+    for obc_settings in [settings] + settings["other_obc_data"]:
+        synthetic_db.GenerateDb(
+            obc_settings["path_to_db"],
+            obc_settings["db_prefix"],
+            args.cmd_num,
+            args.tlm_num,
+            args.field_num,
+        )
+    return settings
+
+
+def CreateObcSettings_(work_dir, db_prefix):
+    return {
+        "path_to_db": work_dir + "tlm-cmd-db/" + db_prefix + "/",
+        "db_prefix": db_prefix,
+        "tlm_id_range": ["0x00", hex(synthetic_db.MAX_TLM_NUM)],
+        "is_cmd_prefixed_in_db": 0,
+        "input_file_encoding": "utf-8",
+        "output_file_encoding": "utf-8",
+    }
+
+
+def ListStages_(settings):
+    # 各ステージは GenerateC2ACode.py での実行順に並べる
+    # setup: 計測の前に毎回実行する処理（計測対象外）
+    # run:   計測対象．setup の戻り値を受け取る
+    db_paths = [settings["path_to_db"]]
+    db_paths += [other_obc["path_to_db"] for other_obc in settings["other_obc_data"]]
+
+    def CalcDbHashes(_):
+        for db_path in db_paths:
+            my_mod.db_fingerprint.GetDbHash(db_path)
+
+    def ResetHashCache():
+        # ファイルのキャッシュも使わない（CACHE_FILE_PATH を存在しないパスにする）
+        my_mod.db_fingerprint.CACHE_FILE_PATH = os.path.join(db_paths[0], "no_hash_cache.json")
+        my_mod.db_fingerprint.ClearCache()
+
+    def WarmHashCache():
+        # generator の計測にハッシュ計算を含めないため，GetDbHash の結果をメモ化しておく
+        CalcDbHashes(None)
+
+    def LoadCmdDb():
+        WarmHashCache()
+        return my_mod.load_db.LoadCmdDb(settings)
+
+    def LoadTlmDb():
+        WarmHashCache()
+        return my_mod.load_db.LoadTlmDb(settings)
+
+    return [
+        {"name": "hash", "setup": ResetHashCache, "run": CalcDbHashes},
+        {
+            "name": "LoadCmdDb",
+            "setup": WarmHashCache,
+            "run": lambda _: my_mod.load_db.LoadCmdDb(settings),
+        },
+        {
+            "name": "LoadTlmDb",
+            "setup": WarmHashCache,
+            "run": lambda _: my_mod.load_db.LoadTlmDb(settings),
+        },
+        {
+            "name": "GenerateCmdDef",
+            "setup": LoadCmdDb,
+            "run": lambda db: my_mod.cmd_def.GenerateCmdDef(settings, db["sgc"]),
+        },
+        {
+            "name": "GenerateBctDef",
+            "setup": LoadCmdDb,
+            "run": lambda db: my_mod.cmd_def.GenerateBctDef(settings, db["bct"]),
+        },
+        {
+            "name": "GenerateTlmDef",
+            "setup": LoadTlmDb,
+            "run": lambda db: my_mod.tlm_def.GenerateTlmDef(settings, db["tlm"]),
+        },
+        {
+            "name": "GenerateOtherObcCmdDef",
+            "setup": LoadCmdDb,
+            "run": lambda db: my_mod.cmd_def.GenerateOtherObcCmdDef(settings, db["other_obc"]),
+        },
+        {
+            "name": "GenerateOtherObcTlmDef",
+            "setup": LoadTlmDb,
+            "run": lambda db: my_mod.tlm_def.GenerateOtherObcTlmDef(settings, db["other_obc"]),
+        },
+        {
+            "name": "GenerateTlmBuffer",
+            "setup": LoadTlmDb,
+            "run": lambda db: my_mod.tlm_buffer.GenerateTlmBuffer(settings, db["other_obc"]),
+        },
+    ]
+
+
+def RunBenchmark_(stages, repeat):
+    # 戻り値: {ステージ名: 結果}
+    # 時間の計測と，メモリの計測（tracemalloc は実行を遅くするため）は別に行う
+    # ピークメモリは tracemalloc で追跡できる，このプロセスの Python のメモリ確保のみ（worker process は含まない）
+    results = {}
+    for stage in stages:
+        times = []
+        for _ in range(repeat):
+            arg = stage["setup"]()
+            start = time.perf_counter()
+            stage["run"](arg)
+            times.append(time.perf_counter() - start)
+
+        arg = stage["setup"]()
+        tracemalloc.start()
+        try:
+            stage["run"](arg)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del arg
+
+        results[stage["name"]] = {
+            "times_sec": times,
+            "min_sec": min(times),
+            "median_sec": statistics.median(times),
+            "peak_memory_bytes": peak_memory,
+        }
+    return results
+
+
+def PrintResult_(result):
+    print("params: " + json.dumps(result["params"], sort_keys=True))
+    print(
+        "{:<24} {:>12} {:>12} {:>16}".format("stage", "min [ms]", "median [ms]", "peak mem [KiB]")
+    )
+    for name, stage_result in result["stages"].items():
+        print(
+            "{:<24} {:>12.2f} {:>12.2f} {:>16.1f}".format(
+                name,
+                stage_result["min_sec"] * 1000,
+                stage_result["median_sec"] * 1000,
+                stage_result["peak_memory_bytes"] / 1024,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
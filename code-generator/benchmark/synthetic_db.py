@@ -0,0 +1,204 @@
+# coding: UTF-8
+"""
+ベンチマーク用の tlm-cmd-db の生成
+examples/mobc/tlm-cmd-db と同じ CSV レイアウト（CMD_DB/, TLM_DB/calced_data/）で，
+任意の規模の DB を生成する．内容は決定的（同じパラメタなら同じ CSV）
+"""
+
+import csv
+import os
+
+CMD_DB_COL_NUM = 21
+BCT_DB_COL_NUM = 12
+TLM_DB_COL_NUM = 18
+
+MAX_TLM_NUM = 256  # TLM ID は 1 byte
+
+# (var_type, conv_type) を順に使う
+FIELD_TYPES = [
+    ("uint8_t", "NONE"),
+    ("uint16_t", "NONE"),
+    ("uint32_t", "HEX"),
+    ("int8_t", "STATUS"),
+    ("int16_t", "NONE"),
+    ("int32_t", "POLY"),
+    ("float", "POLY"),
+    ("double", "NONE"),
+]
+VAR_TYPE_TO_SIZE = {
+    "int8_t": 1,
+    "int16_t": 2,
+    "int32_t": 4,
+    "uint8_t": 1,
+    "uint16_t": 2,
+    "uint32_t": 4,
+    "float": 4,
+    "double": 8,
+}
+BIT_FIELD_INTERVAL = 8  # この間隔で，uint8_t をビットフィールドで 2 分割した要素を入れる
+PARAM_TYPES = ["uint8_t", "int16_t", "uint32_t", "float", "double", "raw"]
+
+
+def GenerateDb(path_to_db, db_prefix, cmd_num, tlm_num, field_num, encoding="utf-8"):
+    if tlm_num > MAX_TLM_NUM:
+        raise ValueError("tlm_num must be <= " + str(MAX_TLM_NUM))
+
+    os.makedirs(path_to_db + "CMD_DB/", exist_ok=True)
+    os.makedirs(path_to_db + "TLM_DB/calced_data/", exist_ok=True)
+
+    WriteCsv_(
+        path_to_db + "CMD_DB/" + db_prefix + "_CMD_DB_CMD_DB.csv",
+        GenerateCmdSheet_(db_prefix, cmd_num),
+        encoding,
+    )
+    WriteCsv_(
+        path_to_db + "CMD_DB/" + db_prefix + "_CMD_DB_BCT.csv",
+        GenerateBctSheet_(cmd_num),
+        encoding,
+    )
+    for tlm_idx in range(tlm_num):
+        tlm_name = "BENCH" + str(tlm_idx)
+        WriteCsv_(
+            path_to_db + "TLM_DB/calced_data/" + db_prefix + "_TLM_DB_" + tlm_name + ".csv",
+            GenerateTlmSheet_(tlm_idx, field_num),
+            encoding,
+        )
+
+
+def GenerateCmdSheet_(db_prefix, cmd_num):
+    sheet = [
+        ["Component", "Name", "Target", "Code", "Params"]
+        + [""] * 12
+        + ["Danger Flag", "Is Restricted", "Description", "Note"],
+        [db_prefix, "", "", "", "Num Params"]
+        + sum([["Param" + str(i + 1), ""] for i in range(6)], [])
+        + [""] * 4,
+        ["Comment", "", "", "", ""] + ["Type", "Description"] * 6 + [""] * 4,
+    ]
+    for cmd_idx in range(cmd_num):
+        if cmd_idx % 100 == 0:
+            sheet.append(FillRow_(["* BENCH_GROUP" + str(cmd_idx // 100)], CMD_DB_COL_NUM))
+        param_num = cmd_idx % 7
+        params = []
+        for j in range(6):
+            if j < param_num:
+                # RAW は最後のパラメタにしか置けない
+                param_type = PARAM_TYPES[(cmd_idx + j) % (len(PARAM_TYPES) - 1)]
+                if j == param_num - 1 and cmd_idx % 5 == 0:
+                    param_type = "raw"
+                params += [param_type, "param" + str(j)]
+            else:
+                params += ["", ""]
+        sheet.append(
+            ["", "BENCH_CMD_" + str(cmd_idx), "OBC", "0x%04x" % cmd_idx, str(param_num)]
+            + params
+            + ["", "", "benchmark cmd " + str(cmd_idx), "note" if cmd_idx % 3 == 0 else ""]
+        )
+    return sheet
+
+
+def GenerateBctSheet_(cmd_num):
+    # BC の数は cmd_num の 1/10 とする
+    sheet = [
+        ["Comment", "Name", "ShortName", "BCID", "エイリアス", "", "", "", "", "Danger Flag"]
+        + ["Description", "Note"],
+        ["", "", "", "", "Deploy", "SetBlockPosition", "Clear", "Activate", "Inactivate"]
+        + [""] * 3,
+    ]
+    for bc_idx in range(max(cmd_num // 10, 1)):
+        if bc_idx % 50 == 0:
+            sheet.append(FillRow_(["**", "BENCH_GROUP" + str(bc_idx // 50)], BCT_DB_COL_NUM))
+        sheet.append(
+            FillRow_(
+                ["", "BC_BENCH_" + str(bc_idx), "", str(bc_idx)]
+                + [""] * 6
+                + ["benchmark bc@@ " + str(bc_idx)],
+                BCT_DB_COL_NUM,
+            )
+        )
+    return sheet
+
+
+def GenerateTlmSheet_(tlm_idx, field_num):
+    sheet = [
+        FillRow_(["", "Target", "OBC", "Local Var"], TLM_DB_COL_NUM),
+        FillRow_(["", "PacketID", "0x%02x" % tlm_idx], TLM_DB_COL_NUM),
+        FillRow_(["", "Enable/Disable", "ENABLE"], TLM_DB_COL_NUM),
+        FillRow_(["", "IsRestricted", "FALSE"], TLM_DB_COL_NUM),
+        FillRow_([], TLM_DB_COL_NUM),
+        [
+            "Comment",
+            "TLM Entry",
+            "Onboard Software Info.",
+            "",
+            "Extraction Info.",
+            "",
+            "",
+            "",
+            "Conversion Info.",
+        ]
+        + [""] * 7
+        + ["Description", "Note"],
+        [
+            "",
+            "Name",
+            "Var.%%##Type",
+            "Variable or Function Name",
+            "Ext.%%##Type",
+            "Pos. Desiginator",
+            "",
+            "",
+            "Conv.%%##Type",
+            "Poly (Σa_i * x^i)",
+        ]
+        + [""] * 5
+        + ["Status", "", ""],
+        ["", "", "", "", "", "Octet%%##Pos.", "bit%%##Pos.", "bit%%##Len."]
+        + ["", "a0", "a1", "a2", "a3", "a4", "a5"]
+        + [""] * 3,
+    ]
+
+    oct_pos = 0
+    for field_idx in range(field_num):
+        name = "GROUP" + str(field_idx // 16) + ".VAL" + str(field_idx)
+        code = "bench_tlm_" + str(tlm_idx) + "[" + str(field_idx) + "]"
+        if field_idx % BIT_FIELD_INTERVAL == BIT_FIELD_INTERVAL - 1:
+            # ビットフィールド（4 bit + 4 bit）
+            sheet.append(
+                TlmRow_(name + "_H", "uint8_t", "(uint8_t)(" + code + ")", oct_pos, 0, 4, "HEX")
+            )
+            sheet.append(TlmRow_(name + "_L", "", "", oct_pos, 4, 4, "HEX"))
+            oct_pos += 1
+            continue
+        var_type, conv_type = FIELD_TYPES[field_idx % len(FIELD_TYPES)]
+        size = VAR_TYPE_TO_SIZE[var_type]
+        sheet.append(TlmRow_(name, var_type, code, oct_pos, 0, size * 8, conv_type))
+        oct_pos += size
+    return sheet
+
+
+def TlmRow_(name, var_type, code, oct_pos, bit_pos, bit_len, conv_type):
+    poly = [""] * 6
+    status = ""
+    if conv_type == "POLY":
+        poly = ["0.5", "1.25", "", "", "", ""]
+    elif conv_type == "STATUS":
+        status = "0=OFF@@1=ON@@*=N/A"
+    return (
+        ["", name, var_type, code, "PACKET", str(oct_pos), str(bit_pos), str(bit_len), conv_type]
+        + poly
+        + [status, "", ""]
+    )
+
+
+def FillRow_(row, col_num):
+    return row + [""] * (col_num - len(row))
+
+
+def WriteCsv_(path, sheet, encoding):
+    # 最後に，打ち切り判定用の空行を入れる（Excel からの出力と同様）
+    col_num = max(len(row) for row in sheet)
+    with open(path, mode="w", encoding=encoding, newline="") as fh:
+        writer = csv.writer(fh, lineterminator="\n")
+        writer.writerows(sheet)
+        writer.writerow([""] * col_num)
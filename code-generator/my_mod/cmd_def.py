@@ -3,105 +3,63 @@
 cmd def
 """
 
-import sys
+import my_mod.emitter
 import my_mod.util
 
 # import pprint
 
+CONV_TYPE_TO_SIZE = {
+    "int8_t": "CA_PARAM_SIZE_TYPE_1BYTE",
+    "int16_t": "CA_PARAM_SIZE_TYPE_2BYTE",
+    "int32_t": "CA_PARAM_SIZE_TYPE_4BYTE",
+    "uint8_t": "CA_PARAM_SIZE_TYPE_1BYTE",
+    "uint16_t": "CA_PARAM_SIZE_TYPE_2BYTE",
+    "uint32_t": "CA_PARAM_SIZE_TYPE_4BYTE",
+    "float": "CA_PARAM_SIZE_TYPE_4BYTE",
+    "double": "CA_PARAM_SIZE_TYPE_8BYTE",
+    "raw": "CA_PARAM_SIZE_TYPE_RAW",
+}
+
 
-def GenerateCmdDef(settings, sgc_db):
+def GenerateCmdDef(settings, cmd_db):
     output_file_path = settings["path_to_src"] + r"src_user/tlm_cmd/"
     output_file_name_base = "command_definitions"
 
-    DATA_SART_ROW = 3
-
-    # コマンド名の最大長を取得
-    max_cmd_name_len = 0
-    for i in range(DATA_SART_ROW, len(sgc_db)):
-        comment = sgc_db[i][0]
-        if comment != "":
-            continue
-        name = sgc_db[i][1]
-        if len(name) > max_cmd_name_len:
-            max_cmd_name_len = len(name)
+    # コマンドテーブルを，起動時の代入ではなく，const なテーブルの初期化子として生成するか？
+    is_cmd_table_const = settings.get("is_cmd_table_const", 0)
 
-    body_c = ""
-    body_h = ""
+    body_c = my_mod.emitter.Emitter()
+    body_c_param = my_mod.emitter.Emitter()
+    body_h = my_mod.emitter.Emitter()
     # "  cmd_table[Cmd_CODE_NOP].cmd_func = Cmd_NOP;"
     # "  Cmd_CODE_NOP = 0x0000,"
-    for i in range(DATA_SART_ROW, len(sgc_db)):
-        comment = sgc_db[i][0]
-        name = sgc_db[i][1]
-        cmd_id = sgc_db[i][3]
-        description = sgc_db[i][19]
-        note = sgc_db[i][20]
-        if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
-            break
-        if comment != "":  # Comment
-            continue
-
-        cmd_name, cmd_code = GetCmdNameAndCmdCode_(name, settings["is_cmd_prefixed_in_db"])
+    for cmd in cmd_db.cmds:
+        cmd_name, cmd_code = GetCmdNameAndCmdCode_(cmd.name, settings["is_cmd_prefixed_in_db"])
         # print(cmd_name)
         # print(cmd_code)
-        body_c += "  cmd_table[" + cmd_code + "].cmd_func = " + cmd_name + ";\n"
-        body_h += "  " + cmd_code + " " * (max_cmd_name_len - len(name)) + " = " + cmd_id + ","
-        if description == "" and note == "":
-            body_h += "\n"
-        elif description != "" and note == "":
-            body_h += "  //!< " + description + "\n"
-        elif description != "" and note != "":
-            body_h += "  //!< " + description + " (" + note + ")\n"
-        else:
-            body_h += "  //!< (" + note + ")\n"
-
-    body_c += "\n"
-    for i in range(DATA_SART_ROW, len(sgc_db)):
-        comment = sgc_db[i][0]
-        name = sgc_db[i][1]
-        cmd_id = sgc_db[i][3]
-        if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
-            break
-        if comment != "":  # Comment
-            continue
-
-        param_num = int(sgc_db[i][4])
-        type_list = [
-            sgc_db[i][5],
-            sgc_db[i][7],
-            sgc_db[i][9],
-            sgc_db[i][11],
-            sgc_db[i][13],
-            sgc_db[i][15],
-        ]
-        cmd_name, cmd_code = GetCmdNameAndCmdCode_(name, settings["is_cmd_prefixed_in_db"])
+        if not is_cmd_table_const:
+            body_c.Emit("  cmd_table[" + cmd_code + "].cmd_func = " + cmd_name + ";\n")
+        body_h.Emit(GenerateCmdCodeDef_(cmd_code, cmd, cmd_db.max_name_len))
 
         # パラメタ長の整合性チェック
-        for j in range(len(type_list)):
+        for j in range(len(cmd.param_types)):
             err_flag = 0
-            if j < param_num and type_list[j] == "":
+            if j < cmd.param_num and cmd.param_types[j] == "":
                 err_flag = 1
-            if j >= param_num and type_list[j] != "":
+            if j >= cmd.param_num and cmd.param_types[j] != "":
                 err_flag = 1
             if err_flag:
-                print("Error: Cmd DB Err at " + name, file=sys.stderr)
-                sys.exit(1)
+                raise my_mod.util.GenerateError("Cmd DB Err at " + cmd.name)
+
+        if is_cmd_table_const:
+            body_c.Emit(GenerateConstCmdTableEntry_(cmd_name, cmd_code, cmd))
+            continue
 
         # パラメタ長のカウント
-        conv_tpye_to_size = {
-            "int8_t": "CA_PARAM_SIZE_TYPE_1BYTE",
-            "int16_t": "CA_PARAM_SIZE_TYPE_2BYTE",
-            "int32_t": "CA_PARAM_SIZE_TYPE_4BYTE",
-            "uint8_t": "CA_PARAM_SIZE_TYPE_1BYTE",
-            "uint16_t": "CA_PARAM_SIZE_TYPE_2BYTE",
-            "uint32_t": "CA_PARAM_SIZE_TYPE_4BYTE",
-            "float": "CA_PARAM_SIZE_TYPE_4BYTE",
-            "double": "CA_PARAM_SIZE_TYPE_8BYTE",
-            "raw": "CA_PARAM_SIZE_TYPE_RAW",
-        }
-        for j in range(param_num):
+        for j in range(cmd.param_num):
             index = j // 2
             subindex = "second" if j % 2 else "first"
-            body_c += (
+            body_c_param.Emit(
                 "  cmd_table["
                 + cmd_code
                 + "].param_size_infos["
@@ -109,109 +67,116 @@ def GenerateCmdDef(settings, sgc_db):
                 + "].packed_info.bit."
                 + subindex
                 + " = "
-                + conv_tpye_to_size[type_list[j]]
+                + CONV_TYPE_TO_SIZE[cmd.param_types[j]]
                 + ";\n"
             )
 
+    if not is_cmd_table_const:
+        body_c.Emit("\n")
+        body_c.Extend(body_c_param)
+
     OutputCmdDefC_(output_file_path + output_file_name_base + ".c", body_c, settings)
     OutputCmdDefH_(output_file_path + output_file_name_base + ".h", body_h, settings)
 
 
-def GenerateBctDef(settings, bct_db):
-    output_file_path = settings["path_to_src"] + r"src_user/tlm_cmd/"
-    output_file_name = "block_command_definitions.h"
-
-    DATA_SART_ROW = 2
+def GenerateConstCmdTableEntry_(cmd_name, cmd_code, cmd):
+    # "  [Cmd_CODE_NOP] = { Cmd_NOP, { { .packed_info.bit = { CA_PARAM_SIZE_TYPE_1BYTE, CA_PARAM_SIZE_TYPE_NONE } } } },"
+    # パラメタがないコマンドは，省略した要素が 0 (CA_PARAM_SIZE_TYPE_NONE) となる
+    param_size_infos = []
+    for index in range((cmd.param_num + 1) // 2):
+        first = CONV_TYPE_TO_SIZE[cmd.param_types[index * 2]]
+        if index * 2 + 1 < cmd.param_num:
+            second = CONV_TYPE_TO_SIZE[cmd.param_types[index * 2 + 1]]
+        else:
+            second = "CA_PARAM_SIZE_TYPE_NONE"
+        param_size_infos.append("{ .packed_info.bit = { " + first + ", " + second + " } }")
 
-    body_h = ""
-    for i in range(DATA_SART_ROW, len(bct_db)):
-        comment = bct_db[i][0]
-        name = bct_db[i][1]
-        bc_id = bct_db[i][3]
-        description = bct_db[i][10]
+    entry = "  [" + cmd_code + "] = { " + cmd_name
+    if param_size_infos:
+        entry += ", { " + ", ".join(param_size_infos) + " }"
+    entry += " },\n"
+    return entry
 
-        # エスケープ解除
-        name = name.replace("@@", ",")
-        description = description.replace("@@", ",")
 
-        if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
-            break
+def GenerateBctDef(settings, bct_db):
+    output_file_path = settings["path_to_src"] + r"src_user/tlm_cmd/"
+    output_file_name = "block_command_definitions.h"
 
-        if comment == "**":  # New Line Comment
-            body_h += "\n  // " + name + "\n"
-        elif comment != "":  # Comment
-            body_h += "  // " + name + "\n"
+    body_h = my_mod.emitter.Emitter()
+    for bct_entry in bct_db:
+        if bct_entry.comment == "**":  # New Line Comment
+            body_h.Emit("\n  // " + bct_entry.name + "\n")
+        elif bct_entry.comment != "":  # Comment
+            body_h.Emit("  // " + bct_entry.name + "\n")
         else:
             # "  BC_SL_INITIAL_TO_INITIAL = 0,"
-            if description == "":
-                body_h += "  " + name + " = " + bc_id + ",\n"
+            if bct_entry.description == "":
+                body_h.Emit("  " + bct_entry.name + " = " + bct_entry.bc_id + ",\n")
             else:
-                body_h += "  " + name + " = " + bc_id + ",    // " + description + "\n"
+                body_h.Emit(
+                    "  "
+                    + bct_entry.name
+                    + " = "
+                    + bct_entry.bc_id
+                    + ",    // "
+                    + bct_entry.description
+                    + "\n"
+                )
 
     OutputBctDef_(output_file_path + output_file_name, body_h, settings)
 
 
 def GenerateOtherObcCmdDef(settings, other_obc_dbs):
     # pprint.pprint(other_obc_dbs)
-    DATA_SART_ROW = 3
     for i in range(len(settings["other_obc_data"])):
         if not settings["other_obc_data"][i]["is_enable"]:
             continue
         obc_name = settings["other_obc_data"][i]["name"]
-        name_upper = obc_name.upper()
-        name_lower = obc_name.lower()
-        # name_capit = obc_name.capitalize()
-        # print(name_upper)
-        # print(name_lower)
-        # print(name_capit)
-        sgc_db = other_obc_dbs[obc_name]
-        # pprint.pprint(sgc_db)
-
-        # コマンド名の最大長を取得
-        max_cmd_name_len = 0
-        for j in range(DATA_SART_ROW, len(sgc_db)):
-            comment = sgc_db[j][0]
-            if comment != "":
-                continue
-            name = sgc_db[j][1]
-            if len(name) > max_cmd_name_len:
-                max_cmd_name_len = len(name)
-
-        body_h = ""
-        # "  TOBC_Cmd_CODE_NOP = 0x0000,"
-        for j in range(DATA_SART_ROW, len(sgc_db)):
-            comment = sgc_db[j][0]
-            name = sgc_db[j][1]
-            cmd_id = sgc_db[j][3]
-            description = sgc_db[j][19]
-            note = sgc_db[j][20]
-            if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
-                break
-            if comment != "":  # Comment
-                continue
-            # print(name)
-            _, cmd_code = GetCmdNameAndCmdCode_(
-                name, settings["other_obc_data"][i]["is_cmd_prefixed_in_db"]
-            )
-            cmd_code = name_upper + "_" + cmd_code
-            body_h += "  " + cmd_code + " " * (max_cmd_name_len - len(name)) + " = " + cmd_id + ","
-            if description == "" and note == "":
-                body_h += "\n"
-            elif description != "" and note == "":
-                body_h += "  //!< " + description + "\n"
-            elif description != "" and note != "":
-                body_h += "  //!< " + description + " (" + note + ")\n"
-            else:
-                body_h += "  //!< (" + note + ")\n"
-        # print(body_h)
-        output_file_path = (
-            settings["path_to_src"]
-            + r"src_user/component_driver/"
-            + settings["other_obc_data"][i]["driver_path"]
-            + name_lower
-            + "_command_definitions.h"
+        GenerateOtherObcCmdDefOfObc(settings, i, other_obc_dbs[obc_name])
+
+
+def GenerateOtherObcCmdDefOfObc(settings, obc_idx, cmd_db):
+    # OBC ごとに独立しているので，OBC ごとに並列に実行してよい
+    obc_name = settings["other_obc_data"][obc_idx]["name"]
+    name_upper = obc_name.upper()
+    name_lower = obc_name.lower()
+    # name_capit = obc_name.capitalize()
+    # print(name_upper)
+    # print(name_lower)
+    # print(name_capit)
+    # pprint.pprint(cmd_db)
+
+    body_h = my_mod.emitter.Emitter()
+    # "  TOBC_Cmd_CODE_NOP = 0x0000,"
+    for cmd in cmd_db.cmds:
+        # print(cmd.name)
+        _, cmd_code = GetCmdNameAndCmdCode_(
+            cmd.name, settings["other_obc_data"][obc_idx]["is_cmd_prefixed_in_db"]
         )
-        OutputOtherObcCmdDefH_(output_file_path, obc_name, body_h, settings, i)
+        cmd_code = name_upper + "_" + cmd_code
+        body_h.Emit(GenerateCmdCodeDef_(cmd_code, cmd, cmd_db.max_name_len))
+    # print(body_h.GetOutput())
+    output_file_path = (
+        settings["path_to_src"]
+        + r"src_user/component_driver/"
+        + settings["other_obc_data"][obc_idx]["driver_path"]
+        + name_lower
+        + "_command_definitions.h"
+    )
+    OutputOtherObcCmdDefH_(output_file_path, obc_name, body_h, settings, obc_idx)
+
+
+def GenerateCmdCodeDef_(cmd_code, cmd, max_cmd_name_len):
+    code_def = "  " + cmd_code + " " * (max_cmd_name_len - len(cmd.name)) + " = " + cmd.cmd_id + ","
+    if cmd.description == "" and cmd.note == "":
+        code_def += "\n"
+    elif cmd.description != "" and cmd.note == "":
+        code_def += "  //!< " + cmd.description + "\n"
+    elif cmd.description != "" and cmd.note != "":
+        code_def += "  //!< " + cmd.description + " (" + cmd.note + ")\n"
+    else:
+        code_def += "  //!< (" + cmd.note + ")\n"
+    return code_def
 
 
 def GetCmdNameAndCmdCode_(name, is_cmd_prefixed_in_db):
@@ -224,57 +189,101 @@ def GetCmdNameAndCmdCode_(name, is_cmd_prefixed_in_db):
 
 
 def OutputCmdDefC_(file_path, body, settings):
-    output = ""
-    output += """
+    output = my_mod.emitter.Emitter()
+    output.Emit(
+        """
 #pragma section REPRO
 /**
  * @file
  * @brief コマンド定義
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += my_mod.util.GenerateSettingNote(settings)
+    output.Emit(my_mod.util.GenerateSettingNote(settings))
 
-    output += """
+    output.Emit(
+        """
  */
 #include <src_core/tlm_cmd/command_analyze.h>
 #include "command_definitions.h"
 #include "command_source.h"
+"""[
+            1:
+        ]  # 最初の改行を除く
+    )
+
+    if settings.get("is_cmd_table_const", 0):
+        output.Emit(
+            """
+#include <string.h>
+
+#if !defined(__STDC_VERSION__) || __STDC_VERSION__ < 199901L
+#error "is_cmd_table_const requires C99 (designated initializers)"
+#endif
+
+// コマンドハンドラとパラメタサイズをコンパイル時に解決した，ROM に置けるコマンドテーブル
+static const CA_CmdInfo CA_cmd_table_[Cmd_CODE_MAX] =
+{
+"""
+        )
+        output.Extend(body)
+        output.Emit(
+            """
+};
 
 void CA_load_cmd_table(CA_CmdInfo cmd_table[CA_MAX_CMDS])
 {
-"""[
-        1:
-    ]  # 最初の改行を除く
+  // Cmd_CA_REGISTER_CMD による実行時の登録のため，テーブルの実体は RAM に置く
+  memcpy(cmd_table, CA_cmd_table_, sizeof(CA_cmd_table_));
+}
 
-    output += body
+#pragma section
+"""[
+                1:
+            ]  # 最初の改行を除く
+        )
+    else:
+        output.Emit(
+            """
 
-    output += """
+void CA_load_cmd_table(CA_CmdInfo cmd_table[CA_MAX_CMDS])
+{
+"""[
+                1:
+            ]  # 最初の改行を除く
+        )
+        output.Extend(body)
+        output.Emit(
+            """
 }
 
 #pragma section
 """[
-        1:
-    ]  # 最初の改行を除く
+                1:
+            ]  # 最初の改行を除く
+        )
 
-    with open(file_path, mode="w", encoding=settings["output_file_encoding"]) as fh:
-        fh.write(output)
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
 
 
 def OutputCmdDefH_(file_path, body, settings):
-    output = ""
-    output += """
+    output = my_mod.emitter.Emitter()
+    output.Emit(
+        """
 /**
  * @file
  * @brief コマンド定義
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += my_mod.util.GenerateSettingNote(settings)
+    output.Emit(my_mod.util.GenerateSettingNote(settings))
 
-    output += """
+    output.Emit(
+        """
  */
 #ifndef COMMAND_DEFINITIONS_H_
 #define COMMAND_DEFINITIONS_H_
@@ -282,38 +291,43 @@ def OutputCmdDefH_(file_path, body, settings):
 typedef enum
 {
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += body
+    output.Extend(body)
 
-    output += """
+    output.Emit(
+        """
 
   Cmd_CODE_MAX
 } CMD_CODE;
 
 #endif
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    with open(file_path, mode="w", encoding=settings["output_file_encoding"]) as fh:
-        fh.write(output)
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
 
 
 def OutputBctDef_(file_path, body, settings):
-    output = ""
-    output += """
+    output = my_mod.emitter.Emitter()
+    output.Emit(
+        """
 /**
  * @file
  * @brief ブロックコマンド定義
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += my_mod.util.GenerateSettingNote(settings)
+    output.Emit(my_mod.util.GenerateSettingNote(settings))
 
-    output += """
+    output.Emit(
+        """
  */
 #ifndef BLOCK_COMMAND_DEFINITIONS_H_
 #define BLOCK_COMMAND_DEFINITIONS_H_
@@ -322,12 +336,14 @@ def OutputBctDef_(file_path, body, settings):
 typedef enum
 {
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += body
+    output.Extend(body)
 
-    output += """
+    output.Emit(
+        """
 
   BC_ID_MAX    // BCT 自体のサイズは BCT_MAX_BLOCKS で規定
 } BC_DEFAULT_ID;
@@ -336,55 +352,52 @@ void BC_load_defaults(void);
 
 #endif
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    with open(file_path, mode="w", encoding=settings["output_file_encoding"]) as fh:
-        fh.write(output)
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
 
 
 def OutputOtherObcCmdDefH_(file_path, name, body, settings, obc_idx):
-    name_upper = name.upper()
-    name_lower = name.lower()
-    name_capit = name.capitalize()
-
-    output = ""
-    output += """
+    output = my_mod.emitter.Emitter(name)
+    output.Emit(
+        """
 /**
  * @file
  * @brief コマンド定義
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += my_mod.util.GenerateSubObcSettingNote(settings, obc_idx)
+    output.Emit(my_mod.util.GenerateSubObcSettingNote(settings, obc_idx))
 
-    output += """
+    output.Emit(
+        """
  */
 #ifndef {_obc_name_upper}_COMMAND_DEFINITIONS_H_
 #define {_obc_name_upper}_COMMAND_DEFINITIONS_H_
 
 typedef enum
-{{
+{
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += body
+    output.Extend(body)
 
-    output += """
+    output.Emit(
+        """
 
   {_obc_name_upper}_Cmd_CODE_MAX
-}} {_obc_name_upper}_CMD_CODE;
+} {_obc_name_upper}_CMD_CODE;
 
 #endif
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    with open(file_path, mode="w", encoding=settings["output_file_encoding"]) as fh:
-        fh.write(
-            output.format(
-                _obc_name_upper=name_upper, _obc_name_lower=name_lower, _obc_name_capit=name_capit
-            )
-        )
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
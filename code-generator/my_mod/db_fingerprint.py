@@ -0,0 +1,123 @@
+# coding: UTF-8
+"""
+tlm-cmd-db の CSV の MD5 計算
+各 CSV の MD5 は 1 実行につき 1 度だけ計算し，(path, size, mtime) をキーとして実行間でもキャッシュする
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+CACHE_VERSION = 1
+CACHE_FILE_PATH = "codegen_hash_cache.json"
+CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_cache = None  # {abspath: {"size": int, "mtime_ns": int, "md5": str}}
+_is_cache_dirty = False
+_db_hashes = {}  # 実行中の GetDbHash の結果
+
+
+# 入力 DB の csv をファイル名でソートし MD5 を計算，その MD5 をすべて cat して MD5 を計算したものを返す
+def GetDbHash(path):
+    with _lock:
+        if path in _db_hashes:
+            return _db_hashes[path]
+
+    csv_files = []
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            if name.endswith(".csv"):
+                csv_files.append(os.path.join(root, name))
+
+    # ファイル名でソートし，MD5 を結合したのち，その MD5 を計算
+    concatenated_md5s = "".join(CalcCsvMd5(file_path) for file_path in sorted(csv_files))
+    final_md5 = hashlib.md5(concatenated_md5s.encode()).hexdigest()
+
+    with _lock:
+        _db_hashes[path] = final_md5
+    return final_md5
+
+
+def CalcCsvMd5(path):
+    global _is_cache_dirty
+
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    with _lock:
+        cache = GetCache_()
+        entry = cache.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["md5"]
+
+    md5 = CalcMd5_(path)
+
+    with _lock:
+        cache[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "md5": md5}
+        _is_cache_dirty = True
+    return md5
+
+
+def SaveCache():
+    global _is_cache_dirty
+
+    with _lock:
+        if not _is_cache_dirty:
+            return
+        try:
+            with open(CACHE_FILE_PATH, mode="w", encoding="utf-8") as fh:
+                json.dump({"version": CACHE_VERSION, "files": _cache}, fh, indent=2, sort_keys=True)
+                fh.write("\n")
+        except OSError:
+            # キャッシュが保存できなくても，次回計算し直すだけなので無視する
+            return
+        _is_cache_dirty = False
+
+
+def ClearCache():
+    # メモリ上のキャッシュと GetDbHash の結果を破棄する（ファイルのキャッシュは CACHE_FILE_PATH から読み直す）
+    global _cache, _is_cache_dirty
+    with _lock:
+        _cache = None
+        _is_cache_dirty = False
+        _db_hashes.clear()
+
+
+def GetCache_():
+    # _lock を取得した状態で呼ぶこと
+    global _cache
+    if _cache is None:
+        try:
+            with open(CACHE_FILE_PATH, mode="r", encoding="utf-8") as fh:
+                cache = json.load(fh)
+            if cache.get("version") != CACHE_VERSION:
+                raise ValueError
+            _cache = cache["files"]
+        except (OSError, ValueError, AttributeError, KeyError):
+            _cache = {}
+    return _cache
+
+
+def CalcMd5_(path):
+    # Windows 環境で改行コードが CRLF になっているとハッシュ値が変わってしまう
+    # そのため，MD5 の計算は CRLF (および CR) -> LF してから行う
+    # ファイル全体を読み込むのではなく，chunk ごとに変換しつつ計算する
+    md5 = hashlib.md5()
+    is_cr_pending = False  # chunk 境界で \r\n が分断された場合のため，末尾の \r は次の chunk に回す
+    with open(path, mode="rb") as fh:
+        while True:
+            chunk = fh.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if is_cr_pending:
+                chunk = b"\r" + chunk
+            is_cr_pending = chunk.endswith(b"\r")
+            if is_cr_pending:
+                chunk = chunk[:-1]
+            if b"\r" in chunk:
+                chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+            md5.update(chunk)
+    if is_cr_pending:
+        md5.update(b"\n")
+    return md5.hexdigest()
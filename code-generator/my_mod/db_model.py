@@ -0,0 +1,258 @@
+# coding: UTF-8
+"""
+DB モデル
+CSV を読み込んだ list of list を，各 generator が使いやすい型付きのモデルに変換する
+列はヘッダ行のラベルから解決し，数値はここで変換しておく
+"""
+
+import dataclasses
+import sys
+
+
+CMD_DB_DATA_START_ROW = 3
+BCT_DB_DATA_START_ROW = 2
+TLM_DB_DATA_START_ROW = 8
+
+CMD_DB_MAX_PARAM_NUM = 6
+TLM_DB_POLY_NUM = 6
+
+
+@dataclasses.dataclass
+class Cmd:
+    __slots__ = ("name", "cmd_id", "param_num", "param_types", "description", "note")
+    name: str
+    cmd_id: str  # DB の表記のまま（"0x0000" など）
+    param_num: int
+    param_types: tuple  # Param1 - Param6 の Type．未使用は ""
+    description: str
+    note: str
+
+
+@dataclasses.dataclass
+class CmdDb:
+    __slots__ = ("cmds", "max_name_len")
+    cmds: list  # Comment 行を除いた Cmd
+    max_name_len: int
+
+
+@dataclasses.dataclass
+class BctEntry:
+    __slots__ = ("comment", "name", "bc_id", "description")
+    comment: str  # "" 以外なら Comment 行
+    name: str  # @@ はエスケープ解除済み
+    bc_id: str
+    description: str  # @@ はエスケープ解除済み
+
+
+@dataclasses.dataclass
+class TlmField:
+    __slots__ = (
+        "name",
+        "var_type",
+        "packed_var_type",
+        "code",
+        "oct_pos",
+        "bit_pos",
+        "bit_len",
+        "is_bit_field",
+        "conv_type",
+        "poly",
+        "status",
+        "description",
+        "note",
+    )
+    name: str
+    var_type: str  # DB の表記のまま．ビットフィールドの後続要素では ""
+    packed_var_type: str  # var_type が "" の場合，直前の要素のものを引き継いだ型
+    code: str  # @@ はエスケープ解除済み
+    oct_pos: int  # 空欄の場合は None
+    bit_pos: int  # 空欄の場合は None
+    bit_len: int  # 空欄の場合は None
+    is_bit_field: bool  # ビットフィールドをつかって圧縮されているか？
+    conv_type: str
+    poly: tuple  # a0 - a5．空欄の場合は None
+    status: str
+    description: str
+    note: str
+
+
+@dataclasses.dataclass
+class TlmPacket:
+    __slots__ = ("tlm_id", "tlm_name", "local_vars", "fields")
+    tlm_id: str  # DB の表記のまま（"0x00" など）
+    tlm_name: str
+    local_vars: list
+    fields: list  # Comment 行, Name が空欄の行を除いた TlmField
+
+
+def ParseCmdSheet(sheet):
+    header = sheet[0]
+    param_header = sheet[1]
+    name_col = FindColumn_(header, "Name", 1)
+    code_col = FindColumn_(header, "Code", 3)
+    description_col = FindColumn_(header, "Description", 19)
+    note_col = FindColumn_(header, "Note", 20)
+    param_num_col = FindColumn_(param_header, "Num Params", 4)
+    param_type_cols = [
+        FindColumn_(param_header, "Param" + str(i + 1), 5 + 2 * i)
+        for i in range(CMD_DB_MAX_PARAM_NUM)
+    ]
+
+    cmds = []
+    max_name_len = 0
+    for row in sheet[CMD_DB_DATA_START_ROW:]:
+        comment = row[0]
+        name = row[name_col]
+        if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
+            break
+        if comment != "":  # Comment
+            continue
+
+        try:
+            param_num = int(row[param_num_col])
+        except ValueError:
+            print("Error: Cmd DB Err at " + name, file=sys.stderr)
+            sys.exit(1)
+
+        cmds.append(
+            Cmd(
+                name,
+                row[code_col],
+                param_num,
+                tuple(row[col] for col in param_type_cols),
+                row[description_col],
+                row[note_col],
+            )
+        )
+        max_name_len = max(max_name_len, len(name))
+
+    return CmdDb(cmds, max_name_len)
+
+
+def ParseBctSheet(sheet):
+    header = sheet[0]
+    name_col = FindColumn_(header, "Name", 1)
+    bc_id_col = FindColumn_(header, "BCID", 3)
+    description_col = FindColumn_(header, "Description", 10)
+
+    bct_entries = []
+    for row in sheet[BCT_DB_DATA_START_ROW:]:
+        comment = row[0]
+        # エスケープ解除
+        name = row[name_col].replace("@@", ",")
+        description = row[description_col].replace("@@", ",")
+
+        if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
+            break
+
+        bct_entries.append(BctEntry(comment, name, row[bc_id_col], description))
+
+    return bct_entries
+
+
+def ParseTlmSheet(sheet, tlm_name):
+    # 戻り値の TlmPacket の tlm_id, local_vars は，テレメ定義の 2 行目（PacketID の行）から取得する
+    local_var_col = FindColumn_(sheet[0], "Local Var", 3)
+    tlm_id = sheet[1][2]  # FIXME: テレメIDを取得．マジックナンバーで指定してしまってる．
+
+    raw_local_vars = sheet[1][local_var_col].replace("%%", "").split("##")
+    local_vars = []
+    for raw_local_var in raw_local_vars:
+        local_var = raw_local_var.strip().replace("@@", ",")
+        if len(local_var) > 0:
+            local_vars.append(local_var)
+
+    cols = ResolveTlmColumns_(sheet)
+    comment_col = cols["comment"]
+    name_col = cols["name"]
+    var_type_col = cols["var_type"]
+
+    fields = []
+    last_var_type = ""
+    rows = sheet[TLM_DB_DATA_START_ROW:]
+    for j, row in enumerate(rows):
+        comment = row[comment_col]
+        name = row[name_col]
+        var_type = row[var_type_col]
+        if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
+            break
+        if comment != "":
+            continue
+        if name == "":
+            continue
+
+        packed_var_type = var_type if var_type != "" else last_var_type
+        last_var_type = packed_var_type
+
+        # テレメ圧縮フラグ for ビットフィールドをつかってる奴ら
+        next_row = rows[j + 1] if j + 1 < len(rows) else None
+        next_comment = next_row[comment_col] if next_row else ""
+        next_name = next_row[name_col] if next_row else ""
+        next_var_type = next_row[var_type_col] if next_row else ""
+        is_bit_field = var_type == "" or next_var_type == ""
+        if next_comment == "" and next_name == "" and var_type != "":  # 最終行の除外
+            is_bit_field = False
+
+        try:
+            fields.append(
+                TlmField(
+                    name,
+                    var_type,
+                    packed_var_type,
+                    row[cols["code"]].replace("@@", ","),
+                    ToInt_(row[cols["oct_pos"]]),
+                    ToInt_(row[cols["bit_pos"]]),
+                    ToInt_(row[cols["bit_len"]]),
+                    is_bit_field,
+                    row[cols["conv_type"]],
+                    tuple(ToFloat_(row[col]) for col in cols["poly"]),
+                    row[cols["status"]],
+                    row[cols["description"]],
+                    row[cols["note"]],
+                )
+            )
+        except ValueError:
+            print("Error: Tlm DB Err at " + tlm_name.upper() + " " + name, file=sys.stderr)
+            sys.exit(1)
+
+    return TlmPacket(tlm_id, tlm_name, local_vars, fields)
+
+
+def ResolveTlmColumns_(sheet):
+    # ヘッダは 3 行（TLM_DB_DATA_START_ROW の直前の 3 行）にまたがっている
+    header = sheet[TLM_DB_DATA_START_ROW - 3]
+    sub_header = sheet[TLM_DB_DATA_START_ROW - 2]
+    sub_sub_header = sheet[TLM_DB_DATA_START_ROW - 1]
+    return {
+        "comment": FindColumn_(header, "Comment", 0),
+        "name": FindColumn_(sub_header, "Name", 1),
+        "var_type": FindColumn_(sub_header, "Var.%%##Type", 2),
+        "code": FindColumn_(sub_header, "Variable or Function Name", 3),
+        "oct_pos": FindColumn_(sub_sub_header, "Octet%%##Pos.", 5),
+        "bit_pos": FindColumn_(sub_sub_header, "bit%%##Pos.", 6),
+        "bit_len": FindColumn_(sub_sub_header, "bit%%##Len.", 7),
+        "conv_type": FindColumn_(sub_header, "Conv.%%##Type", 8),
+        "poly": [FindColumn_(sub_sub_header, "a" + str(i), 9 + i) for i in range(TLM_DB_POLY_NUM)],
+        "status": FindColumn_(sub_header, "Status", 15),
+        "description": FindColumn_(header, "Description", 16),
+        "note": FindColumn_(header, "Note", 17),
+    }
+
+
+def FindColumn_(header_row, label, default):
+    try:
+        return header_row.index(label)
+    except ValueError:
+        return default
+
+
+def ToInt_(text):
+    if text == "":
+        return None
+    return int(text)
+
+
+def ToFloat_(text):
+    if text == "":
+        return None
+    return float(text)
@@ -0,0 +1,111 @@
+# coding: UTF-8
+"""
+パース済み DB のスナップショット
+db_model に変換した DB を DB ディレクトリ内の SNAPSHOT_DIR_NAME にバイナリで保存し，
+入力 CSV が変化していなければ，CSV をパースせずにスナップショットを mmap して読み込む
+
+ファイル形式:
+  SNAPSHOT_MAGIC (8 byte) | ヘッダ長 (uint32 LE) | JSON(ヘッダ) | pickle(データ)
+  ヘッダ: {"version": SNAPSHOT_VERSION, "generator": 生成スクリプトのハッシュ,
+           "key": パース条件, "sources": [[CSV のパス, size, mtime_ns, MD5], ...]}
+ヘッダは pickle ではないので，ヘッダの検証が済むまで pickle を読み込まない
+パーサ（db_model, load_db など）が変更された場合は，生成スクリプトのハッシュが変わるので無効になる
+code-generator 専用．enum-loader やテストのユーティリティは，スナップショットを読まずに CSV をパースする
+"""
+
+import json
+import mmap
+import os
+import pickle
+import struct
+
+import my_mod.db_fingerprint
+import my_mod.manifest
+
+SNAPSHOT_MAGIC = b"C2ADBSNP"
+SNAPSHOT_VERSION = 2  # ファイル形式を変更した場合はインクリメントすること
+SNAPSHOT_DIR_NAME = ".c2a_codegen_snapshot"
+
+_header_len_format = "<I"
+
+
+def GetSnapshotPath(path_to_db, name):
+    return path_to_db + SNAPSHOT_DIR_NAME + "/" + name + ".bin"
+
+
+def GetSources(source_files):
+    # スナップショットの有効性判定に使う，入力 CSV の情報
+    # パース前に取得しておくこと（パース中に CSV が更新された場合に，古い内容を新しいものとして記録しないため）
+    sources = []
+    for source_file in sorted(source_files):
+        stat = os.stat(source_file)
+        md5 = my_mod.db_fingerprint.CalcCsvMd5(source_file)
+        sources.append((source_file, stat.st_size, stat.st_mtime_ns, md5))
+    return sources
+
+
+def LoadSnapshot(snapshot_path, source_files, key):
+    # 有効なスナップショットがなければ None を返す
+    try:
+        with open(snapshot_path, mode="rb") as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    return None
+                (header_len,) = struct.unpack(_header_len_format, mm.read(4))
+                header = json.loads(mm.read(header_len).decode("utf-8"))
+                if not IsHeaderValid_(header, source_files, key):
+                    return None
+                return pickle.load(mm)
+    except Exception:
+        # 壊れている，古いクラスの pickle など，読み込めない場合はすべて CSV をパースし直す
+        return None
+
+
+def SaveSnapshot(snapshot_path, sources, key, data):
+    header = json.dumps(
+        {
+            "version": SNAPSHOT_VERSION,
+            "generator": my_mod.manifest.GetGeneratorSourceHash(),
+            "key": key,
+            "sources": sources,
+        }
+    ).encode("utf-8")
+    tmp_path = snapshot_path + "." + str(os.getpid()) + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        with open(tmp_path, mode="wb") as fh:
+            fh.write(SNAPSHOT_MAGIC)
+            fh.write(struct.pack(_header_len_format, len(header)))
+            fh.write(header)
+            pickle.dump(data, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        # 読み込み中のプロセスが中途半端なファイルを読まないように，置き換えで更新する
+        os.replace(tmp_path, snapshot_path)
+    except OSError:
+        # スナップショットが保存できなくても，次回 CSV をパースし直すだけなので無視する
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def IsHeaderValid_(header, source_files, key):
+    if not isinstance(header, dict):
+        return False
+    if header.get("version") != SNAPSHOT_VERSION:
+        return False
+    if header.get("generator") != my_mod.manifest.GetGeneratorSourceHash():
+        return False
+    if header.get("key") != key:
+        return False
+    return IsSourcesValid_(header.get("sources"), source_files)
+
+
+def IsSourcesValid_(sources, source_files):
+    if [source[0] for source in sources] != sorted(source_files):
+        return False  # シートの追加・削除
+    for source_file, size, mtime_ns, md5 in sources:
+        stat = os.stat(source_file)
+        if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+            continue
+        # checkout などで mtime だけが変わった場合は中身で判定する
+        if my_mod.db_fingerprint.CalcCsvMd5(source_file) != md5:
+            return False
+    return True
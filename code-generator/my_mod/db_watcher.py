@@ -0,0 +1,134 @@
+# coding: UTF-8
+"""
+watch モード用の DB
+パース済みの DB を CSV（シート）ごとにメモリ上に保持し，変化した CSV のみ再パースする
+"""
+
+import os
+
+import my_mod.load_db
+
+
+class DbWatcher:
+    def __init__(self, settings):
+        self.settings = settings
+        self.sheets = {}  # {CSV のパス: {"stat": (size, mtime_ns), "data": パース結果}}
+
+    def Scan(self):
+        # 戻り値: {CSV のパス: (size, mtime_ns)}
+        # 監視対象は，main OBC と（is_main_obc の場合）有効な他 OBC の CMD_DB, TLM_DB/calced_data
+        stats = {}
+        for obc_name, db_settings in self.ListDbSettings_():
+            sgc_db_path, bct_db_path = self.GetCmdCsvPaths_(db_settings)
+            paths = [sgc_db_path]
+            if obc_name is None:  # BCT を使うのは main OBC のみ
+                paths.append(bct_db_path)
+            paths += [path for _, path in self.GetTlmSheets_(db_settings)]
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # CSV の出力途中などで，一時的に存在しない場合
+                stats[path] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def GetChangedPaths(self, stats):
+        # 追加・変更・削除された CSV のパスの set
+        changed_paths = set(path for path in self.sheets if path not in stats)
+        for path, stat in stats.items():
+            if path not in self.sheets or self.sheets[path]["stat"] != stat:
+                changed_paths.add(path)
+        return changed_paths
+
+    def Update(self, stats):
+        # Scan の結果にしたがって，変化した CSV のみ再パースする
+        # 戻り値: 変化した CSV のパスの set
+        changed_paths = self.GetChangedPaths(stats)
+        if not changed_paths:
+            return changed_paths
+
+        loaders = {}
+        for _, db_settings in self.ListDbSettings_():
+            encoding = db_settings["input_file_encoding"]
+            sgc_db_path, bct_db_path = self.GetCmdCsvPaths_(db_settings)
+            loaders[sgc_db_path] = (my_mod.load_db.LoadSgcCSV, (sgc_db_path, encoding))
+            loaders[bct_db_path] = (my_mod.load_db.LoadBctCSV, (bct_db_path, encoding))
+            for tlm_name, path in self.GetTlmSheets_(db_settings):
+                loaders[path] = (my_mod.load_db.LoadTlmCSV, (path, tlm_name, encoding))
+
+        # 途中の CSV のパースに失敗した場合（sys.exit や例外），それより前の CSV も反映しない
+        # self.sheets を更新しなければ，次の Update でも変化した CSV として扱われ，すべて再パースされる
+        parsed_sheets = {}
+        for path in sorted(changed_paths):
+            if path not in stats:
+                continue
+            loader, args = loaders[path]
+            parsed_sheets[path] = {"stat": stats[path], "data": loader(*args)}
+
+        for path in changed_paths:
+            if path not in stats:
+                del self.sheets[path]
+        self.sheets.update(parsed_sheets)
+        return changed_paths
+
+    def GetCmdDb(self):
+        # my_mod.load_db.LoadCmdDb と同じ形式
+        sgc_db_path, bct_db_path = self.GetCmdCsvPaths_(self.settings)
+        other_obc_dbs = {}
+        for obc_name, db_settings in self.ListDbSettings_():
+            if obc_name is None:
+                continue
+            other_obc_dbs[obc_name] = self.GetSheetData_(self.GetCmdCsvPaths_(db_settings)[0])
+        return {
+            "sgc": self.GetSheetData_(sgc_db_path),
+            "bct": self.GetSheetData_(bct_db_path),
+            "other_obc": other_obc_dbs,
+        }
+
+    def GetTlmDb(self):
+        # my_mod.load_db.LoadTlmDb と同じ形式
+        other_obc_dbs = {}
+        for obc_name, db_settings in self.ListDbSettings_():
+            if obc_name is None:
+                continue
+            my_mod.load_db.CheckMaxTlmNum(db_settings)
+            other_obc_dbs[obc_name] = self.GetTlmPackets_(db_settings)
+        return {"tlm": self.GetTlmPackets_(self.settings), "other_obc": other_obc_dbs}
+
+    def GetTlmPackets_(self, db_settings):
+        tlm_db = []
+        for _, path in self.GetTlmSheets_(db_settings):
+            if path not in self.sheets:
+                continue  # 削除された
+            tlm = self.sheets[path]["data"]
+            if tlm is not None:
+                tlm_db.append(tlm)
+        tlm_db.sort(key=lambda x: x.tlm_id)
+        my_mod.load_db.CheckTlmIdRange(
+            tlm_db, db_settings["db_prefix"], db_settings["tlm_id_range"]
+        )
+        return tlm_db
+
+    def GetSheetData_(self, path):
+        if path not in self.sheets:
+            raise FileNotFoundError(path)
+        return self.sheets[path]["data"]
+
+    def ListDbSettings_(self):
+        # 戻り値: [(OBC 名, DB の設定)]．main OBC の OBC 名は None
+        db_settings_list = [(None, self.settings)]
+        if self.settings["is_main_obc"]:
+            for other_obc_settings in self.settings["other_obc_data"]:
+                if other_obc_settings["is_enable"]:
+                    db_settings_list.append((other_obc_settings["name"], other_obc_settings))
+        return db_settings_list
+
+    def GetCmdCsvPaths_(self, db_settings):
+        return my_mod.load_db.GetCmdCsvPaths(
+            db_settings["path_to_db"] + r"CMD_DB/", db_settings["db_prefix"]
+        )
+
+    def GetTlmSheets_(self, db_settings):
+        return my_mod.load_db.GetTlmSheets(
+            db_settings["path_to_db"] + r"TLM_DB/calced_data/", db_settings["db_prefix"]
+        )
@@ -0,0 +1,31 @@
+# coding: UTF-8
+"""
+コード出力用の emitter
+生成コードを chunk の list として溜め，最後に 1 度だけ結合する（文字列の += による二乗オーダーのコピーを避けるため）
+{_obc_name_upper} などの置換は emit 時に行うので，テンプレート中の { } をエスケープ（{{ }}）する必要はない
+"""
+
+
+class Emitter:
+    def __init__(self, obc_name=None):
+        self.chunks = []
+        self.replacements = []
+        if obc_name is not None:
+            self.replacements = [
+                ("{_obc_name_upper}", obc_name.upper()),
+                ("{_obc_name_lower}", obc_name.lower()),
+                ("{_obc_name_capit}", obc_name.capitalize()),
+            ]
+
+    def Emit(self, text):
+        if self.replacements and "{_obc_name_" in text:
+            for key, value in self.replacements:
+                text = text.replace(key, value)
+        self.chunks.append(text)
+
+    def Extend(self, emitter):
+        # emitter の中身は emit 時に置換済みなので，そのまま連結する
+        self.chunks.extend(emitter.chunks)
+
+    def GetOutput(self):
+        return "".join(self.chunks)
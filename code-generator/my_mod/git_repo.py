@@ -0,0 +1,182 @@
+# coding: UTF-8
+"""
+git リポジトリ情報の取得
+git コマンドを起動せず，.git ディレクトリ（HEAD, refs, packed-refs, config）を直接読んで
+remote URL と HEAD の commit hash を解決する．結果はリポジトリごとにメモ化する
+reftable, include, insteadOf などの特殊な構成の場合は None を返すので，呼び出し元で git コマンドにフォールバックすること
+"""
+
+import os
+import re
+import threading
+
+_lock = threading.Lock()
+_repo_infos = {}  # {abspath: repo info}
+
+_p_section = re.compile(r'^\[\s*([A-Za-z0-9.-]+)(?:\s+"([^"\\]*)")?\s*\]$')
+_p_key_value = re.compile(r"^([A-Za-z][A-Za-z0-9-]*)\s*(?:=\s*(.*))?$")
+_p_hash = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+_p_unsupported_global_section = re.compile(r"^\s*\[\s*(url|include|includeif)\b", re.M | re.I)
+
+# この section が存在する場合は，自前では正しく解決できないのでフォールバックする
+UNSUPPORTED_CONFIG_SECTIONS = ["include", "includeif", "url"]
+
+
+class UnsupportedLayoutError_(Exception):
+    pass
+
+
+def GetRepoInfo(path):
+    # 戻り値
+    #   None:  自前では解決できない（git コマンドにフォールバックすること）
+    #   dict:  {"remote_url": 最初の remote の URL or None, "commit_hash": HEAD の commit hash or None}
+    #          git 管理されていない場合は両方 None
+    key = os.path.abspath(path)
+    with _lock:
+        if key in _repo_infos:
+            return _repo_infos[key]
+
+    try:
+        repo_info = ResolveRepoInfo_(key)
+    except (UnsupportedLayoutError_, OSError, UnicodeDecodeError):
+        repo_info = None
+
+    with _lock:
+        _repo_infos[key] = repo_info
+    return repo_info
+
+
+def ResolveRepoInfo_(path):
+    # 環境変数でリポジトリの場所や設定が変えられている場合は git コマンドに任せる
+    for env in ["GIT_DIR", "GIT_COMMON_DIR", "GIT_CONFIG", "GIT_CONFIG_GLOBAL", "GIT_CONFIG_COUNT"]:
+        if env in os.environ:
+            raise UnsupportedLayoutError_
+
+    git_dir = FindGitDir_(path)
+    if git_dir is None:
+        return {"remote_url": None, "commit_hash": None}
+
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_file):  # git worktree
+        common_dir = os.path.normpath(os.path.join(git_dir, ReadText_(commondir_file).strip()))
+
+    config = ParseConfig_(os.path.join(common_dir, "config"))
+    if "extensions" in config and "refstorage" in config["extensions"].get(None, {}):
+        raise UnsupportedLayoutError_  # reftable など
+    # remote URL の書き換え（url.<base>.insteadOf）はユーザー設定にも書かれうる
+    for global_config_path in GetGlobalConfigPaths_():
+        if os.path.isfile(global_config_path):
+            if _p_unsupported_global_section.search(ReadText_(global_config_path)):
+                raise UnsupportedLayoutError_
+    # 旧形式の remote 定義
+    for legacy_dir in ["remotes", "branches"]:
+        legacy_dir = os.path.join(common_dir, legacy_dir)
+        if os.path.isdir(legacy_dir) and os.listdir(legacy_dir):
+            raise UnsupportedLayoutError_
+
+    # git remote と同様に，remote 名でソートして最初のものを使う
+    remote_url = None
+    remotes = config.get("remote", {})
+    remote_names = sorted(name for name in remotes if name is not None)
+    if remote_names:
+        remote_url = remotes[remote_names[0]].get("url")
+
+    return {"remote_url": remote_url, "commit_hash": ResolveHead_(git_dir, common_dir)}
+
+
+def FindGitDir_(path):
+    while True:
+        dot_git = os.path.join(path, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git
+        if os.path.isfile(dot_git):
+            # submodule や worktree の場合，.git はファイルで，実体の場所が書かれている
+            content = ReadText_(dot_git).strip()
+            if not content.startswith("gitdir:"):
+                raise UnsupportedLayoutError_
+            git_dir = content[len("gitdir:") :].strip()
+            return os.path.normpath(os.path.join(path, git_dir))
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def ResolveHead_(git_dir, common_dir):
+    ref = "HEAD"
+    for _ in range(5):  # シンボリック ref の多段参照に備える
+        value = ReadRef_(git_dir, common_dir, ref)
+        if value is None:
+            return None  # unborn branch など
+        if value.startswith("ref:"):
+            ref = value[len("ref:") :].strip()
+            continue
+        if not _p_hash.match(value):
+            raise UnsupportedLayoutError_
+        return value
+    raise UnsupportedLayoutError_
+
+
+def ReadRef_(git_dir, common_dir, ref):
+    # HEAD や worktree 固有の ref は git_dir に，それ以外は common_dir にある
+    for base_dir in [git_dir, common_dir]:
+        ref_path = os.path.join(base_dir, *ref.split("/"))
+        if os.path.isfile(ref_path):
+            return ReadText_(ref_path).strip()
+
+    packed_refs_path = os.path.join(common_dir, "packed-refs")
+    if os.path.isfile(packed_refs_path):
+        for line in ReadText_(packed_refs_path).splitlines():
+            if line.startswith("#") or line.startswith("^"):
+                continue
+            fields = line.split(" ", 1)
+            if len(fields) == 2 and fields[1].strip() == ref:
+                return fields[0]
+    return None
+
+
+def ParseConfig_(path):
+    # 戻り値: {section: {subsection or None: {key: value}}}（section, key は小文字）
+    # 自前で正しく解釈できない記法（クォート，エスケープ，行継続など）を含む場合は UnsupportedLayoutError_
+    config = {}
+    if not os.path.isfile(path):
+        return config
+
+    current = None
+    for line in ReadText_(path).splitlines():
+        line = line.strip()
+        if line == "" or line[0] in "#;":
+            continue
+        if line.startswith("["):
+            m = _p_section.match(line)
+            if not m:
+                raise UnsupportedLayoutError_
+            section = m.group(1).lower()
+            if section in UNSUPPORTED_CONFIG_SECTIONS:
+                raise UnsupportedLayoutError_
+            current = config.setdefault(section, {}).setdefault(m.group(2), {})
+            continue
+        if current is None:
+            raise UnsupportedLayoutError_
+        m = _p_key_value.match(line)
+        if not m:
+            raise UnsupportedLayoutError_
+        value = m.group(2) if m.group(2) is not None else "true"
+        if '"' in value or "\\" in value:
+            raise UnsupportedLayoutError_
+        value = re.split(r"\s[#;]", value, 1)[0].strip()
+        current.setdefault(m.group(1).lower(), value)  # 多値の key は最初の値を採用する
+    return config
+
+
+def GetGlobalConfigPaths_():
+    paths = [os.path.expanduser("~/.gitconfig")]
+    xdg_config_home = os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config"))
+    paths.append(os.path.join(xdg_config_home, "git", "config"))
+    return paths
+
+
+def ReadText_(path):
+    with open(path, mode="r", encoding="utf-8") as fh:
+        return fh.read()
@@ -7,15 +7,20 @@ import os
 import sys
 import csv
 import re  # 正規表現
+import concurrent.futures
+
+import my_mod.db_model
+import my_mod.db_snapshot
 
 # import pprint
 
 
 def LoadCmdDb(settings):
-    cmd_db_path = settings["path_to_db"] + r"CMD_DB/"
-
     sgc_db, bct_db = LoadCmdCSV_(
-        cmd_db_path, settings["db_prefix"], settings["input_file_encoding"]
+        settings["path_to_db"],
+        settings["db_prefix"],
+        settings["input_file_encoding"],
+        IsSnapshotEnabled_(settings),
     )
 
     other_obc_dbs = {}
@@ -29,95 +34,218 @@ def LoadCmdDb(settings):
     return {"sgc": sgc_db, "bct": bct_db, "other_obc": other_obc_dbs}
 
 
-def LoadCmdCSV_(cmd_db_path, db_prefix, encoding):
-    sgc_db_path = cmd_db_path + db_prefix + "_CMD_DB_CMD_DB.csv"  # single cmd
-    bct_db_path = cmd_db_path + db_prefix + "_CMD_DB_BCT.csv"  # block cmd table
+def LoadCmdCSV_(path_to_db, db_prefix, encoding, is_snapshot_enabled):
+    sgc_db_path, bct_db_path = GetCmdCsvPaths(path_to_db + r"CMD_DB/", db_prefix)
+
+    if is_snapshot_enabled:
+        snapshot_path = my_mod.db_snapshot.GetSnapshotPath(path_to_db, db_prefix + "_CMD_DB")
+        snapshot_key = {"db_prefix": db_prefix, "encoding": encoding}
+        cmd_db = my_mod.db_snapshot.LoadSnapshot(
+            snapshot_path, [sgc_db_path, bct_db_path], snapshot_key
+        )
+        if cmd_db is not None:
+            return cmd_db
+        sources = my_mod.db_snapshot.GetSources([sgc_db_path, bct_db_path])
+
+    sgc_db = LoadSgcCSV(sgc_db_path, encoding)
+    bct_db = LoadBctCSV(bct_db_path, encoding)
+
+    if is_snapshot_enabled:
+        my_mod.db_snapshot.SaveSnapshot(snapshot_path, sources, snapshot_key, (sgc_db, bct_db))
 
+    return sgc_db, bct_db
+
+
+def LoadSgcCSV(sgc_db_path, encoding):
     with open(sgc_db_path, mode="r", encoding=encoding) as fh:
         reader = csv.reader(fh)
-        sgc_db = [[s.strip() for s in row] for row in reader]
+        return my_mod.db_model.ParseCmdSheet([[s.strip() for s in row] for row in reader])
+
+
+def LoadBctCSV(bct_db_path, encoding):
     with open(bct_db_path, mode="r", encoding=encoding) as fh:
         reader = csv.reader(fh)
-        bct_db = [[s.strip() for s in row] for row in reader]
-
-    return sgc_db, bct_db
+        return my_mod.db_model.ParseBctSheet([[s.strip() for s in row] for row in reader])
 
 
-def LoadTlmDb(settings):
-    tlm_db_path = settings["path_to_db"] + r"TLM_DB/calced_data/"
+def GetCmdCsvPaths(cmd_db_path, db_prefix):
+    sgc_db_path = cmd_db_path + db_prefix + "_CMD_DB_CMD_DB.csv"  # single cmd
+    bct_db_path = cmd_db_path + db_prefix + "_CMD_DB_BCT.csv"  # block cmd table
+    return sgc_db_path, bct_db_path
 
-    tlm_db = LoadTlmCSV_(
-        tlm_db_path,
-        settings["db_prefix"],
-        settings["tlm_id_range"],
-        settings["input_file_encoding"],
-    )
 
-    other_obc_dbs = {}
-    if settings["is_main_obc"]:
-        other_obc_dbs = LoadOtherObcTlm(settings)
+def GetTlmCsvPaths(tlm_db_path, db_prefix):
+    return [tlm_sheet_path for _, tlm_sheet_path in GetTlmSheets(tlm_db_path, db_prefix)]
 
-    # TODO: 重複チェックをする
 
-    return {"tlm": tlm_db, "other_obc": other_obc_dbs}
+def GetTlmSheets(tlm_db_path, db_prefix):
+    # 戻り値: [(テレメ名, CSV のパス)]（テレメ名順）
+    tlm_names = GetTlmNames_(tlm_db_path, db_prefix)
+    return [
+        (tlm_name, tlm_db_path + db_prefix + "_TLM_DB_" + tlm_name + ".csv")
+        for tlm_name in tlm_names
+    ]
 
 
-def LoadTlmCSV_(tlm_db_path, db_prefix, tlm_id_range, encoding):
+def GetTlmNames_(tlm_db_path, db_prefix):
     tlm_names = [file for file in os.listdir(tlm_db_path) if file.endswith(".csv")]
     regex = r"^" + db_prefix + "_TLM_DB_"
     tlm_names = [re.sub(regex, "", file) for file in tlm_names]
     tlm_names = [re.sub(".csv$", "", file) for file in tlm_names]
+    return sorted(tlm_names)
+
+
+def LoadTlmDb(settings):
+    # 複数 OBC の DB も同一の worker pool に投入し，並列に読み込む
+    with CreateExecutor_(settings) as executor:
+        tlm_db_job = SubmitTlmCSV_(
+            executor,
+            settings["path_to_db"],
+            settings["db_prefix"],
+            settings["input_file_encoding"],
+            IsSnapshotEnabled_(settings),
+        )
+
+        other_obc_dbs = {}
+        if settings["is_main_obc"]:
+            other_obc_dbs = LoadOtherObcTlm(settings, executor)
+
+        tlm_db = CollectTlmCSV_(tlm_db_job, settings["db_prefix"], settings["tlm_id_range"])
+
+    # TODO: 重複チェックをする
+
+    return {"tlm": tlm_db, "other_obc": other_obc_dbs}
+
+
+def SubmitTlmCSV_(executor, path_to_db, db_prefix, encoding, is_snapshot_enabled):
+    # 戻り値の job を CollectTlmCSV_ に渡して結果を得る
+    tlm_db_path = path_to_db + r"TLM_DB/calced_data/"
+    tlm_names = GetTlmNames_(tlm_db_path, db_prefix)
     # pprint.pprint(tlm_names)
     # print(len(tlm_names))
 
-    tlm_db = []
+    job = {"tlm_db": None, "futures": [], "snapshot": None}
+
+    if is_snapshot_enabled:
+        tlm_sheet_paths = GetTlmCsvPaths(tlm_db_path, db_prefix)
+        snapshot_path = my_mod.db_snapshot.GetSnapshotPath(path_to_db, db_prefix + "_TLM_DB")
+        snapshot_key = {"db_prefix": db_prefix, "encoding": encoding}
+        job["tlm_db"] = my_mod.db_snapshot.LoadSnapshot(
+            snapshot_path, tlm_sheet_paths, snapshot_key
+        )
+        if job["tlm_db"] is not None:
+            return job
+        job["snapshot"] = {
+            "path": snapshot_path,
+            "key": snapshot_key,
+            "sources": my_mod.db_snapshot.GetSources(tlm_sheet_paths),
+        }
 
     for tlm_name in tlm_names:
-        tlm_sheet_path = tlm_db_path + db_prefix + "_TLM_DB_" + tlm_name + ".csv"
-        with open(tlm_sheet_path, mode="r", encoding=encoding) as fh:
-            reader = csv.reader(fh)
-            sheet = [[s.strip() for s in row] for row in reader]
-            # pprint.pprint(sheet)
-            # print(sheet)
-            enable_flag = sheet[2][2]  # FIXME: Enable/Disable を取得．マジックナンバーで指定してしまってる．
-            if enable_flag != "ENABLE":
-                continue
-            tlm_id = sheet[1][2]  # FIXME: テレメIDを取得．マジックナンバーで指定してしまってる．
-            if not int(tlm_id_range[0], 0) <= int(tlm_id, 0) < int(tlm_id_range[1], 0):
-                print(
-                    "Error: TLM ID is invalid at " + db_prefix + "_TLM_DB_" + tlm_name + ".csv",
-                    file=sys.stderr,
-                )
-                sys.exit(1)
-            raw_local_vars = (
-                sheet[1][3].replace("%%", "").split("##")
-            )  # FIXME: ローカル変数を取得．マジックナンバーで指定してしまってる．
-            local_vars = []
-            for raw_local_var in raw_local_vars:
-                local_var = raw_local_var.strip().replace("@@", ",")
-                if len(local_var) > 0:
-                    local_vars.append(local_var)
-            tlm_db.append(
-                {"tlm_id": tlm_id, "tlm_name": tlm_name, "local_vars": local_vars, "data": sheet}
+        job["futures"].append(
+            executor.submit(LoadTlmSheet_, tlm_db_path, db_prefix, tlm_name, encoding)
+        )
+    return job
+
+
+def CollectTlmCSV_(job, db_prefix, tlm_id_range):
+    tlm_db = job["tlm_db"]
+
+    if tlm_db is None:
+        # 投入順（ファイル名順）に回収するので，worker 数によらず結果は決定的
+        tlm_db = []
+        for tlm_db_future in job["futures"]:
+            tlm = tlm_db_future.result()
+            if tlm is not None:
+                tlm_db.append(tlm)
+
+        tlm_db.sort(key=lambda x: x.tlm_id)
+
+        snapshot = job["snapshot"]
+        if snapshot is not None:
+            my_mod.db_snapshot.SaveSnapshot(
+                snapshot["path"], snapshot["sources"], snapshot["key"], tlm_db
             )
-            # tlm_db.append({'tlm_id': tlm_id, 'tlm_name': tlm_name, 'data': 1})
 
-    tlm_db.sort(key=lambda x: x["tlm_id"])
+    # tlm_id_range は設定なので，スナップショットから読み込んだ場合もチェックする
+    CheckTlmIdRange(tlm_db, db_prefix, tlm_id_range)
 
     return tlm_db
 
 
+def CheckTlmIdRange(tlm_db, db_prefix, tlm_id_range):
+    for tlm in tlm_db:
+        if not int(tlm_id_range[0], 0) <= int(tlm.tlm_id, 0) < int(tlm_id_range[1], 0):
+            print(
+                "Error: TLM ID is invalid at " + db_prefix + "_TLM_DB_" + tlm.tlm_name + ".csv",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+
+def LoadTlmSheet_(tlm_db_path, db_prefix, tlm_name, encoding):
+    # worker process で実行されるため，引数と戻り値は pickle 可能なものに限る
+    tlm_sheet_path = tlm_db_path + db_prefix + "_TLM_DB_" + tlm_name + ".csv"
+    return LoadTlmCSV(tlm_sheet_path, tlm_name, encoding)
+
+
+def LoadTlmCSV(tlm_sheet_path, tlm_name, encoding):
+    # Disable なテレメの場合は None を返す
+    with open(tlm_sheet_path, mode="r", encoding=encoding) as fh:
+        reader = csv.reader(fh)
+        sheet = [[s.strip() for s in row] for row in reader]
+    # pprint.pprint(sheet)
+    # print(sheet)
+    enable_flag = sheet[2][2]  # FIXME: Enable/Disable を取得．マジックナンバーで指定してしまってる．
+    if enable_flag != "ENABLE":
+        return None
+    return my_mod.db_model.ParseTlmSheet(sheet, tlm_name)
+
+
+class SerialExecutor_:
+    # num_workers が 1 の場合に使う，submit 時にその場で実行する executor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def submit(self, fn, *args):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def IsSnapshotEnabled_(settings):
+    # is_db_snapshot_enabled: パース済み DB のスナップショットを使うか？（デフォルト 0）
+    return settings.get("is_db_snapshot_enabled", 0)
+
+
+def CreateExecutor_(settings):
+    # num_workers: DB 読み込みの並列数．1（デフォルト）なら逐次，0 なら CPU 数
+    num_workers = settings.get("num_workers", 1)
+    if num_workers == 0:
+        num_workers = os.cpu_count() or 1
+    if num_workers <= 1:
+        return SerialExecutor_()
+    return concurrent.futures.ProcessPoolExecutor(max_workers=num_workers)
+
+
 def LoadOtherObcCmd_(settings):
     other_obc_dbs = {}
 
     for i in range(len(settings["other_obc_data"])):
         if not settings["other_obc_data"][i]["is_enable"]:
             continue
-        cmd_db_path = settings["other_obc_data"][i]["path_to_db"] + r"CMD_DB/"
         sgc_db, bct_db = LoadCmdCSV_(
-            cmd_db_path,
+            settings["other_obc_data"][i]["path_to_db"],
             settings["other_obc_data"][i]["db_prefix"],
             settings["other_obc_data"][i]["input_file_encoding"],
+            IsSnapshotEnabled_(settings),
         )
         # other_obc_dbs.append(sgc_db)
         other_obc_dbs[settings["other_obc_data"][i]["name"]] = sgc_db
@@ -128,31 +256,45 @@ def LoadOtherObcCmd_(settings):
     return other_obc_dbs
 
 
-def LoadOtherObcTlm(settings):
-    other_obc_dbs = {}
+def LoadOtherObcTlm(settings, executor=None):
+    if executor is None:
+        executor = SerialExecutor_()
+
+    other_obc_tlm_db_jobs = {}
 
     for i in range(len(settings["other_obc_data"])):
         other_obc_settings = settings["other_obc_data"][i]
         if not other_obc_settings["is_enable"]:
             continue
 
-        # max_tlm_num のアサーション
-        if other_obc_settings["max_tlm_num"] < int(other_obc_settings["tlm_id_range"][1], 0):
-            print(
-                "Error: max_tlm_num is invalid at " + other_obc_settings["name"] + " DB.",
-                file=sys.stderr,
-            )
-            sys.exit(1)
-
-        tlm_db_path = other_obc_settings["path_to_db"] + r"TLM_DB/calced_data/"
+        CheckMaxTlmNum(other_obc_settings)
+
+        other_obc_tlm_db_jobs[other_obc_settings["name"]] = (
+            SubmitTlmCSV_(
+                executor,
+                other_obc_settings["path_to_db"],
+                other_obc_settings["db_prefix"],
+                other_obc_settings["input_file_encoding"],
+                IsSnapshotEnabled_(settings),
+            ),
+            other_obc_settings,
+        )
 
-        tlm_db = LoadTlmCSV_(
-            tlm_db_path,
-            other_obc_settings["db_prefix"],
-            other_obc_settings["tlm_id_range"],
-            other_obc_settings["input_file_encoding"],
+    other_obc_dbs = {}
+    for name, (tlm_db_job, other_obc_settings) in other_obc_tlm_db_jobs.items():
+        other_obc_dbs[name] = CollectTlmCSV_(
+            tlm_db_job, other_obc_settings["db_prefix"], other_obc_settings["tlm_id_range"]
         )
-        other_obc_dbs[other_obc_settings["name"]] = tlm_db
 
     # pprint.pprint(other_obc_dbs)
     return other_obc_dbs
+
+
+def CheckMaxTlmNum(other_obc_settings):
+    # max_tlm_num のアサーション
+    if other_obc_settings["max_tlm_num"] < int(other_obc_settings["tlm_id_range"][1], 0):
+        print(
+            "Error: max_tlm_num is invalid at " + other_obc_settings["name"] + " DB.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
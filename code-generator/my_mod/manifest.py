@@ -0,0 +1,99 @@
+# coding: UTF-8
+"""
+差分生成のための manifest
+入力 (CSV, settings, 生成スクリプト, ヘッダに出力する DB の MD5 など) のハッシュと，出力ファイルのハッシュを記録し，
+入力が変化していない generator の再実行をスキップする
+"""
+
+import glob
+import hashlib
+import json
+import os
+
+import my_mod.db_fingerprint
+
+MANIFEST_VERSION = 1
+
+
+def CreateManifest():
+    return {"version": MANIFEST_VERSION, "targets": {}}
+
+
+def LoadManifest(path):
+    # 読めない / 形式が古い manifest は空として扱う（すべて再生成される）
+    try:
+        with open(path, mode="r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return CreateManifest()
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return CreateManifest()
+    return manifest
+
+
+def SaveManifest(path, manifest):
+    with open(path, mode="w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+def CalcInputHash(settings, key, input_files, note_inputs):
+    # note_inputs: 生成ファイルのヘッダ（note）に出力される，DB 全体の MD5 などの値
+    md5 = hashlib.md5()
+    md5.update(("v" + str(MANIFEST_VERSION) + "\n" + key + "\n").encode("utf-8"))
+    md5.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    md5.update(GetGeneratorSourceHash().encode("utf-8"))
+    md5.update(json.dumps(note_inputs).encode("utf-8"))
+    for path in sorted(input_files):
+        if os.path.exists(path):
+            input_md5 = my_mod.db_fingerprint.CalcCsvMd5(path)
+        else:
+            input_md5 = "missing"
+        md5.update(("\n" + path + ":" + input_md5).encode("utf-8"))
+    return md5.hexdigest()
+
+
+def IsUpToDate(manifest, settings, key, input_hash):
+    entry = GetTarget_(manifest, settings).get(key)
+    if entry is None or entry["input_hash"] != input_hash:
+        return False
+    # 出力が消された，あるいは手で編集された場合も再生成する
+    for path, md5 in entry["outputs"].items():
+        if CalcFileMd5_(path) != md5:
+            return False
+    return True
+
+
+def RecordGenerator(manifest, settings, key, input_hash, outputs):
+    GetTarget_(manifest, settings)[key] = {"input_hash": input_hash, "outputs": dict(outputs)}
+
+
+def GetTarget_(manifest, settings):
+    # settings_mobc.json / settings_subobc.json を切り替えて使っても衝突しないように，出力先ごとに記録する
+    target = os.path.normpath(settings["path_to_src"]).replace("\\", "/")
+    return manifest["targets"].setdefault(target, {})
+
+
+def CalcFileMd5_(path):
+    try:
+        with open(path, mode="rb") as fh:
+            return hashlib.md5(fh.read()).hexdigest()
+    except OSError:
+        return "missing"
+
+
+_generator_source_hash = None
+
+
+def GetGeneratorSourceHash():
+    # 生成スクリプト自体が更新された場合も再生成する
+    global _generator_source_hash
+    if _generator_source_hash is None:
+        my_mod_dir = os.path.dirname(os.path.abspath(__file__))
+        sources = sorted(glob.glob(os.path.join(my_mod_dir, "*.py")))
+        sources.append(os.path.join(os.path.dirname(my_mod_dir), "GenerateC2ACode.py"))
+        md5 = hashlib.md5()
+        for source in sources:
+            md5.update(CalcFileMd5_(source).encode("utf-8"))
+        _generator_source_hash = md5.hexdigest()
+    return _generator_source_hash
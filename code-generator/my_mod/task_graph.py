@@ -0,0 +1,80 @@
+# coding: UTF-8
+"""
+タスクグラフ
+依存関係をもつタスクを worker pool（スレッド）で実行する．依存先がすべて完了したタスクから投入する
+あるタスクが失敗しても，それに依存しないタスクは実行を続け，エラーはまとめて返す
+"""
+
+import concurrent.futures
+import os
+
+
+def RunTasks(tasks, num_workers=1):
+    # tasks:       {タスク名: {"deps": [依存先のタスク名], "func": func}}
+    #              func は {依存先のタスク名: 依存先の戻り値} を引数にとる
+    # num_workers: スレッド数．0 の場合は CPU 数
+    # 戻り値:      (results, errors)
+    #              results: {タスク名: 戻り値}（成功したタスクのみ）
+    #              errors:  [(タスク名, 例外)]（tasks の順）．依存先が失敗したタスクは実行されず，errors にも含まない
+    order = SortTasks_(tasks)
+    if num_workers == 0:
+        num_workers = os.cpu_count() or 1
+
+    results = {}
+    errors = {}
+    failed = set()
+    pending = order
+    running = {}  # {future: タスク名}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+        while pending or running:
+            # pending はトポロジカル順なので，1 回走査すれば失敗の伝搬も完了する
+            next_pending = []
+            for name in pending:
+                deps = tasks[name]["deps"]
+                if any(dep in failed for dep in deps):
+                    failed.add(name)
+                elif all(dep in results for dep in deps):
+                    dep_results = {dep: results[dep] for dep in deps}
+                    running[executor.submit(tasks[name]["func"], dep_results)] = name
+                else:
+                    next_pending.append(name)
+            pending = next_pending
+
+            if not running:
+                break
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except (Exception, SystemExit) as e:
+                    # 既存の処理の sys.exit(1) も，そのタスクの失敗として扱う（メッセージは出力済み）
+                    errors[name] = e
+                    failed.add(name)
+
+    return results, [(name, errors[name]) for name in tasks if name in errors]
+
+
+def SortTasks_(tasks):
+    # トポロジカルソート（同順位は tasks の順）
+    order = []
+    state = {}  # {タスク名: "visiting" or "done"}
+
+    def _(name, path):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError("task graph has a cycle: " + " -> ".join(path + [name]))
+        state[name] = "visiting"
+        for dep in tasks[name]["deps"]:
+            if dep not in tasks:
+                raise ValueError("unknown task: " + dep + " (required by " + name + ")")
+            _(dep, path + [name])
+        state[name] = "done"
+        order.append(name)
+
+    for name in tasks:
+        _(name, [])
+    return order
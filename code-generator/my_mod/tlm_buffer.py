@@ -3,466 +3,1002 @@
 tlm buffer
 """
 
-import sys
+import my_mod.emitter
 import my_mod.util
 
 # from collections import OrderedDict
 # import pprint
 
 
-def GenerateTlmBuffer(settings, other_obc_dbs):
-    DATA_START_ROW = 8
+CONV_TYPE_TO_TEMP = {
+    "int8_t": "temp_i8",
+    "int16_t": "temp_i16",
+    "int32_t": "temp_i32",
+    "uint8_t": "temp_u8",
+    "uint16_t": "temp_u16",
+    "uint32_t": "temp_u32",
+    "float": "temp_f",
+    "double": "temp_d",
+}
+CONV_TYPE_TO_SIZE = {
+    "int8_t": 1,
+    "int16_t": 2,
+    "int32_t": 4,
+    "uint8_t": 1,
+    "uint16_t": 2,
+    "uint32_t": 4,
+    "float": 4,
+    "double": 8,
+}
+
 
+def GenerateTlmBuffer(settings, other_obc_dbs):
     for i in range(len(settings["other_obc_data"])):
         if not settings["other_obc_data"][i]["is_enable"]:
             continue
         obc_name = settings["other_obc_data"][i]["name"]
-        driver_type = settings["other_obc_data"][i]["driver_type"]
-        driver_name = settings["other_obc_data"][i]["driver_name"]
-        max_tlm_num = settings["other_obc_data"][i]["max_tlm_num"]
-
-        tlm_db = other_obc_dbs[obc_name]
-
-        body_c = ""
-        body_h = ""
-        tlmdef_body_h = ""
-
-        body_c += (
-            "static void {_obc_name_upper}_copy_packet_to_tlm_buffer_(const CommonTlmPacket* packet, {_obc_name_upper}_TLM_CODE tlm_id, "
+        GenerateTlmBufferOfObc(settings, i, other_obc_dbs[obc_name])
+
+
+def GenerateTlmBufferOfObc(settings, obc_idx, tlm_db):
+    # OBC ごとに独立しているので，OBC ごとに並列に実行してよい
+    obc_name = settings["other_obc_data"][obc_idx]["name"]
+    driver_type = settings["other_obc_data"][obc_idx]["driver_type"]
+    driver_name = settings["other_obc_data"][obc_idx]["driver_name"]
+    max_tlm_num = settings["other_obc_data"][obc_idx]["max_tlm_num"]
+    is_tlm_analyze_coalesced = settings["other_obc_data"][obc_idx].get(
+        "is_tlm_analyze_coalesced", 0
+    )
+    is_tlm_dispatch_table = settings["other_obc_data"][obc_idx].get("is_tlm_dispatch_table", 0)
+    # 省略時は TLM ID ごとにスロットをもつ（compact でない）バッファとする
+    tlm_buffer_pool_num = settings["other_obc_data"][obc_idx].get("tlm_buffer_pool_num", None)
+    is_tlm_buffer_compact = tlm_buffer_pool_num is not None
+    if is_tlm_buffer_compact:
+        slot_type = GetCompactTlmBufferSlotType_(obc_name, tlm_db, tlm_buffer_pool_num)
+    # tlm_data へのパースを，受信時ではなく，アクセサで初めて読み出されたときに行うか？
+    is_tlm_decode_lazy = (
+        settings["other_obc_data"][obc_idx].get("is_tlm_decode_lazy", 0) and len(tlm_db) > 0
+    )
+    layout_checks = []  # [(先頭のメンバ, 末尾のメンバ, 要素のサイズ, 要素数)]
+
+    body_c = my_mod.emitter.Emitter(obc_name)
+    body_h = my_mod.emitter.Emitter(obc_name)
+    tlmdef_body_h = my_mod.emitter.Emitter(obc_name)
+
+    body_c.Emit(
+        "static void {_obc_name_upper}_copy_packet_to_tlm_buffer_(const CommonTlmPacket* packet, {_obc_name_upper}_TLM_CODE tlm_id, "
+        + driver_type
+        + "* "
+        + driver_name
+        + ");\n"
+    )
+    for tlm in tlm_db:
+        tlm_name = tlm.tlm_name
+        tlm_name_lower = tlm_name.lower()
+        body_c.Emit(
+            "static CDS_ERR_CODE {_obc_name_upper}_analyze_tlm_"
+            + tlm_name_lower
+            + "_(const CommonTlmPacket* packet, {_obc_name_upper}_TLM_CODE tlm_id, "
             + driver_type
             + "* "
             + driver_name
             + ");\n"
         )
-        for tlm in tlm_db:
-            tlm_name = tlm["tlm_name"]
-            tlm_name_lower = tlm_name.lower()
-            body_c += (
-                "static CDS_ERR_CODE {_obc_name_upper}_analyze_tlm_"
-                + tlm_name_lower
-                + "_(const CommonTlmPacket* packet, {_obc_name_upper}_TLM_CODE tlm_id, "
-                + driver_type
-                + "* "
-                + driver_name
-                + ");\n"
-            )
-
-        body_c += "\n"
-        body_c += "static CommonTlmPacket {_obc_name_upper}_ctp_;\n"
-        body_c += "\n"
-
-        body_h += "typedef struct " + driver_type + " " + driver_type + ";\n"
-        body_h += "\n"
-        body_h += "#define {_obc_name_upper}_MAX_TLM_NUM (" + str(max_tlm_num) + ")\n"
-        body_h += "\n"
-        body_h += "typedef struct\n"
-        body_h += "{{\n"
-        body_h += "  CommonTlmPacket packet;   //!< 最新のテレメパケットを保持\n"
-        body_h += "  uint8_t is_null_packet;   //!< 一度でもテレメを受信しているか？（空配列が読み出されるのを防ぐため）\n"
-        body_h += "}} {_obc_name_upper}_TlmBufferElem;\n"
-        body_h += "\n"
-        body_h += "typedef struct\n"
-        body_h += "{{\n"
-        body_h += "  {_obc_name_upper}_TlmBufferElem tlm[{_obc_name_upper}_MAX_TLM_NUM];   //!< TLM ID ごとに保持\n"
-        body_h += "}} {_obc_name_upper}_TlmBuffer;\n"
-        body_h += "\n"
-
-        tlmdef_body_h += "typedef struct\n"
-        tlmdef_body_h += "{{\n"
-        for tlm in tlm_db:
-            tlm_name = tlm["tlm_name"]
-            tlm_name_lower = tlm_name.lower()
-
-            # pprint.pprint(tlm['data'][DATA_START_ROW:])
-            last_var_type = ""
-            tlm_struct_tree = {}  # python3.7以上を想定しているので，キーの順番は保存されていることが前提
-            # tlm_struct_tree = collections.OrderedDict()     # やっぱこっちで
-            for j in range(DATA_START_ROW, len(tlm["data"])):
-                comment = tlm["data"][j][0]
-                name = EscapeTlmElemName_(tlm["data"][j][1])
-                var_type = tlm["data"][j][2]
-                if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
-                    break
-                if comment != "":
-                    continue
-                if name == "":
-                    continue
-                if var_type == "":
-                    var_type = last_var_type
-                last_var_type = var_type
-                if last_var_type == "":
-                    continue
-
-                # name_tree = name.lower().split(".")[2:]     # OBC名.テレメ名.HOGE.FUGA を想定
-                name_tree = name.lower().split(".")
-                name_path = "/".join(name_tree)
-                if SetStructTree_(tlm_struct_tree, name_path, var_type):
-                    print("Error: Tlm DB Struct Parse Err at " + name, file=sys.stderr)
-                    sys.exit(1)
-
-            # pprint.pprint(tlm_struct_tree)
-            # for k, v in tlm_struct_tree.items():
-            #     print(k)
-            #     print(v)
-            #     print("")
-
-            tlmdef_body_h += GenerateStructDef_(tlm_struct_tree, tlm_name_lower)
-
-        tlmdef_body_h += "}} {_obc_name_upper}_TlmData;\n"
-
-        body_h += (
-            "void {_obc_name_upper}_init_tlm_buffer(" + driver_type + "* " + driver_name + ");\n"
+    if is_tlm_decode_lazy:
+        GenerateLazyTlmDecodeProto_(body_c, tlm_db, driver_type, driver_name)
+    body_c.Emit("\n")
+    body_c.Emit("static CommonTlmPacket {_obc_name_upper}_ctp_;\n")
+    body_c.Emit("\n")
+    if is_tlm_dispatch_table:
+        GenerateTlmDispatchTable_(body_c, tlm_db, driver_type, driver_name, max_tlm_num)
+
+    body_h.Emit("typedef struct " + driver_type + " " + driver_type + ";\n")
+    body_h.Emit("\n")
+    body_h.Emit("#define {_obc_name_upper}_MAX_TLM_NUM (" + str(max_tlm_num) + ")\n")
+    if is_tlm_buffer_compact:
+        GenerateCompactTlmBufferDefine_(body_h, tlm_db, tlm_buffer_pool_num, slot_type)
+    body_h.Emit("\n")
+    body_h.Emit("typedef struct\n")
+    body_h.Emit("{\n")
+    body_h.Emit("  CommonTlmPacket packet;   //!< 最新のテレメパケットを保持\n")
+    body_h.Emit("  uint8_t is_null_packet;   //!< 一度でもテレメを受信しているか？（空配列が読み出されるのを防ぐため）\n")
+    body_h.Emit("} {_obc_name_upper}_TlmBufferElem;\n")
+    body_h.Emit("\n")
+    if is_tlm_decode_lazy:
+        GenerateLazyTlmDecodeDirtyFlags_(body_h, tlm_db)
+    body_h.Emit("typedef struct\n")
+    body_h.Emit("{\n")
+    if is_tlm_buffer_compact:
+        GenerateCompactTlmBufferMember_(body_h, slot_type)
+    else:
+        body_h.Emit(
+            "  {_obc_name_upper}_TlmBufferElem tlm[{_obc_name_upper}_MAX_TLM_NUM];   //!< TLM ID ごとに保持\n"
         )
-        body_h += "\n"
-        body_h += (
-            "CDS_ERR_CODE {_obc_name_upper}_buffer_tlm_packet(CDS_StreamConfig* p_stream_config, "
-            + driver_type
-            + "* "
-            + driver_name
-            + ");\n"
-        )
-        body_h += "\n"
-        body_h += (
-            "TF_TLM_FUNC_ACK {_obc_name_upper}_pick_up_tlm_buffer(const "
-            + driver_type
-            + "* "
-            + driver_name
-            + ", {_obc_name_upper}_TLM_CODE tlm_id, uint8_t* packet, uint16_t* len, uint16_t max_len);\n"
+    if is_tlm_decode_lazy:
+        body_h.Emit(
+            "  {_obc_name_upper}_TlmDataDirtyFlags is_tlm_data_dirty;   //!< 受信後，tlm_data へパースしていないテレメ\n"
         )
+    body_h.Emit("} {_obc_name_upper}_TlmBuffer;\n")
+    body_h.Emit("\n")
+
+    tlm_structs = []  # [(テレメ名, struct の木)]
+    for tlm in tlm_db:
+        tlm_name = tlm.tlm_name
+        tlm_name_lower = tlm_name.lower()
+
+        tlm_struct_tree = {}  # python3.7以上を想定しているので，キーの順番は保存されていることが前提
+        # tlm_struct_tree = collections.OrderedDict()     # やっぱこっちで
+        for field in tlm.fields:
+            name = EscapeTlmElemName_(field.name)
+            var_type = field.packed_var_type
+            if var_type == "":
+                continue
 
-        body_c += (
-            "void {_obc_name_upper}_init_tlm_buffer(" + driver_type + "* " + driver_name + ")\n"
+            # name_tree = name.lower().split(".")[2:]     # OBC名.テレメ名.HOGE.FUGA を想定
+            name_tree = name.lower().split(".")
+            name_path = "/".join(name_tree)
+            if SetStructTree_(tlm_struct_tree, name_path, var_type):
+                raise my_mod.util.GenerateError("Tlm DB Struct Parse Err at " + name)
+
+        # pprint.pprint(tlm_struct_tree)
+        # for k, v in tlm_struct_tree.items():
+        #     print(k)
+        #     print(v)
+        #     print("")
+
+        tlm_structs.append((tlm_name, tlm_struct_tree))
+
+    if is_tlm_decode_lazy:
+        # アクセサがテレメごとの struct へのポインタを返せるように，テレメごとに型を定義する
+        for tlm_name, tlm_struct_tree in tlm_structs:
+            GenerateStructDef_(
+                tlmdef_body_h, tlm_struct_tree, GetLazyTlmDataTypeName_(tlm_name), is_typedef=True
+            )
+            tlmdef_body_h.Emit("\n")
+    tlmdef_body_h.Emit("typedef struct\n")
+    tlmdef_body_h.Emit("{\n")
+    for tlm_name, tlm_struct_tree in tlm_structs:
+        if is_tlm_decode_lazy:
+            tlmdef_body_h.Emit(
+                "  " + GetLazyTlmDataTypeName_(tlm_name) + " " + tlm_name.lower() + ";\n"
+            )
+        else:
+            GenerateStructDef_(tlmdef_body_h, tlm_struct_tree, tlm_name.lower())
+    tlmdef_body_h.Emit("} {_obc_name_upper}_TlmData;\n")
+
+    body_h.Emit(
+        "void {_obc_name_upper}_init_tlm_buffer(" + driver_type + "* " + driver_name + ");\n"
+    )
+    body_h.Emit("\n")
+    body_h.Emit(
+        "CDS_ERR_CODE {_obc_name_upper}_buffer_tlm_packet(CDS_StreamConfig* p_stream_config, "
+        + driver_type
+        + "* "
+        + driver_name
+        + ");\n"
+    )
+    body_h.Emit("\n")
+    body_h.Emit(
+        "TF_TLM_FUNC_ACK {_obc_name_upper}_pick_up_tlm_buffer(const "
+        + driver_type
+        + "* "
+        + driver_name
+        + ", {_obc_name_upper}_TLM_CODE tlm_id, uint8_t* packet, uint16_t* len, uint16_t max_len);\n"
+    )
+    if is_tlm_decode_lazy:
+        GenerateLazyTlmDataAccessorProto_(body_h, tlm_db, driver_type, driver_name)
+
+    body_c.Emit(
+        "void {_obc_name_upper}_init_tlm_buffer(" + driver_type + "* " + driver_name + ")\n"
+    )
+    body_c.Emit("{\n")
+    body_c.Emit("  // packet などは，上位の driver の初期化で driver もろとも memset 0x00 されていると期待して，ここではしない\n")
+    body_c.Emit("  int i = 0;\n")
+    if is_tlm_buffer_compact:
+        GenerateCompactTlmBufferInit_(body_c, tlm_db, driver_name)
+    else:
+        body_c.Emit("  for (i = 0; i < {_obc_name_upper}_MAX_TLM_NUM; ++i)\n")
+        body_c.Emit("  {\n")
+        body_c.Emit("    " + driver_name + "->tlm_buffer.tlm[i].is_null_packet = 1;\n")
+        body_c.Emit("  }\n")
+    if is_tlm_decode_lazy:
+        GenerateLazyTlmDecodeInit_(body_c, tlm_db, driver_name)
+    body_c.Emit("}\n")
+    body_c.Emit("\n")
+    body_c.Emit(
+        "CDS_ERR_CODE {_obc_name_upper}_buffer_tlm_packet(CDS_StreamConfig* p_stream_config, "
+        + driver_type
+        + "* "
+        + driver_name
+        + ")\n"
+    )
+    body_c.Emit("{\n")
+
+    body_c.Emit("  {_obc_name_upper}_TLM_CODE tlm_id;\n")
+    body_c.Emit("  CDS_ERR_CODE ret;\n")
+    body_c.Emit("\n")
+    body_c.Emit("  ret = CDRV_CTP_get_ctp(p_stream_config, &{_obc_name_upper}_ctp_);\n")
+    body_c.Emit("  if (ret != CDS_ERR_CODE_OK) return ret;\n")
+    body_c.Emit("\n")
+    body_c.Emit("  tlm_id  = ({_obc_name_upper}_TLM_CODE)CTP_get_id(&{_obc_name_upper}_ctp_);\n")
+    body_c.Emit("\n")
+
+    if is_tlm_dispatch_table:
+        body_c.Emit(
+            "  if (tlm_id < {_obc_name_upper}_MAX_TLM_NUM && {_obc_name_upper}_analyze_tlm_table_[tlm_id] != NULL)\n"
         )
-        body_c += "{{\n"
-        body_c += "  // packet などは，上位の driver の初期化で driver もろとも memset 0x00 されていると期待して，ここではしない\n"
-        body_c += "  int i = 0;\n"
-        body_c += "  for (i = 0; i < {_obc_name_upper}_MAX_TLM_NUM; ++i)\n"
-        body_c += "  {{\n"
-        body_c += "    " + driver_name + "->tlm_buffer.tlm[i].is_null_packet = 1;\n"
-        body_c += "  }}\n"
-        body_c += "}}\n"
-        body_c += "\n"
-        body_c += (
-            "CDS_ERR_CODE {_obc_name_upper}_buffer_tlm_packet(CDS_StreamConfig* p_stream_config, "
-            + driver_type
-            + "* "
+        body_c.Emit("  {\n")
+        body_c.Emit(
+            "    return {_obc_name_upper}_analyze_tlm_table_[tlm_id](&{_obc_name_upper}_ctp_, tlm_id, "
             + driver_name
-            + ")\n"
+            + ");\n"
         )
-        body_c += "{{\n"
-
-        body_c += "  {_obc_name_upper}_TLM_CODE tlm_id;\n"
-        body_c += "  CDS_ERR_CODE ret;\n"
-        body_c += "\n"
-        body_c += "  ret = CDRV_CTP_get_ctp(p_stream_config, &{_obc_name_upper}_ctp_);\n"
-        body_c += "  if (ret != CDS_ERR_CODE_OK) return ret;\n"
-        body_c += "\n"
-        body_c += "  tlm_id  = ({_obc_name_upper}_TLM_CODE)CTP_get_id(&{_obc_name_upper}_ctp_);\n"
-        body_c += "\n"
-
-        body_c += "  switch (tlm_id)\n"
-        body_c += "  {{\n"
+        body_c.Emit("  }\n")
+    else:
+        body_c.Emit("  switch (tlm_id)\n")
+        body_c.Emit("  {\n")
         for tlm in tlm_db:
-            tlm_name = tlm["tlm_name"]
+            tlm_name = tlm.tlm_name
             tlm_name_upper = tlm_name.upper()
             tlm_name_lower = tlm_name.lower()
-            body_c += "  case {_obc_name_upper}_Tlm_CODE_" + tlm_name_upper + ":\n"
-            body_c += (
+            body_c.Emit("  case {_obc_name_upper}_Tlm_CODE_" + tlm_name_upper + ":\n")
+            body_c.Emit(
                 "    return {_obc_name_upper}_analyze_tlm_"
                 + tlm_name_lower
                 + "_(&{_obc_name_upper}_ctp_, tlm_id, "
                 + driver_name
                 + ");\n"
             )
-        body_c += "  default:\n"
-        body_c += "    // DO NOTHING\n"
-        body_c += "    break;\n"
-        body_c += "  }}\n"
-        body_c += "\n"
-        body_c += "  " + settings["other_obc_data"][i]["code_when_tlm_not_found"] + "\n"
-        body_c += "\n"
-        body_c += "  if (tlm_id >= {_obc_name_upper}_MAX_TLM_NUM)\n"
-        body_c += "  {{\n"
-        body_c += "    return CDS_ERR_CODE_ERR;\n"
-        body_c += "  }}\n"
-        body_c += "  else\n"
-        body_c += "  {{\n"
-        body_c += "    // MOBC 側に定義がない tlm でも， GS まで届けられるようにバッファリングはする\n"
-        body_c += (
-            "    {_obc_name_upper}_copy_packet_to_tlm_buffer_(&{_obc_name_upper}_ctp_, tlm_id, "
-            + driver_name
-            + ");\n"
+        body_c.Emit("  default:\n")
+        body_c.Emit("    // DO NOTHING\n")
+        body_c.Emit("    break;\n")
+        body_c.Emit("  }\n")
+    body_c.Emit("\n")
+    body_c.Emit("  " + settings["other_obc_data"][obc_idx]["code_when_tlm_not_found"] + "\n")
+    body_c.Emit("\n")
+    body_c.Emit("  if (tlm_id >= {_obc_name_upper}_MAX_TLM_NUM)\n")
+    body_c.Emit("  {\n")
+    body_c.Emit("    return CDS_ERR_CODE_ERR;\n")
+    body_c.Emit("  }\n")
+    body_c.Emit("  else\n")
+    body_c.Emit("  {\n")
+    body_c.Emit("    // MOBC 側に定義がない tlm でも， GS まで届けられるようにバッファリングはする\n")
+    body_c.Emit(
+        "    {_obc_name_upper}_copy_packet_to_tlm_buffer_(&{_obc_name_upper}_ctp_, tlm_id, "
+        + driver_name
+        + ");\n"
+    )
+    body_c.Emit("    return CDS_ERR_CODE_OK;\n")
+    body_c.Emit("  }\n")
+    body_c.Emit("}\n")
+    body_c.Emit("\n")
+    body_c.Emit(
+        "static void {_obc_name_upper}_copy_packet_to_tlm_buffer_(const CommonTlmPacket* packet, {_obc_name_upper}_TLM_CODE tlm_id, "
+        + driver_type
+        + "* "
+        + driver_name
+        + ")\n"
+    )
+    body_c.Emit("{\n")
+    if is_tlm_buffer_compact:
+        GenerateCompactTlmBufferCopy_(body_c, driver_name, tlm_buffer_pool_num, slot_type)
+    else:
+        body_c.Emit(
+            "  CTP_copy_packet(&(" + driver_name + "->tlm_buffer.tlm[tlm_id].packet), packet);\n"
         )
-        body_c += "    return CDS_ERR_CODE_OK;\n"
-        body_c += "  }}\n"
-        body_c += "}}\n"
-        body_c += "\n"
-        body_c += (
-            "static void {_obc_name_upper}_copy_packet_to_tlm_buffer_(const CommonTlmPacket* packet, {_obc_name_upper}_TLM_CODE tlm_id, "
+        body_c.Emit("  " + driver_name + "->tlm_buffer.tlm[tlm_id].is_null_packet = 0;\n")
+    body_c.Emit("}\n")
+    body_c.Emit("\n")
+    for slot, tlm in enumerate(tlm_db):
+        tlm_name_lower = tlm.tlm_name.lower()
+
+        body_c.Emit(
+            "static CDS_ERR_CODE {_obc_name_upper}_analyze_tlm_"
+            + tlm_name_lower
+            + "_(const CommonTlmPacket* packet, {_obc_name_upper}_TLM_CODE tlm_id, "
             + driver_type
             + "* "
             + driver_name
             + ")\n"
         )
-        body_c += "{{\n"
-        body_c += (
-            "  CTP_copy_packet(&(" + driver_name + "->tlm_buffer.tlm[tlm_id].packet), packet);\n"
-        )
-        body_c += "  " + driver_name + "->tlm_buffer.tlm[tlm_id].is_null_packet = 0;\n"
-        body_c += "}}\n"
-        body_c += "\n"
-        for tlm in tlm_db:
-            conv_tpye_to_temp = {
-                "int8_t": "temp_i8",
-                "int16_t": "temp_i16",
-                "int32_t": "temp_i32",
-                "uint8_t": "temp_u8",
-                "uint16_t": "temp_u16",
-                "uint32_t": "temp_u32",
-                "float": "temp_f",
-                "double": "temp_d",
-            }
-            conv_tpye_to_size = {
-                "int8_t": 1,
-                "int16_t": 2,
-                "int32_t": 4,
-                "uint8_t": 1,
-                "uint16_t": 2,
-                "uint32_t": 4,
-                "float": 4,
-                "double": 8,
-            }
-            tlm_name = tlm["tlm_name"]
-            tlm_name_upper = tlm_name.upper()
-            tlm_name_lower = tlm_name.lower()
-
-            body_c += (
-                "static CDS_ERR_CODE {_obc_name_upper}_analyze_tlm_"
-                + tlm_name_lower
-                + "_(const CommonTlmPacket* packet, {_obc_name_upper}_TLM_CODE tlm_id, "
-                + driver_type
-                + "* "
-                + driver_name
-                + ")\n"
-            )
-            body_c += "{{\n"
-            body_c += "  const uint8_t* f = packet->packet;\n"
-            for k, v in conv_tpye_to_temp.items():
-                if k == "float":
-                    body_c += "  " + k + " " + v + " = 0.0f;\n"
-                elif k == "double":
-                    body_c += "  " + k + " " + v + " = 0.0;\n"
-                else:
-                    body_c += "  " + k + " " + v + " = 0;\n"
-            body_c += "\n"
-            body_c += "  // GS へのテレメ中継のためのバッファーへのコピー\n"
-            body_c += (
-                "  {_obc_name_upper}_copy_packet_to_tlm_buffer_(packet, tlm_id, "
-                + driver_name
-                + ");\n"
+        body_c.Emit("{\n")
+        if is_tlm_decode_lazy:
+            if is_tlm_buffer_compact:
+                tlm_buffer_index = str(slot)
+            else:
+                tlm_buffer_index = "{_obc_name_upper}_Tlm_CODE_" + tlm.tlm_name.upper()
+            GenerateLazyTlmDecode_(
+                body_c,
+                tlm,
+                tlm_buffer_index,
+                driver_type,
+                driver_name,
+                is_tlm_analyze_coalesced,
+                layout_checks,
             )
-            body_c += "\n"
-
-            body_c += "  // MOBC 内部でテレメデータへアクセスしやすいようにするための構造体へのパース\n"
-            last_var_type = ""
-            for j in range(DATA_START_ROW, len(tlm["data"])):
-                comment = tlm["data"][j][0]
-                name = EscapeTlmElemName_(tlm["data"][j][1])
-                var_type = tlm["data"][j][2]
-                if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
-                    break
-                if comment != "":
-                    continue
-                if name == "":
-                    continue
-                if var_type == "":
-                    var_type = last_var_type
-                last_var_type = var_type
-                if last_var_type == "":
-                    continue
-
-                oct_pos = int(tlm["data"][j][5])
-                bit_pos = int(tlm["data"][j][6])
-                bit_len = int(tlm["data"][j][7])
-                is_compression = 0  # テレメ圧縮フラグ for ビットフィールドをつかってる奴ら
-                if tlm["data"][j][2] == "" or tlm["data"][j + 1][2] == "":
-                    is_compression = 1
-                if (
-                    tlm["data"][j + 1][0] == ""
-                    and tlm["data"][j + 1][1] == ""
-                    and tlm["data"][j][2] != ""
-                ):  # 最終行の除外
-                    is_compression = 0
-
-                # name_tree = name.lower().split(".")[2:]     # OBC名.テレメ名.HOGE.FUGA を想定
-                name_tree = name.lower().split(".")
-                name_path = ".".join(name_tree)
-                var_name = driver_name + "->tlm_data." + tlm_name_lower + "." + name_path
-                if is_compression:
-                    body_c += (
-                        "  ENDIAN_memcpy(&"
-                        + conv_tpye_to_temp[var_type]
-                        + ", &(f["
-                        + str(oct_pos)
-                        + "]), "
-                        + str(conv_tpye_to_size[var_type])
-                        + ");\n"
-                    )
-                    body_c += (
-                        "  "
-                        + conv_tpye_to_temp[var_type]
-                        + " >>= "
-                        + str(conv_tpye_to_size[var_type] * 8 - bit_pos - bit_len)
-                        + ";\n"
-                    )
-                    body_c += (
-                        "  "
-                        + conv_tpye_to_temp[var_type]
-                        + " &= "
-                        + hex(int("0b" + "1" * bit_len, 2))
-                        + ";\n"
-                    )
-                    body_c += "  " + var_name + " = " + conv_tpye_to_temp[var_type] + ";\n"
-                else:
-                    body_c += (
-                        "  ENDIAN_memcpy(&("
-                        + var_name
-                        + "), &(f["
-                        + str(oct_pos)
-                        + "]), "
-                        + str(conv_tpye_to_size[var_type])
-                        + ");\n"
-                    )
-
-            body_c += "  // TODO: ビットフィールドをつかっている系は，様々なパターンがあり得るので，今後，バグが出ないか注視する\n"
-            body_c += "\n"
-            body_c += "  // ワーニング回避\n"
-            for k, v in conv_tpye_to_temp.items():
-                body_c += "  (void)" + v + ";\n"
-            body_c += "\n"
-            body_c += "  return CDS_ERR_CODE_OK;\n"
-            body_c += "}}\n"
-            body_c += "\n"
-
-        body_c += (
-            "TF_TLM_FUNC_ACK {_obc_name_upper}_pick_up_tlm_buffer(const "
+            continue
+
+        GenerateTlmDecodeVars_(body_c)
+        body_c.Emit("  // GS へのテレメ中継のためのバッファーへのコピー\n")
+        body_c.Emit(
+            "  {_obc_name_upper}_copy_packet_to_tlm_buffer_(packet, tlm_id, " + driver_name + ");\n"
+        )
+        body_c.Emit("\n")
+        GenerateTlmDecodeBody_(body_c, tlm, driver_name, is_tlm_analyze_coalesced, layout_checks)
+        body_c.Emit("\n")
+        body_c.Emit("  return CDS_ERR_CODE_OK;\n")
+        body_c.Emit("}\n")
+        body_c.Emit("\n")
+
+    body_c.Emit(
+        "TF_TLM_FUNC_ACK {_obc_name_upper}_pick_up_tlm_buffer(const "
+        + driver_type
+        + "* "
+        + driver_name
+        + ", {_obc_name_upper}_TLM_CODE tlm_id, uint8_t* packet, uint16_t* len, uint16_t max_len)\n"
+    )
+    body_c.Emit("{\n")
+    body_c.Emit("  const CommonTlmPacket* buffered_packet;\n")
+    if is_tlm_buffer_compact:
+        body_c.Emit("  " + slot_type + " slot;\n")
+    body_c.Emit("\n")
+    body_c.Emit(
+        "  if (tlm_id >= {_obc_name_upper}_MAX_TLM_NUM) return TF_TLM_FUNC_ACK_NOT_DEFINED;\n"
+    )
+    if is_tlm_buffer_compact:
+        tlm_buffer_index = GenerateCompactTlmBufferSlotLookup_(body_c, driver_name)
+    else:
+        tlm_buffer_index = "tlm_id"
+    body_c.Emit(
+        "  if ("
+        + driver_name
+        + "->tlm_buffer.tlm["
+        + tlm_buffer_index
+        + "].is_null_packet) return TF_TLM_FUNC_ACK_NULL_PACKET;\n"
+    )
+    body_c.Emit("\n")
+    body_c.Emit(
+        "  buffered_packet = &("
+        + driver_name
+        + "->tlm_buffer.tlm["
+        + tlm_buffer_index
+        + "].packet);\n"
+    )
+    body_c.Emit("  *len = CTP_get_packet_len(buffered_packet);\n")
+    body_c.Emit("\n")
+    body_c.Emit("  if (*len > max_len) return TF_TLM_FUNC_ACK_TOO_SHORT_LEN;\n")
+    body_c.Emit("\n")
+    body_c.Emit("  memcpy(packet, &buffered_packet->packet, (size_t)(*len));\n")
+    body_c.Emit("  return TF_TLM_FUNC_ACK_SUCCESS;\n")
+    body_c.Emit("}\n")
+    body_c.Emit("\n")
+
+    if is_tlm_analyze_coalesced:
+        body_c = GenerateCoalescedTlmAnalyzeFooter_(body_c, obc_name, layout_checks)
+
+    output_file_path = (
+        settings["path_to_src"]
+        + r"src_user/component_driver/"
+        + settings["other_obc_data"][obc_idx]["driver_path"]
+    )
+    OutputTlmBufferC_(
+        output_file_path + obc_name.lower() + "_telemetry_buffer.c",
+        obc_name,
+        body_c,
+        settings,
+        obc_idx,
+    )
+    OutputTlmBufferH_(
+        output_file_path + obc_name.lower() + "_telemetry_buffer.h",
+        obc_name,
+        body_h,
+        settings,
+        obc_idx,
+    )
+    OutputTlmDataDefH_(
+        output_file_path + obc_name.lower() + "_telemetry_data_definitions.h",
+        obc_name,
+        tlmdef_body_h,
+        settings,
+        obc_idx,
+    )
+
+
+def GetCompactTlmBufferSlotType_(obc_name, tlm_db, tlm_buffer_pool_num):
+    # TLM DB で定義されているテレメのスロットと，プールのスロットの数から，スロット番号の型を決める
+    slot_num = len(tlm_db) + tlm_buffer_pool_num
+    if tlm_buffer_pool_num < 0 or slot_num == 0 or slot_num > 0xFFFE:
+        raise my_mod.util.GenerateError(
+            "tlm_buffer_pool_num is invalid at " + obc_name + " (" + str(tlm_buffer_pool_num) + ")"
+        )
+    return "uint8_t" if slot_num < 0xFF else "uint16_t"
+
+
+def GenerateCompactTlmBufferDefine_(body_h, tlm_db, tlm_buffer_pool_num, slot_type):
+    body_h.Emit(
+        "#define {_obc_name_upper}_TLM_BUFFER_DEFINED_TLM_NUM ("
+        + str(len(tlm_db))
+        + ")   //!< TLM DB で定義されているテレメの数\n"
+    )
+    body_h.Emit(
+        "#define {_obc_name_upper}_TLM_BUFFER_POOL_NUM ("
+        + str(tlm_buffer_pool_num)
+        + ")   //!< TLM DB で定義されていないテレメ用のスロット数\n"
+    )
+    body_h.Emit(
+        "#define {_obc_name_upper}_TLM_BUFFER_SLOT_NUM ({_obc_name_upper}_TLM_BUFFER_DEFINED_TLM_NUM + {_obc_name_upper}_TLM_BUFFER_POOL_NUM)\n"
+    )
+    body_h.Emit(
+        "#define {_obc_name_upper}_TLM_BUFFER_SLOT_NONE ("
+        + ("0xff" if slot_type == "uint8_t" else "0xffff")
+        + ")   //!< スロットが割り当てられていない\n"
+    )
+
+
+def GenerateCompactTlmBufferMember_(body_h, slot_type):
+    body_h.Emit(
+        "  {_obc_name_upper}_TlmBufferElem tlm[{_obc_name_upper}_TLM_BUFFER_SLOT_NUM];   //!< スロットごとに保持．TLM DB で定義されているテレメのスロットが先頭に並ぶ\n"
+    )
+    body_h.Emit(
+        "  "
+        + slot_type
+        + " slot_of_tlm_id[{_obc_name_upper}_MAX_TLM_NUM];   //!< TLM ID からスロットへの対応\n"
+    )
+    body_h.Emit("  " + slot_type + " used_pool_num;   //!< TLM DB で定義されていないテレメに割り当て済みのスロット数\n")
+
+
+def GenerateCompactTlmBufferInit_(body_c, tlm_db, driver_name):
+    # TLM DB で定義されているテレメには，DB の順にスロットを割り当てておく
+    body_c.Emit("  for (i = 0; i < {_obc_name_upper}_TLM_BUFFER_SLOT_NUM; ++i)\n")
+    body_c.Emit("  {\n")
+    body_c.Emit("    " + driver_name + "->tlm_buffer.tlm[i].is_null_packet = 1;\n")
+    body_c.Emit("  }\n")
+    body_c.Emit("  for (i = 0; i < {_obc_name_upper}_MAX_TLM_NUM; ++i)\n")
+    body_c.Emit("  {\n")
+    body_c.Emit(
+        "    "
+        + driver_name
+        + "->tlm_buffer.slot_of_tlm_id[i] = {_obc_name_upper}_TLM_BUFFER_SLOT_NONE;\n"
+    )
+    body_c.Emit("  }\n")
+    for slot, tlm in enumerate(tlm_db):
+        body_c.Emit(
+            "  "
+            + driver_name
+            + "->tlm_buffer.slot_of_tlm_id[{_obc_name_upper}_Tlm_CODE_"
+            + tlm.tlm_name.upper()
+            + "] = "
+            + str(slot)
+            + ";\n"
+        )
+    body_c.Emit("  " + driver_name + "->tlm_buffer.used_pool_num = 0;\n")
+
+
+def GenerateCompactTlmBufferCopy_(body_c, driver_name, tlm_buffer_pool_num, slot_type):
+    # {_obc_name_upper}_copy_packet_to_tlm_buffer_ の本体
+    body_c.Emit(
+        "  " + slot_type + " slot = " + driver_name + "->tlm_buffer.slot_of_tlm_id[tlm_id];\n"
+    )
+    body_c.Emit("\n")
+    body_c.Emit("  if (slot == {_obc_name_upper}_TLM_BUFFER_SLOT_NONE)\n")
+    body_c.Emit("  {\n")
+    body_c.Emit("    // TLM DB で定義されていないテレメは，初めて受信したときにプールからスロットを割り当てる\n")
+    if tlm_buffer_pool_num == 0:
+        body_c.Emit("    return;   // プールがないので，バッファリングしない\n")
+    else:
+        body_c.Emit(
+            "    if ("
+            + driver_name
+            + "->tlm_buffer.used_pool_num >= {_obc_name_upper}_TLM_BUFFER_POOL_NUM) return;   // プールが一杯の場合はバッファリングしない\n"
+        )
+        body_c.Emit(
+            "    slot = ("
+            + slot_type
+            + ")({_obc_name_upper}_TLM_BUFFER_DEFINED_TLM_NUM + "
+            + driver_name
+            + "->tlm_buffer.used_pool_num);\n"
+        )
+        body_c.Emit("    " + driver_name + "->tlm_buffer.slot_of_tlm_id[tlm_id] = slot;\n")
+        body_c.Emit("    " + driver_name + "->tlm_buffer.used_pool_num++;\n")
+    body_c.Emit("  }\n")
+    body_c.Emit("\n")
+    body_c.Emit("  CTP_copy_packet(&(" + driver_name + "->tlm_buffer.tlm[slot].packet), packet);\n")
+    body_c.Emit("  " + driver_name + "->tlm_buffer.tlm[slot].is_null_packet = 0;\n")
+
+
+def GenerateCompactTlmBufferSlotLookup_(body_c, driver_name):
+    # {_obc_name_upper}_pick_up_tlm_buffer で，TLM ID からスロットを引く
+    # 戻り値: tlm_buffer.tlm の添字
+    body_c.Emit("  slot = " + driver_name + "->tlm_buffer.slot_of_tlm_id[tlm_id];\n")
+    body_c.Emit(
+        "  if (slot == {_obc_name_upper}_TLM_BUFFER_SLOT_NONE) return TF_TLM_FUNC_ACK_NULL_PACKET;\n"
+    )
+    return "slot"
+
+
+def GenerateLazyTlmDecodeProto_(body_c, tlm_db, driver_type, driver_name):
+    for tlm in tlm_db:
+        body_c.Emit(
+            "static void {_obc_name_upper}_decode_tlm_"
+            + tlm.tlm_name.lower()
+            + "_(const CommonTlmPacket* packet, "
             + driver_type
             + "* "
             + driver_name
-            + ", {_obc_name_upper}_TLM_CODE tlm_id, uint8_t* packet, uint16_t* len, uint16_t max_len)\n"
-        )
-        body_c += "{{\n"
-        body_c += "  const CommonTlmPacket* buffered_packet;\n"
-        body_c += "\n"
-        body_c += (
-            "  if (tlm_id >= {_obc_name_upper}_MAX_TLM_NUM) return TF_TLM_FUNC_ACK_NOT_DEFINED;\n"
+            + ");\n"
         )
-        body_c += (
-            "  if ("
+
+
+def GenerateLazyTlmDecodeDirtyFlags_(body_h, tlm_db):
+    body_h.Emit("typedef struct\n")
+    body_h.Emit("{\n")
+    for tlm in tlm_db:
+        body_h.Emit("  uint8_t " + tlm.tlm_name.lower() + ";\n")
+    body_h.Emit("} {_obc_name_upper}_TlmDataDirtyFlags;   //!< tlm_data が最新のパケットからパースされていないか？\n")
+    body_h.Emit("\n")
+
+
+def GenerateLazyTlmDataAccessorProto_(body_h, tlm_db, driver_type, driver_name):
+    body_h.Emit("\n")
+    body_h.Emit("// tlm_data の各テレメへのアクセサ．新しいパケットを受信した後，初めて呼ばれたときに tlm_data へパースする\n")
+    for tlm in tlm_db:
+        body_h.Emit(
+            "const "
+            + GetLazyTlmDataTypeName_(tlm.tlm_name)
+            + "* {_obc_name_upper}_get_tlm_data_"
+            + tlm.tlm_name.lower()
+            + "("
+            + driver_type
+            + "* "
             + driver_name
-            + "->tlm_buffer.tlm[tlm_id].is_null_packet) return TF_TLM_FUNC_ACK_NULL_PACKET;\n"
+            + ");\n"
         )
-        body_c += "\n"
-        body_c += "  buffered_packet = &(" + driver_name + "->tlm_buffer.tlm[tlm_id].packet);\n"
-        body_c += "  *len = CTP_get_packet_len(buffered_packet);\n"
-        body_c += "\n"
-        body_c += "  if (*len > max_len) return TF_TLM_FUNC_ACK_TOO_SHORT_LEN;\n"
-        body_c += "\n"
-        body_c += "  memcpy(packet, &buffered_packet->packet, (size_t)(*len));\n"
-        body_c += "  return TF_TLM_FUNC_ACK_SUCCESS;\n"
-        body_c += "}}\n"
-        body_c += "\n"
-
-        output_file_path = (
-            settings["path_to_src"]
-            + r"src_user/component_driver/"
-            + settings["other_obc_data"][i]["driver_path"]
+
+
+def GetLazyTlmDataTypeName_(tlm_name):
+    # tlm_data のテレメごとの struct の型名
+    return "{_obc_name_upper}_TlmData_" + tlm_name.upper()
+
+
+def GenerateLazyTlmDecodeInit_(body_c, tlm_db, driver_name):
+    for tlm in tlm_db:
+        body_c.Emit(
+            "  "
+            + driver_name
+            + "->tlm_buffer.is_tlm_data_dirty."
+            + tlm.tlm_name.lower()
+            + " = 0;\n"
         )
-        OutputTlmBufferC_(
-            output_file_path + obc_name.lower() + "_telemetry_buffer.c",
-            obc_name,
-            body_c,
-            settings,
-            i,
+
+
+def GenerateLazyTlmDecode_(
+    body_c, tlm, tlm_buffer_index, driver_type, driver_name, is_tlm_analyze_coalesced, layout_checks
+):
+    # {_obc_name_upper}_analyze_tlm_*_ の本体（バッファーへのコピーと dirty フラグのセットのみ）と，
+    # tlm_data へのアクセサ，アクセサから呼ばれるパース関数
+    # tlm_buffer_index: このテレメのパケットを保持する tlm_buffer.tlm の添字
+    tlm_name_lower = tlm.tlm_name.lower()
+    dirty_flag = driver_name + "->tlm_buffer.is_tlm_data_dirty." + tlm_name_lower
+
+    body_c.Emit("  // GS へのテレメ中継のためのバッファーへのコピー\n")
+    body_c.Emit(
+        "  {_obc_name_upper}_copy_packet_to_tlm_buffer_(packet, tlm_id, " + driver_name + ");\n"
+    )
+    body_c.Emit("\n")
+    body_c.Emit(
+        "  // 構造体へのパースは，{_obc_name_upper}_get_tlm_data_" + tlm_name_lower + " で読み出されるまで遅延する\n"
+    )
+    body_c.Emit("  " + dirty_flag + " = 1;\n")
+    body_c.Emit("\n")
+    body_c.Emit("  return CDS_ERR_CODE_OK;\n")
+    body_c.Emit("}\n")
+    body_c.Emit("\n")
+
+    body_c.Emit(
+        "const "
+        + GetLazyTlmDataTypeName_(tlm.tlm_name)
+        + "* {_obc_name_upper}_get_tlm_data_"
+        + tlm_name_lower
+        + "("
+        + driver_type
+        + "* "
+        + driver_name
+        + ")\n"
+    )
+    body_c.Emit("{\n")
+    body_c.Emit("  if (" + dirty_flag + ")\n")
+    body_c.Emit("  {\n")
+    body_c.Emit(
+        "    {_obc_name_upper}_decode_tlm_"
+        + tlm_name_lower
+        + "_(&("
+        + driver_name
+        + "->tlm_buffer.tlm["
+        + tlm_buffer_index
+        + "].packet), "
+        + driver_name
+        + ");\n"
+    )
+    body_c.Emit("    " + dirty_flag + " = 0;\n")
+    body_c.Emit("  }\n")
+    body_c.Emit("  return &(" + driver_name + "->tlm_data." + tlm_name_lower + ");\n")
+    body_c.Emit("}\n")
+    body_c.Emit("\n")
+
+    body_c.Emit(
+        "static void {_obc_name_upper}_decode_tlm_"
+        + tlm_name_lower
+        + "_(const CommonTlmPacket* packet, "
+        + driver_type
+        + "* "
+        + driver_name
+        + ")\n"
+    )
+    body_c.Emit("{\n")
+    GenerateTlmDecodeVars_(body_c)
+    GenerateTlmDecodeBody_(body_c, tlm, driver_name, is_tlm_analyze_coalesced, layout_checks)
+    body_c.Emit("}\n")
+    body_c.Emit("\n")
+
+
+def GenerateTlmDecodeBody_(body_c, tlm, driver_name, is_tlm_analyze_coalesced, layout_checks):
+    # パケット（f）から tlm_data へのパース
+    body_c.Emit("  // MOBC 内部でテレメデータへアクセスしやすいようにするための構造体へのパース\n")
+    if is_tlm_analyze_coalesced:
+        GenerateCoalescedTlmAnalyze_(body_c, tlm, driver_name, layout_checks)
+    else:
+        GenerateTlmAnalyze_(body_c, tlm, driver_name)
+
+    body_c.Emit("  // TODO: ビットフィールドをつかっている系は，様々なパターンがあり得るので，今後，バグが出ないか注視する\n")
+    body_c.Emit("\n")
+    body_c.Emit("  // ワーニング回避\n")
+    for k, v in CONV_TYPE_TO_TEMP.items():
+        body_c.Emit("  (void)" + v + ";\n")
+
+
+def GenerateTlmDispatchTable_(body_c, tlm_db, driver_type, driver_name, max_tlm_num):
+    # TLM ID で引く解析関数のテーブル（未定義の TLM ID は NULL）
+    # C89 でも使えるように，指定初期化子は使わずに全要素を列挙する
+    analyze_funcs = [None] * max_tlm_num
+    for tlm in tlm_db:
+        tlm_id = int(tlm.tlm_id, 0)
+        if tlm_id >= max_tlm_num:
+            raise my_mod.util.GenerateError(
+                "TLM ID " + tlm.tlm_id + " of " + tlm.tlm_name + " exceeds max_tlm_num"
+            )
+        analyze_funcs[tlm_id] = tlm
+
+    body_c.Emit(
+        "typedef CDS_ERR_CODE (*{_obc_name_upper}_AnalyzeTlmFunc)(const CommonTlmPacket* packet, {_obc_name_upper}_TLM_CODE tlm_id, "
+        + driver_type
+        + "* "
+        + driver_name
+        + ");\n"
+    )
+    body_c.Emit("\n")
+    body_c.Emit(
+        "static const {_obc_name_upper}_AnalyzeTlmFunc {_obc_name_upper}_analyze_tlm_table_[{_obc_name_upper}_MAX_TLM_NUM] =\n"
+    )
+    body_c.Emit("{\n")
+    for tlm_id, tlm in enumerate(analyze_funcs):
+        if tlm is None:
+            body_c.Emit("  NULL,  // " + "0x%02x" % tlm_id + "\n")
+        else:
+            body_c.Emit(
+                "  {_obc_name_upper}_analyze_tlm_"
+                + tlm.tlm_name.lower()
+                + "_,  // "
+                + "0x%02x" % tlm_id
+                + ": {_obc_name_upper}_Tlm_CODE_"
+                + tlm.tlm_name.upper()
+                + "\n"
+            )
+    body_c.Emit("};\n")
+    body_c.Emit("\n")
+
+
+def GenerateTlmDecodeVars_(body_c):
+    body_c.Emit("  const uint8_t* f = packet->packet;\n")
+    for k, v in CONV_TYPE_TO_TEMP.items():
+        if k == "float":
+            body_c.Emit("  " + k + " " + v + " = 0.0f;\n")
+        elif k == "double":
+            body_c.Emit("  " + k + " " + v + " = 0.0;\n")
+        else:
+            body_c.Emit("  " + k + " " + v + " = 0;\n")
+    body_c.Emit("\n")
+
+
+def GenerateTlmAnalyze_(body_c, tlm, driver_name):
+    # 要素ごとに ENDIAN_memcpy する
+    tlm_name_lower = tlm.tlm_name.lower()
+    for field in tlm.fields:
+        name = EscapeTlmElemName_(field.name)
+        var_type = field.packed_var_type
+        if var_type == "":
+            continue
+
+        oct_pos = field.oct_pos
+        bit_pos = field.bit_pos
+        bit_len = field.bit_len
+        # テレメ圧縮フラグ for ビットフィールドをつかってる奴ら
+        is_compression = field.is_bit_field
+
+        # name_tree = name.lower().split(".")[2:]     # OBC名.テレメ名.HOGE.FUGA を想定
+        name_tree = name.lower().split(".")
+        name_path = ".".join(name_tree)
+        var_name = driver_name + "->tlm_data." + tlm_name_lower + "." + name_path
+        if is_compression:
+            body_c.Emit(
+                "  ENDIAN_memcpy(&"
+                + CONV_TYPE_TO_TEMP[var_type]
+                + ", &(f["
+                + str(oct_pos)
+                + "]), "
+                + str(CONV_TYPE_TO_SIZE[var_type])
+                + ");\n"
+            )
+            body_c.Emit(
+                "  "
+                + CONV_TYPE_TO_TEMP[var_type]
+                + " >>= "
+                + str(CONV_TYPE_TO_SIZE[var_type] * 8 - bit_pos - bit_len)
+                + ";\n"
+            )
+            body_c.Emit(
+                "  "
+                + CONV_TYPE_TO_TEMP[var_type]
+                + " &= "
+                + hex(int("0b" + "1" * bit_len, 2))
+                + ";\n"
+            )
+            body_c.Emit("  " + var_name + " = " + CONV_TYPE_TO_TEMP[var_type] + ";\n")
+        else:
+            body_c.Emit(
+                "  ENDIAN_memcpy(&("
+                + var_name
+                + "), &(f["
+                + str(oct_pos)
+                + "]), "
+                + str(CONV_TYPE_TO_SIZE[var_type])
+                + ");\n"
+            )
+
+
+def GenerateCoalescedTlmAnalyze_(body_c, tlm, driver_name, layout_checks):
+    # 以下をまとめてコピーする
+    # - 同じ型で，パケット上で連続し，構造体上でも隣接する（同じ struct の連続したメンバである）要素
+    #   -> 1 回の memcpy（1 byte 型）または {_obc_name_upper}_copy_array_（エンディアン変換あり）
+    #      構造体上で隙間なく並んでいることは layout_checks に追加するコンパイル時チェックで保証する
+    # - 同じ word に詰め込まれたビットフィールド
+    #   -> word を 1 度だけ読み，各要素はシフトとマスクで取り出す
+    tlm_name_lower = tlm.tlm_name.lower()
+
+    elems = []
+    for field in tlm.fields:
+        if field.packed_var_type == "":
+            continue
+        name = EscapeTlmElemName_(field.name)
+        # name_tree = name.lower().split(".")[2:]     # OBC名.テレメ名.HOGE.FUGA を想定
+        name_tree = name.lower().split(".")
+        elems.append({"field": field, "name_tree": name_tree, "name_path": ".".join(name_tree)})
+
+    var_prefix = driver_name + "->tlm_data." + tlm_name_lower + "."
+    i = 0
+    while i < len(elems):
+        field = elems[i]["field"]
+        var_type = field.packed_var_type
+        size = CONV_TYPE_TO_SIZE[var_type]
+
+        if field.is_bit_field:
+            group = [elems[i]]
+            while i + len(group) < len(elems):
+                next_field = elems[i + len(group)]["field"]
+                if not (
+                    next_field.is_bit_field
+                    and next_field.oct_pos == field.oct_pos
+                    and next_field.packed_var_type == var_type
+                ):
+                    break
+                group.append(elems[i + len(group)])
+
+            temp = CONV_TYPE_TO_TEMP[var_type]
+            body_c.Emit(
+                "  ENDIAN_memcpy(&"
+                + temp
+                + ", &(f["
+                + str(field.oct_pos)
+                + "]), "
+                + str(size)
+                + ");\n"
+            )
+            for elem in group:
+                bit_pos = elem["field"].bit_pos
+                bit_len = elem["field"].bit_len
+                body_c.Emit(
+                    "  "
+                    + var_prefix
+                    + elem["name_path"]
+                    + " = ("
+                    + var_type
+                    + ")(("
+                    + temp
+                    + " >> "
+                    + str(size * 8 - bit_pos - bit_len)
+                    + ") & "
+                    + hex(int("0b" + "1" * bit_len, 2))
+                    + ");\n"
+                )
+            i += len(group)
+            continue
+
+        run = [elems[i]]
+        while i + len(run) < len(elems):
+            prev_elem = run[-1]
+            next_elem = elems[i + len(run)]
+            next_field = next_elem["field"]
+            if not (
+                not next_field.is_bit_field
+                and next_field.packed_var_type == var_type
+                and next_field.oct_pos == prev_elem["field"].oct_pos + size
+                and next_elem["name_tree"][:-1] == prev_elem["name_tree"][:-1]
+            ):
+                break
+            run.append(next_elem)
+
+        dest = "&(" + var_prefix + run[0]["name_path"] + ")"
+        src = "&(f[" + str(field.oct_pos) + "])"
+        if len(run) == 1:
+            body_c.Emit("  ENDIAN_memcpy(" + dest + ", " + src + ", " + str(size) + ");\n")
+        else:
+            if size == 1:
+                body_c.Emit("  memcpy(" + dest + ", " + src + ", " + str(len(run)) + ");\n")
+            else:
+                body_c.Emit(
+                    "  {_obc_name_upper}_copy_array_("
+                    + dest
+                    + ", "
+                    + src
+                    + ", "
+                    + str(size)
+                    + ", "
+                    + str(len(run))
+                    + ");\n"
+                )
+            layout_checks.append(
+                (
+                    tlm_name_lower + "." + run[0]["name_path"],
+                    tlm_name_lower + "." + run[-1]["name_path"],
+                    size,
+                    len(run),
+                )
+            )
+        i += len(run)
+
+
+def GenerateCoalescedTlmAnalyzeFooter_(body_c, obc_name, layout_checks):
+    # GenerateCoalescedTlmAnalyze_ で使う helper 関数と，レイアウトのチェックを追加した body を返す
+    if not layout_checks:
+        return body_c
+
+    output = my_mod.emitter.Emitter(obc_name)
+    is_copy_array_used = any(size > 1 for _, _, size, _ in layout_checks)
+    if is_copy_array_used:
+        output.Emit(
+            "static void {_obc_name_upper}_copy_array_(void* dest, const uint8_t* src, size_t elem_size, size_t elem_num);\n"
         )
-        OutputTlmBufferH_(
-            output_file_path + obc_name.lower() + "_telemetry_buffer.h",
-            obc_name,
-            body_h,
-            settings,
-            i,
+    output.Extend(body_c)
+
+    # 一括コピーする要素が，構造体上で隙間なく並んでいることのコンパイル時チェック（負のサイズの配列はエラーになる）
+    output.Emit("// 一括コピーする要素が，構造体上で隙間なく並んでいることのチェック\n")
+    for i, (first_member, last_member, size, num) in enumerate(layout_checks):
+        output.Emit(
+            "typedef char {_obc_name_upper}_LAYOUT_CHECK_"
+            + str(i)
+            + "_[(offsetof({_obc_name_upper}_TlmData, "
+            + last_member
+            + ") - offsetof({_obc_name_upper}_TlmData, "
+            + first_member
+            + ") == "
+            + str(size * (num - 1))
+            + ") ? 1 : -1];\n"
         )
-        OutputTlmDataDefH_(
-            output_file_path + obc_name.lower() + "_telemetry_data_definitions.h",
-            obc_name,
-            tlmdef_body_h,
-            settings,
-            i,
+    output.Emit("\n")
+
+    if is_copy_array_used:
+        output.Emit(
+            """
+static void {_obc_name_upper}_copy_array_(void* dest, const uint8_t* src, size_t elem_size, size_t elem_num)
+{
+  // elem_size byte の要素 elem_num 個を一括でコピーし，ENDIAN_memcpy と同様にエンディアンを変換する
+  memcpy(dest, src, elem_size * elem_num);
+#ifdef IS_LITTLE_ENDIAN
+  {
+    uint8_t* d = (uint8_t*)dest;
+    size_t i;
+    size_t j;
+    for (i = 0; i < elem_size * elem_num; i += elem_size)
+    {
+      for (j = 0; j < elem_size / 2; ++j)
+      {
+        uint8_t temp = d[i + j];
+        d[i + j] = d[i + elem_size - 1 - j];
+        d[i + elem_size - 1 - j] = temp;
+      }
+    }
+  }
+#endif
+}
+
+"""[
+                1:
+            ]  # 最初の改行を除く
         )
+    return output
 
 
 def OutputTlmBufferC_(file_path, name, body, settings, obc_idx):
-    name_upper = name.upper()
-    name_lower = name.lower()
-    name_capit = name.capitalize()
-
-    output = ""
-    output += """
+    output = my_mod.emitter.Emitter(name)
+    output.Emit(
+        """
 #pragma section REPRO
 /**
  * @file
  * @brief テレメトリバッファー（テレメ中継）
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += my_mod.util.GenerateSubObcSettingNote(settings, obc_idx)
+    output.Emit(my_mod.util.GenerateSubObcSettingNote(settings, obc_idx))
 
-    output += """
+    output.Emit(
+        """
  */
 #include <src_core/component_driver/cdrv_common_tlm_cmd_packet.h>
 #include "./{_obc_name_lower}_telemetry_definitions.h"
 #include "./{_obc_name_lower}_telemetry_buffer.h"
 #include "./{_obc_name_lower}.h"
 #include <string.h>
-
 """[
-        1:
-    ]  # 最初の改行を除く
-
-    output += body
-
-    output += """
+            1:
+        ]  # 最初の改行を除く
+    )
+    if settings["other_obc_data"][obc_idx].get("is_tlm_analyze_coalesced", 0):
+        # offsetof と，ENDIAN_memcpy と同じエンディアンの判定のため
+        output.Emit("#include <stddef.h>\n")
+        output.Emit("#include <src_user/settings/build_settings.h>\n")
+    output.Emit("\n")
+
+    output.Extend(body)
+
+    output.Emit(
+        """
 #pragma section
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    with open(file_path, mode="w", encoding=settings["output_file_encoding"]) as fh:
-        fh.write(
-            output.format(
-                _obc_name_upper=name_upper, _obc_name_lower=name_lower, _obc_name_capit=name_capit
-            )
-        )
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
 
 
 def OutputTlmBufferH_(file_path, name, body, settings, obc_idx):
-    name_upper = name.upper()
-    name_lower = name.lower()
-    name_capit = name.capitalize()
-
-    output = ""
-    output += """
+    output = my_mod.emitter.Emitter(name)
+    output.Emit(
+        """
 /**
  * @file
  * @brief テレメトリバッファー（テレメ中継）
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += my_mod.util.GenerateSubObcSettingNote(settings, obc_idx)
+    output.Emit(my_mod.util.GenerateSubObcSettingNote(settings, obc_idx))
 
-    output += """
+    output.Emit(
+        """
  */
 #ifndef {_obc_name_upper}_TELEMETRY_BUFFER_H_
 #define {_obc_name_upper}_TELEMETRY_BUFFER_H_
@@ -471,68 +1007,66 @@ def OutputTlmBufferH_(file_path, name, body, settings, obc_idx):
 #include <src_core/component_driver/driver_super.h>
 #include <src_core/tlm_cmd/common_packet/common_tlm_packet.h>
 #include <src_core/tlm_cmd/telemetry_frame.h>
-
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
+    if settings["other_obc_data"][obc_idx].get("is_tlm_decode_lazy", 0):
+        # tlm_data のアクセサの戻り値の型のため
+        output.Emit('#include "./{_obc_name_lower}_telemetry_data_definitions.h"\n')
+    output.Emit("\n")
 
-    output += body
+    output.Extend(body)
 
-    output += """
+    output.Emit(
+        """
 
 #endif
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    with open(file_path, mode="w", encoding=settings["output_file_encoding"]) as fh:
-        fh.write(
-            output.format(
-                _obc_name_upper=name_upper, _obc_name_lower=name_lower, _obc_name_capit=name_capit
-            )
-        )
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
 
 
 def OutputTlmDataDefH_(file_path, name, body, settings, obc_idx):
-    name_upper = name.upper()
-    name_lower = name.lower()
-    name_capit = name.capitalize()
-
-    output = ""
-    output += """
+    output = my_mod.emitter.Emitter(name)
+    output.Emit(
+        """
 /**
  * @file
  * @brief バッファリングされているテレメをパースしてMOBC内でかんたんに利用できるようにするためのテレメデータ構造体定義
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += my_mod.util.GenerateSubObcSettingNote(settings, obc_idx)
+    output.Emit(my_mod.util.GenerateSubObcSettingNote(settings, obc_idx))
 
-    output += """
+    output.Emit(
+        """
  */
 #ifndef {_obc_name_upper}_TELEMETRY_DATA_DEFINITIONS_H_
 #define {_obc_name_upper}_TELEMETRY_DATA_DEFINITIONS_H_
 
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += body
+    output.Extend(body)
 
-    output += """
+    output.Emit(
+        """
 
 #endif
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    with open(file_path, mode="w", encoding=settings["output_file_encoding"]) as fh:
-        fh.write(
-            output.format(
-                _obc_name_upper=name_upper, _obc_name_lower=name_lower, _obc_name_capit=name_capit
-            )
-        )
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
 
 
 def GetStructTree_(dict, path, sep="/", default=None):
@@ -571,20 +1105,23 @@ def SetStructTree_(dict, path, val, sep="/"):
     return _(dict, path_list, val, sep=sep)
 
 
-def GenerateStructDef_(tree, name):
+def GenerateStructDef_(output, tree, name, is_typedef=False):
+    # is_typedef: 1 の場合，name を型名とする typedef にする．0 の場合，name をメンバ名とするメンバにする
     def _(tree, name, indent):
-        output = ""
-        output += " " * (indent) + "struct\n"
-        output += " " * (indent) + "{{\n"
+        output.Emit(" " * (indent) + "struct\n")
+        output.Emit(" " * (indent) + "{\n")
         for k, v in tree.items():
             if type(v) == dict:
-                output += _(v, k, indent + 2)
+                _(v, k, indent + 2)
                 continue
-            output += " " * (indent + 2) + v + " " + k + ";\n"
-        output += " " * (indent) + "}} " + name + ";\n"
-        return output
-
-    return _(tree, name, 2)
+            output.Emit(" " * (indent + 2) + v + " " + k + ";\n")
+        output.Emit(" " * (indent) + "} " + name + ";\n")
+
+    if is_typedef:
+        output.Emit("typedef ")
+        _(tree, name, 0)
+    else:
+        _(tree, name, 2)
 
 
 def EscapeTlmElemName_(name):
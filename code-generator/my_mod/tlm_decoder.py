@@ -0,0 +1,387 @@
+# coding: UTF-8
+"""
+地上局用の Python のテレメデコーダの生成
+テレメごとに，パケット全体を 1 回で unpack する struct.Struct と，
+ビットフィールドの取り出し，多項式変換を埋め込んだデコード関数をもつ Python モジュールを生成する
+また，記録された大量のパケットを numpy の構造化 dtype で列ごとにデコードする一括デコード関数も生成する
+（numpy は一括デコードを使う場合のみ必要）
+"""
+
+import my_mod.emitter
+import my_mod.util
+
+VAR_TYPE_TO_STRUCT_FORMAT = {
+    "int8_t": "b",
+    "int16_t": "h",
+    "int32_t": "i",
+    "uint8_t": "B",
+    "uint16_t": "H",
+    "uint32_t": "I",
+    "float": "f",
+    "double": "d",
+}
+VAR_TYPE_TO_NUMPY_FORMAT = {
+    "int8_t": "i1",
+    "int16_t": ">i2",
+    "int32_t": ">i4",
+    "uint8_t": "u1",
+    "uint16_t": ">u2",
+    "uint32_t": ">u4",
+    "float": ">f4",
+    "double": ">f8",
+}
+VAR_TYPE_TO_SIZE = {
+    "int8_t": 1,
+    "int16_t": 2,
+    "int32_t": 4,
+    "uint8_t": 1,
+    "uint16_t": 2,
+    "uint32_t": 4,
+    "float": 4,
+    "double": 8,
+}
+
+
+def GenerateTlmDecoder(settings, tlm_db):
+    body = my_mod.emitter.Emitter()
+    decoders = []
+    for tlm in tlm_db:
+        func_name = "decode_" + tlm.tlm_name.lower()
+        GenerateTlmDecodeFunc_(body, tlm, func_name)
+        GenerateTlmBatchDecodeFunc_(body, tlm, func_name)
+        decoders.append((tlm, func_name))
+
+    body.Emit("\n\n")
+    body.Emit("# {TLM ID: デコード関数}\n")
+    body.Emit("DECODERS = {\n")
+    for tlm, func_name in decoders:
+        body.Emit("    " + tlm.tlm_id + ": " + func_name + ",\n")
+    body.Emit("}\n")
+    body.Emit("\n")
+    body.Emit("# {TLM ID: (一括デコード関数, word の [(numpy の型, オフセット)])}\n")
+    body.Emit("BATCH_DECODERS = {\n")
+    for tlm, func_name in decoders:
+        body.Emit(
+            "    "
+            + tlm.tlm_id
+            + ": (batch_"
+            + func_name
+            + ", _"
+            + tlm.tlm_name.upper()
+            + "_WORDS),\n"
+        )
+    body.Emit("}\n")
+    body.Emit("\n")
+    body.Emit("# {TLM ID: TLM 名}\n")
+    body.Emit("TLM_NAMES = {\n")
+    for tlm, _ in decoders:
+        body.Emit("    " + tlm.tlm_id + ': "' + tlm.tlm_name.upper() + '",\n')
+    body.Emit("}\n")
+    body.Emit("\n")
+    body.Emit("# {TLM 名: {要素名: {値: ステータス名}}}．* の指定は None をキーとする\n")
+    body.Emit("STATUSES = {\n")
+    for tlm, _ in decoders:
+        statuses = [
+            (field.name, ParseStatus_(field.status))
+            for field in tlm.fields
+            if field.conv_type == "STATUS" and field.oct_pos is not None
+        ]
+        if not statuses:
+            continue
+        body.Emit('    "' + tlm.tlm_name.upper() + '": {\n')
+        for name, status in statuses:
+            body.Emit('        "' + name + '": ' + repr(status) + ",\n")
+        body.Emit("    },\n")
+    body.Emit("}\n")
+    body.Emit("\n\n")
+    body.Emit("def decode(tlm_id, packet):\n")
+    body.Emit('    """\n')
+    body.Emit("    TLM ID が tlm_id のテレメをデコードし，{要素名: 値} を返す\n")
+    body.Emit("    packet はヘッダを含むパケット全体（bytes, bytearray, memoryview など）\n")
+    body.Emit('    """\n')
+    body.Emit("    return DECODERS[tlm_id](packet)\n")
+    GenerateBatchDecodeApi_(body, tlm_db)
+
+    OutputTlmDecoder_(settings["tlm_decoder_path"], body, settings)
+
+
+def GetWords_(tlm):
+    # パケット上の word（var_type をもつ要素．ビットフィールドはそれを含む word）
+    # 戻り値: (words, word_of_field)
+    #   words:         [(oct_pos, var_type)]．DB 上の順
+    #   word_of_field: [(field, word の index)]
+    tlm_name_upper = tlm.tlm_name.upper()
+
+    words = []
+    word_of_field = []
+    for field in tlm.fields:
+        if field.oct_pos is None or field.bit_pos is None or field.bit_len is None:
+            continue
+        if field.var_type != "":
+            if field.var_type not in VAR_TYPE_TO_STRUCT_FORMAT:
+                raise my_mod.util.GenerateError("Tlm DB Err at " + tlm_name_upper)
+            words.append((field.oct_pos, field.var_type))
+        if not words:
+            raise my_mod.util.GenerateError("Tlm DB Err at " + tlm_name_upper)
+        word_of_field.append((field, len(words) - 1))
+    return words, word_of_field
+
+
+def GenerateTlmDecodeFunc_(output, tlm, func_name):
+    # word ごとに unpack し，各要素はその word から取り出す
+    tlm_name_upper = tlm.tlm_name.upper()
+    words, word_of_field = GetWords_(tlm)
+
+    # 1 つの Struct で unpack できるように，word をパケット上の位置でソートする
+    # 他の word と重なる word は，個別に unpack_from する
+    order = sorted(range(len(words)), key=lambda i: words[i][0])
+    struct_format = ">"
+    pos = 0
+    struct_words = []  # Struct で unpack する word の index
+    extra_words = []  # 個別に unpack_from する word の index
+    for i in order:
+        oct_pos, var_type = words[i]
+        if oct_pos < pos:
+            extra_words.append(i)
+            continue
+        if oct_pos > pos:
+            struct_format += str(oct_pos - pos) + "x"
+        struct_format += VAR_TYPE_TO_STRUCT_FORMAT[var_type]
+        pos = oct_pos + VAR_TYPE_TO_SIZE[var_type]
+        struct_words.append(i)
+
+    struct_name = "_" + tlm_name_upper + "_STRUCT"
+    output.Emit("\n\n")
+    output.Emit(struct_name + ' = struct.Struct("' + struct_format + '")\n')
+    for i in extra_words:
+        output.Emit(
+            struct_name
+            + "_"
+            + str(i)
+            + ' = struct.Struct(">'
+            + VAR_TYPE_TO_STRUCT_FORMAT[words[i][1]]
+            + '")\n'
+        )
+    output.Emit("\n\n")
+    output.Emit("def " + func_name + "(packet):\n")
+    output.Emit('    """\n')
+    output.Emit("    " + tlm_name_upper + " (" + tlm.tlm_id + ") をデコードし，{要素名: 値} を返す\n")
+    output.Emit('    """\n')
+    word_exprs = {}  # {word の index: word の値の式}
+    if struct_words:
+        output.Emit("    w = " + struct_name + ".unpack_from(packet)\n")
+    for k, i in enumerate(struct_words):
+        word_exprs[i] = "w[" + str(k) + "]"
+    for i in extra_words:
+        word_exprs[i] = "x" + str(i)
+        output.Emit(
+            "    ("
+            + word_exprs[i]
+            + ",) = "
+            + struct_name
+            + "_"
+            + str(i)
+            + ".unpack_from(packet, "
+            + str(words[i][0])
+            + ")\n"
+        )
+    output.Emit("    return {\n")
+    for field, word_idx in word_of_field:
+        value = GetFieldValue_(field, word_exprs[word_idx], words[word_idx])
+        if field.conv_type == "POLY":
+            value = GetPolyExpr_(field.poly, value)
+        output.Emit('        "' + field.name + '": ' + value + ",\n")
+    output.Emit("    }\n")
+
+
+def GenerateTlmBatchDecodeFunc_(output, tlm, func_name):
+    # numpy の構造化配列の word ごとの列から，各要素を列ごとに取り出す
+    tlm_name_upper = tlm.tlm_name.upper()
+    words, word_of_field = GetWords_(tlm)
+
+    output.Emit("\n\n")
+    output.Emit("_" + tlm_name_upper + "_WORDS = [")
+    output.Emit(
+        ", ".join(
+            '("' + VAR_TYPE_TO_NUMPY_FORMAT[var_type] + '", ' + str(oct_pos) + ")"
+            for oct_pos, var_type in words
+        )
+    )
+    output.Emit("]\n")
+    output.Emit("\n\n")
+    output.Emit("def batch_" + func_name + "(records):\n")
+    output.Emit('    """\n')
+    output.Emit(
+        "    "
+        + tlm_name_upper
+        + " ("
+        + tlm.tlm_id
+        + ") の records（dtype_of で得られる dtype の numpy 配列）を列ごとにデコードし，"
+        + "{要素名: numpy 配列} を返す\n"
+    )
+    output.Emit('    """\n')
+    output.Emit("    return {\n")
+    for field, word_idx in word_of_field:
+        value = GetFieldValue_(field, 'records["w' + str(word_idx) + '"]', words[word_idx])
+        if field.conv_type == "POLY":
+            # 整数型のままべき乗するとオーバーフローするので，先に float64 にする
+            value = GetPolyExpr_(field.poly, "(" + value + ").astype(numpy.float64)")
+        output.Emit('        "' + field.name + '": ' + value + ",\n")
+    output.Emit("    }\n")
+
+
+def GenerateBatchDecodeApi_(output, tlm_db):
+    output.Emit(
+        """
+
+def dtype_of(tlm_id, packet_len):
+    \"\"\"
+    TLM ID が tlm_id のテレメの，packet_len byte のパケット 1 つに対応する numpy の構造化 dtype
+    \"\"\"
+    words = BATCH_DECODERS[tlm_id][1]
+    return numpy.dtype(
+        {
+            "names": ["w" + str(i) for i in range(len(words))],
+            "formats": [word[0] for word in words],
+            "offsets": [word[1] for word in words],
+            "itemsize": packet_len,
+        }
+    )
+"""
+    )
+
+    # (APID, TLM ID) ごとに分けるため，ヘッダの APID と TLM ID の位置を DB から得る
+    header_words = {}  # {"apid" or "tlm_id": (field, word)}
+    for tlm in tlm_db:
+        words, word_of_field = GetWords_(tlm)
+        for field, word_idx in word_of_field:
+            if field.name == "PH.APID":
+                header_words.setdefault("apid", (field, words[word_idx]))
+            elif field.name == "SH.TLM_ID":
+                header_words.setdefault("tlm_id", (field, words[word_idx]))
+    if len(header_words) != 2:
+        return  # ヘッダが DB にない場合は，decode_batch は生成しない
+
+    apid_field, apid_word = header_words["apid"]
+    tlm_id_field, tlm_id_word = header_words["tlm_id"]
+    output.Emit(
+        """
+
+_HEADER_WORDS = [("{apid_format}", {apid_offset}), ("{tlm_id_format}", {tlm_id_offset})]
+
+
+def decode_batch(buffer, packet_len):
+    \"\"\"
+    packet_len byte の固定長パケットが連続して並んだ buffer（bytes, mmap.mmap, numpy.memmap など）を，
+    (APID, TLM ID) ごとにまとめてデコードする．末尾の packet_len に満たない部分は無視する
+    戻り値: {{(APID, TLM ID): {{要素名: numpy 配列}}}}．デコーダのない TLM ID のパケットは含まない
+    \"\"\"
+    if numpy is None:
+        raise ImportError("decode_batch requires numpy")
+    raw = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    raw = raw[: len(raw) // packet_len * packet_len].reshape(-1, packet_len)
+    header_dtype = numpy.dtype(
+        {{
+            "names": ["apid", "tlm_id"],
+            "formats": [word[0] for word in _HEADER_WORDS],
+            "offsets": [word[1] for word in _HEADER_WORDS],
+            "itemsize": packet_len,
+        }}
+    )
+    header = raw.view(header_dtype)[:, 0]
+    apids = ({apid_value}).astype(numpy.uint32)
+    tlm_ids = ({tlm_id_value}).astype(numpy.uint32)
+    keys = (apids << 16) | tlm_ids
+
+    ret = {{}}
+    for key in numpy.unique(keys):
+        apid = int(key >> 16)
+        tlm_id = int(key & 0xFFFF)
+        if tlm_id not in BATCH_DECODERS:
+            continue
+        records = raw[keys == key].view(dtype_of(tlm_id, packet_len))[:, 0]
+        ret[(apid, tlm_id)] = BATCH_DECODERS[tlm_id][0](records)
+    return ret
+""".format(
+            apid_format=VAR_TYPE_TO_NUMPY_FORMAT[apid_word[1]],
+            apid_offset=apid_word[0],
+            tlm_id_format=VAR_TYPE_TO_NUMPY_FORMAT[tlm_id_word[1]],
+            tlm_id_offset=tlm_id_word[0],
+            apid_value=GetFieldValue_(apid_field, 'header["apid"]', apid_word),
+            tlm_id_value=GetFieldValue_(tlm_id_field, 'header["tlm_id"]', tlm_id_word),
+        )
+    )
+
+
+def GetFieldValue_(field, word_var, word):
+    # word から field の値を取り出す式．word_var は word の値の式
+    word_oct_pos, var_type = word
+    word_bit_len = VAR_TYPE_TO_SIZE[var_type] * 8
+    bit_offset = (field.oct_pos - word_oct_pos) * 8 + field.bit_pos
+    if bit_offset == 0 and field.bit_len == word_bit_len:
+        return word_var
+    if var_type in ["float", "double"]:
+        raise my_mod.util.GenerateError("Tlm DB Err: bit field of " + var_type + " " + field.name)
+    shift = word_bit_len - bit_offset - field.bit_len
+    if shift < 0:
+        raise my_mod.util.GenerateError("Tlm DB Err: bit field overflow " + field.name)
+    mask = hex((1 << field.bit_len) - 1)
+    if shift == 0:
+        return "(" + word_var + " & " + mask + ")"
+    return "((" + word_var + " >> " + str(shift) + ") & " + mask + ")"
+
+
+def GetPolyExpr_(poly, value):
+    # a0 + a1 * x + a2 * x ** 2 + ...．空欄の係数は 0 とする
+    terms = []
+    for i, coef in enumerate(poly):
+        if coef is None or coef == 0:
+            continue
+        if i == 0:
+            terms.append(repr(coef))
+        elif i == 1:
+            terms.append(repr(coef) + " * " + value)
+        else:
+            terms.append(repr(coef) + " * " + value + " ** " + str(i))
+    if not terms:
+        return value
+    return " + ".join(terms)
+
+
+def ParseStatus_(status):
+    # "0=OFF@@1=ON@@*=N/A" -> {0: "OFF", 1: "ON", None: "N/A"}
+    ret = {}
+    for item in status.split("@@"):
+        if "=" not in item:
+            continue
+        key, name = item.split("=", 1)
+        key = key.strip()
+        if key == "*":
+            ret[None] = name.strip()
+            continue
+        try:
+            ret[int(key, 0)] = name.strip()
+        except ValueError:
+            continue  # 数値でない指定は無視する
+    return ret
+
+
+def OutputTlmDecoder_(file_path, body, settings):
+    note = my_mod.util.GenerateSettingNote(settings)
+    output = my_mod.emitter.Emitter()
+    output.Emit("# coding: " + settings["output_file_encoding"] + "\n")
+    output.Emit('"""\n')
+    output.Emit("テレメトリデコーダ\n")
+    # C のコメント用の " * " を除く
+    output.Emit("".join(line[3:] + "\n" for line in note.splitlines()))
+    output.Emit('"""\n')
+    output.Emit("\n")
+    output.Emit("import struct\n")
+    output.Emit("\n")
+    output.Emit("try:\n")
+    output.Emit("    import numpy\n")
+    output.Emit("except ImportError:  # numpy は一括デコード（batch_decode_*, decode_batch）でのみ使う\n")
+    output.Emit("    numpy = None\n")
+    output.Extend(body)
+
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
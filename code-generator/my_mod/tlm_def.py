@@ -3,120 +3,739 @@
 tlm def
 """
 
-import sys
+import os
+import re
+
+import my_mod.emitter
+import my_mod.tlm_layout
 import my_mod.util
 
 
+CONV_TYPE_TO_COPY_FUNC = {
+    "int8_t": "TF_copy_i8",
+    "int16_t": "TF_copy_i16",
+    "int32_t": "TF_copy_i32",
+    "uint8_t": "TF_copy_u8",
+    "uint16_t": "TF_copy_u16",
+    "uint32_t": "TF_copy_u32",
+    "float": "TF_copy_float",
+    "double": "TF_copy_double",
+}
+CONV_TYPE_TO_SIZE = {
+    "int8_t": 1,
+    "int16_t": 2,
+    "int32_t": 4,
+    "uint8_t": 1,
+    "uint16_t": 2,
+    "uint32_t": 4,
+    "float": 4,
+    "double": 8,
+}
+CONV_TYPE_TO_PACKER_TYPE = {
+    "int8_t": "TLM_PACKER_TYPE_I8_",
+    "int16_t": "TLM_PACKER_TYPE_I16_",
+    "int32_t": "TLM_PACKER_TYPE_I32_",
+    "uint8_t": "TLM_PACKER_TYPE_U8_",
+    "uint16_t": "TLM_PACKER_TYPE_U16_",
+    "uint32_t": "TLM_PACKER_TYPE_U32_",
+    "float": "TLM_PACKER_TYPE_FLOAT_",
+    "double": "TLM_PACKER_TYPE_DOUBLE_",
+}
+CONV_TYPE_TO_PACKER_VALUE = {
+    "int8_t": "i8",
+    "int16_t": "i16",
+    "int32_t": "i32",
+    "uint8_t": "u8",
+    "uint16_t": "u16",
+    "uint32_t": "u32",
+    "float": "f",
+    "double": "d",
+}
+# "extern const Hoge* const hoge;"
+_root_decl_pattern = re.compile(r"extern\s+const\s+(\w+)\s*\*\s*const\s+(\w+)\s*;")
+# "(uint8_t)hoge->fuga" などの，先頭の整数型へのキャスト
+_int_cast_pattern = re.compile(r"^\(\s*((?:u?int(?:8|16)_t))\s*\)(.*)$")
+# "hoge->fuga.piyo[3]"．root のポインタの先の要素で，添字は整数リテラルのみ
+_root_member_pattern = re.compile(
+    r"^([A-Za-z_]\w*)\s*->\s*([A-Za-z_]\w*(?:\s*\.\s*[A-Za-z_]\w*|\s*\[\s*\d+\s*\])*)$"
+)
+# 全体を囲む括弧（内側に括弧を含まないもの）
+_enclosed_pattern = re.compile(r"^\(([^()]*)\)$")
+
+# function: テレメごとに TF_copy_* を並べた関数を生成する（従来）
+# table:    テレメごとに記述子テーブルを生成し，共通の packer で生成する
+TLM_PACKER_MODES = ["function", "table"]
+
+
 def GenerateTlmDef(settings, tlm_db):
     output_file_path = settings["path_to_src"] + r"src_user/tlm_cmd/"
     output_file_name_base = "telemetry_definitions"
 
-    DATA_START_ROW = 8
-
-    body_c = ""
-    body_h = ""
-
-    # "static TF_TLM_FUNC_ACK OBC_(uint8_t* packet, uint16_t* len, uint16_t max_len);"
-    # "  OBC_ID = 0x00,"
+    body_c_proto = my_mod.emitter.Emitter()
+    body_c_table = my_mod.emitter.Emitter()
+    body_c_func = my_mod.emitter.Emitter()
+    body_c_packer = my_mod.emitter.Emitter()
+    body_h = my_mod.emitter.Emitter()
+
+    packer_modes = GetTlmPackerModes_(settings, tlm_db)
+    # 記述子テーブルで生成するテレメが共有する，root と getter
+    packer = {"root_types": None, "roots": {}, "getters": {}, "is_used": False}
+    is_bulk_copy_enabled = settings.get("is_tlm_bulk_copy_enabled", 0)
+    is_copy_array_used = False
     for tlm in tlm_db:
-        body_c += (
+        tlm_name_upper = tlm.tlm_name.upper()
+        # "static TF_TLM_FUNC_ACK OBC_(uint8_t* packet, uint16_t* len, uint16_t max_len);"
+        # "  OBC_ID = 0x00,"
+        # "  tlm_table[OBC_ID].tlm_func = OBC_;"
+        body_c_proto.Emit(
             "static TF_TLM_FUNC_ACK Tlm_"
-            + tlm["tlm_name"].upper()
+            + tlm_name_upper
             + "_(uint8_t* packet, uint16_t* len, uint16_t max_len);\n"
         )
-        body_h += "  Tlm_CODE_" + tlm["tlm_name"].upper() + " = " + tlm["tlm_id"] + ",\n"
+        body_h.Emit("  Tlm_CODE_" + tlm_name_upper + " = " + tlm.tlm_id + ",\n")
+        body_c_table.Emit(
+            "  tlm_table[Tlm_CODE_" + tlm_name_upper + "].tlm_func = Tlm_" + tlm_name_upper + "_;\n"
+        )
+        if packer_modes[tlm_name_upper] == "table":
+            GenerateTlmTableFunc_(settings, body_c_func, body_c_packer, tlm, packer)
+        elif GenerateTlmFunc_(body_c_func, tlm, is_bulk_copy_enabled):
+            is_copy_array_used = True
+
+    body_c = body_c_proto
+    body_c.Emit("\n")
+    body_c.Emit("void TF_load_tlm_table(TF_TlmInfo tlm_table[TF_MAX_TLMS])\n")
+    body_c.Emit("{\n")
+    body_c.Extend(body_c_table)
+    body_c.Emit("}\n")
+    if settings.get("is_tlm_len_table_enabled", 0):
+        GenerateTlmLenTable_(body_c, tlm_db)
+    if packer["is_used"]:  # 記述子テーブルで生成するテレメがある
+        GenerateTlmPacker_(body_c, body_c_packer, packer)
+    if is_copy_array_used:
+        GenerateTlmCopyArray_(body_c)
+    body_c.Extend(body_c_func)
+
+    OutputTlmDefC_(output_file_path + output_file_name_base + ".c", body_c, settings)
+    OutputTlmDefH_(output_file_path + output_file_name_base + ".h", body_h, settings)
+
+
+def GenerateTlmFunc_(body_c, tlm, is_bulk_copy_enabled=False):
+    # 戻り値: Tlm_copy_array_ を使ったか？
+    tlm_name_upper = tlm.tlm_name.upper()
+
+    fields = my_mod.tlm_layout.GetCopyFields(tlm)
+    for field in fields:
+        if field.var_type not in CONV_TYPE_TO_COPY_FUNC:
+            raise my_mod.util.GenerateError("Tlm DB Err at " + tlm_name_upper)
+
+    runs = {}  # {開始 index: (要素数, 配列名, 開始添字)}
+    if is_bulk_copy_enabled:
+        for start, num, base, index in my_mod.tlm_layout.FindBulkCopyRuns(fields):
+            runs[start] = (num, base, index)
+
+    func_code = my_mod.emitter.Emitter()
+    max_pos = ""
+    is_copy_array_used = False
+    i = 0
+    while i < len(fields):
+        field = fields[i]
+        if i in runs:
+            num, base, index = runs[i]
+            size = CONV_TYPE_TO_SIZE[field.var_type]
+            max_pos = field.oct_pos + size * num
+            GenerateTlmBulkCopy_(func_code, field, num, base, index)
+            is_copy_array_used = is_copy_array_used or size > 1
+            i += num
+            continue
+
+        max_pos = field.oct_pos + CONV_TYPE_TO_SIZE[field.var_type]
+        func_code.Emit(
+            "  "
+            + CONV_TYPE_TO_COPY_FUNC[field.var_type]
+            + "(&packet["
+            + str(field.oct_pos)
+            + "], "
+            + field.code
+            + ");\n"
+        )
+        i += 1
+
+    body_c.Emit("\n")
+    body_c.Emit(
+        "static TF_TLM_FUNC_ACK Tlm_"
+        + tlm_name_upper
+        + "_(uint8_t* packet, uint16_t* len, uint16_t max_len)\n"
+    )
+    body_c.Emit("{\n")
+    for local_var in tlm.local_vars:
+        body_c.Emit("  " + local_var + "\n")
+    if len(tlm.local_vars) > 0:
+        body_c.Emit("\n")
+    body_c.Emit("  if (" + str(max_pos) + " > max_len) return TF_TLM_FUNC_ACK_TOO_SHORT_LEN;\n")
+    body_c.Emit("\n")
+    body_c.Emit("#ifndef BUILD_SETTINGS_FAST_BUILD\n")
+    body_c.Extend(func_code)
+    body_c.Emit("#endif\n")
+    body_c.Emit("\n")
+    body_c.Emit("  *len = " + str(max_pos) + ";\n")
+    body_c.Emit("  return TF_TLM_FUNC_ACK_SUCCESS;\n")
+    body_c.Emit("}\n")
+    return is_copy_array_used
+
+
+def GenerateTlmBulkCopy_(func_code, field, num, base, index):
+    # base[index] から num 個の要素を packet[field.oct_pos] 以降に一括でコピーする
+    # 配列の要素の型の大きさ，整数か浮動小数点数かが DB の型と異なる場合は，コンパイルエラーにする（負のサイズの配列）
+    # （int32_t の配列を float として読むなど，大きさが同じでも値の表現が異なるものはビット列のままコピーできない）
+    size = CONV_TYPE_TO_SIZE[field.var_type]
+    dest = "&packet[" + str(field.oct_pos) + "]"
+    src = "&" + base + "[" + str(index) + "]"
+    elem = base + "[0]"
+    func_code.Emit(
+        "  (void)sizeof(char[(sizeof("
+        + elem
+        + ") == "
+        + str(size)
+        + " && "
+        + GenerateTlmTypeKindCheck_(elem, field.var_type)
+        + ") ? 1 : -1]);  // 要素の型のチェック\n"
+    )
+    if size == 1:
+        func_code.Emit("  memcpy(" + dest + ", " + src + ", " + str(num) + ");\n")
+    else:
+        func_code.Emit(
+            "  Tlm_copy_array_(" + dest + ", " + src + ", " + str(size) + ", " + str(num) + ");\n"
+        )
+
+
+def GenerateTlmCopyArray_(body_c):
+    body_c.Emit(
+        """
 
-    body_c += "\n"
-    body_c += "void TF_load_tlm_table(TF_TlmInfo tlm_table[TF_MAX_TLMS])\n"
-    body_c += "{\n"
+static void Tlm_copy_array_(uint8_t* dest, const void* src, size_t elem_size, size_t elem_num)
+{
+  // elem_size byte の要素 elem_num 個を一括でコピーし，TF_copy_* と同様にエンディアンを変換する
+  memcpy(dest, src, elem_size * elem_num);
+#ifdef IS_LITTLE_ENDIAN
+  {
+    size_t i;
+    size_t j;
+    for (i = 0; i < elem_size * elem_num; i += elem_size)
+    {
+      for (j = 0; j < elem_size / 2; ++j)
+      {
+        uint8_t temp = dest[i + j];
+        dest[i + j] = dest[i + elem_size - 1 - j];
+        dest[i + elem_size - 1 - j] = temp;
+      }
+    }
+  }
+#endif
+}
+"""[
+            1:
+        ]  # 最初の改行を除く
+    )
+
+
+def GenerateTlmLenTable_(body_c, tlm_db):
+    # TLM ID で引く，テレメごとの固定長の情報（TF_TlmLenInfo）のテーブル
+    # パケット長は，テレメ生成関数が *len に設定するもの（DB 上で最後の要素の末尾）と同じ
+    # C89 でも使えるように，指定初期化子は使わずに全要素（0 - TLM_CODE_MAX - 1）を列挙する
+    # TLM_CODE_MAX は TLM_CODE の最後の enum（DB の TLM ID の文字列順で最後のもの）の次の値であり，
+    # 最大の TLM ID + 1 とは限らないため，enum と同じ順で求める．TLM_CODE_MAX 以上の TLM ID のテレメは載せない
+    # （TF_get_tlm_len_info も TLM_CODE_MAX 以上では NULL を返す）
+    tlm_code_max = int(tlm_db[-1].tlm_id, 0) + 1 if tlm_db else 0
+    tlms = {}
     for tlm in tlm_db:
-        # "  tlm_table[OBC_ID].tlm_func = OBC_;"
-        body_c += (
-            "  tlm_table[Tlm_CODE_"
-            + tlm["tlm_name"].upper()
-            + "].tlm_func = Tlm_"
-            + tlm["tlm_name"].upper()
-            + "_;\n"
+        tlm_id = int(tlm.tlm_id, 0)
+        if tlm_id in tlms:
+            raise my_mod.util.GenerateError("TLM ID " + tlm.tlm_id + " is duplicated")
+        tlms[tlm_id] = tlm
+
+    body_c.Emit("\n")
+    body_c.Emit("const TF_TlmLenInfo TF_tlm_len_table[TLM_CODE_MAX] =\n")
+    body_c.Emit("{\n")
+    for tlm_id in range(tlm_code_max):
+        if tlm_id not in tlms:
+            body_c.Emit("  { NULL, 0, 0 },  // " + "0x%02x" % tlm_id + "\n")
+            continue
+        tlm = tlms[tlm_id]
+        layout = my_mod.tlm_layout.AnalyzeTlmLayout(tlm)
+        field_num = len([field for field in tlm.fields if field.oct_pos is not None])
+        body_c.Emit(
+            "  { Tlm_"
+            + tlm.tlm_name.upper()
+            + "_, "
+            + str(layout["max_pos"])
+            + ", "
+            + str(field_num)
+            + " },  // "
+            + "0x%02x" % tlm_id
+            + ": Tlm_CODE_"
+            + tlm.tlm_name.upper()
+            + "\n"
         )
-    body_c += "}\n"
+    body_c.Emit("};\n")
+
+
+def IsTlmPackerTableUsed_(settings):
+    if settings.get("tlm_packer_mode", "function") == "table":
+        return True
+    return "table" in settings.get("tlm_packer_mode_of_tlm", {}).values()
 
+
+def GetTlmPackerModes_(settings, tlm_db):
+    # 戻り値: {TLM 名（大文字）: "function" or "table"}
+    default_mode = settings.get("tlm_packer_mode", "function")
+    mode_of_tlm = {k.upper(): v for k, v in settings.get("tlm_packer_mode_of_tlm", {}).items()}
+    tlm_names = set(tlm.tlm_name.upper() for tlm in tlm_db)
+    for tlm_name in mode_of_tlm:
+        if tlm_name not in tlm_names:
+            raise my_mod.util.GenerateError("tlm_packer_mode_of_tlm: unknown tlm " + tlm_name)
+
+    modes = {}
     for tlm in tlm_db:
-        func_code = ""
-        max_pos = ""
-        for i in range(DATA_START_ROW, len(tlm["data"])):
-            comment = tlm["data"][i][0]
-            name = tlm["data"][i][1]
-            var_type = tlm["data"][i][2]
-            code = tlm["data"][i][3]
-            pos = tlm["data"][i][5]
-            if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
-                break
-            if comment != "":
-                continue
-            if name == "":
-                continue
-            if var_type == "":
-                continue
-            if code == "":
-                continue
-            if pos == "":
-                continue
-
-            pos = int(pos)
-            code = code.replace("@@", ",")
-            func_code += "  "
-            if var_type == "int8_t":
-                func_code += "TF_copy_i8"
-                max_pos = pos + 1
-            elif var_type == "int16_t":
-                func_code += "TF_copy_i16"
-                max_pos = pos + 2
-            elif var_type == "int32_t":
-                func_code += "TF_copy_i32"
-                max_pos = pos + 4
-            elif var_type == "uint8_t":
-                func_code += "TF_copy_u8"
-                max_pos = pos + 1
-            elif var_type == "uint16_t":
-                func_code += "TF_copy_u16"
-                max_pos = pos + 2
-            elif var_type == "uint32_t":
-                func_code += "TF_copy_u32"
-                max_pos = pos + 4
-            elif var_type == "float":
-                func_code += "TF_copy_float"
-                max_pos = pos + 4
-            elif var_type == "double":
-                func_code += "TF_copy_double"
-                max_pos = pos + 8
-            else:
-                print("Error: Tlm DB Err at " + tlm["tlm_name"].upper(), file=sys.stderr)
-                sys.exit(1)
-            func_code += "(&packet[" + str(pos) + "], " + code + ");\n"
-
-        body_c += "\n"
-        body_c += (
-            "static TF_TLM_FUNC_ACK Tlm_"
-            + tlm["tlm_name"].upper()
-            + "_(uint8_t* packet, uint16_t* len, uint16_t max_len)\n"
+        tlm_name_upper = tlm.tlm_name.upper()
+        mode = mode_of_tlm.get(tlm_name_upper, default_mode)
+        if mode not in TLM_PACKER_MODES:
+            raise my_mod.util.GenerateError(
+                "tlm_packer_mode is invalid at " + tlm_name_upper + " (" + str(mode) + ")"
+            )
+        modes[tlm_name_upper] = mode
+    return modes
+
+
+def GenerateTlmTableFunc_(settings, body_c, body_c_packer, tlm, packer):
+    # 記述子テーブル（オフセット，型，値の場所）と，共通の packer でテレメを生成する
+    # 値の場所は，"hoge->fuga.piyo[3]" のような root ポインタの要素であれば，(root, root からのバイトオフセット) とし，
+    # それ以外の式の場合は，値を取得する getter とする．同じ式の getter はテレメ間で共有する
+    # root の要素の型は生成時にはわからないため，DB の型で直接読めない（DB の型より小さい，整数でないなど）要素は，
+    # コンパイル時に root を TLM_PACKER_ROOT_FUNC_ とし，テレメ関数内で "function" と同じコードで生成する
+    # local 変数を使うテレメは，getter 間で local 変数を共有できないため，関数で生成する
+    tlm_name_upper = tlm.tlm_name.upper()
+
+    fields = []
+    max_pos = ""
+    for field in tlm.fields:
+        if field.var_type == "":
+            continue
+        if field.code == "":
+            continue
+        if field.oct_pos is None:
+            continue
+
+        if field.var_type not in CONV_TYPE_TO_COPY_FUNC:
+            raise my_mod.util.GenerateError("Tlm DB Err at " + tlm_name_upper)
+        max_pos = field.oct_pos + CONV_TYPE_TO_SIZE[field.var_type]
+        fields.append(field)
+
+    if len(tlm.local_vars) > 0 or len(fields) == 0:
+        GenerateTlmFunc_(body_c, tlm)
+        return
+    packer["is_used"] = True
+
+    if packer["root_types"] is None:
+        packer["root_types"] = GetTlmRootTypes_(settings)
+
+    entries = []
+    fallbacks = []
+    for field in fields:
+        root_member = ParseTlmRootMember_(field.code, field.var_type, packer["root_types"])
+        if root_member is not None:
+            root, member = root_member
+            root_type = packer["root_types"][root]
+            readable_check = GenerateTlmReadableCheck_(root + "->" + member, field.var_type)
+            if root not in packer["roots"]:
+                packer["roots"][root] = len(packer["roots"])
+            entries.append(
+                (
+                    CONV_TYPE_TO_PACKER_TYPE[field.var_type]
+                    + " | TLM_PACKER_SRC_SIZE_("
+                    + root_type
+                    + ", "
+                    + member
+                    + ")",
+                    readable_check
+                    + " ? "
+                    + str(packer["roots"][root])
+                    + " : TLM_PACKER_ROOT_FUNC_",
+                    "offsetof(" + root_type + ", " + member + ")",
+                )
+            )
+            fallbacks.append((readable_check, field))
+            continue
+
+        key = (field.var_type, field.code)
+        if key not in packer["getters"]:
+            packer["getters"][key] = len(packer["getters"])
+            body_c_packer.Emit(
+                "static void Tlm_get_"
+                + str(packer["getters"][key])
+                + "_(TlmPackerValue_* value) { value->"
+                + CONV_TYPE_TO_PACKER_VALUE[field.var_type]
+                + " = "
+                + field.code
+                + "; }\n"
+            )
+        entries.append(
+            (
+                CONV_TYPE_TO_PACKER_TYPE[field.var_type],
+                "TLM_PACKER_ROOT_NONE_",
+                str(packer["getters"][key]),
+            )
         )
-        body_c += "{\n"
-        for local_var in tlm["local_vars"]:
-            body_c += "  " + local_var + "\n"
-        if len(tlm["local_vars"]) > 0:
-            body_c += "\n"
-        body_c += "  if (" + str(max_pos) + " > max_len) return TF_TLM_FUNC_ACK_TOO_SHORT_LEN;\n"
-        body_c += "\n"
-        body_c += "#ifndef BUILD_SETTINGS_FAST_BUILD\n"
-        body_c += func_code
-        body_c += "#endif\n"
-        body_c += "\n"
-        body_c += "  *len = " + str(max_pos) + ";\n"
-        body_c += "  return TF_TLM_FUNC_ACK_SUCCESS;\n"
-        body_c += "}\n"
 
-    OutputTlmDefC_(output_file_path + output_file_name_base + ".c", body_c, settings)
-    OutputTlmDefH_(output_file_path + output_file_name_base + ".h", body_h, settings)
+    body_c.Emit("\n")
+    body_c.Emit("static const TlmPackerField_ Tlm_" + tlm_name_upper + "_fields_[] =\n")
+    body_c.Emit("{\n")
+    for field, (packer_type, root, index) in zip(fields, entries):
+        body_c.Emit(
+            "  { " + str(field.oct_pos) + ", " + packer_type + ", " + root + ", " + index + " },\n"
+        )
+    body_c.Emit("};\n")
+    body_c.Emit("\n")
+    body_c.Emit(
+        "static TF_TLM_FUNC_ACK Tlm_"
+        + tlm_name_upper
+        + "_(uint8_t* packet, uint16_t* len, uint16_t max_len)\n"
+    )
+    body_c.Emit("{\n")
+    if not fallbacks:
+        body_c.Emit(
+            "  return Tlm_pack_fields_(packet, len, max_len, "
+            + str(max_pos)
+            + ", Tlm_"
+            + tlm_name_upper
+            + "_fields_, sizeof(Tlm_"
+            + tlm_name_upper
+            + "_fields_) / sizeof(Tlm_"
+            + tlm_name_upper
+            + "_fields_[0]));\n"
+        )
+        body_c.Emit("}\n")
+        return
+
+    body_c.Emit(
+        "  TF_TLM_FUNC_ACK ack = Tlm_pack_fields_(packet, len, max_len, "
+        + str(max_pos)
+        + ", Tlm_"
+        + tlm_name_upper
+        + "_fields_, sizeof(Tlm_"
+        + tlm_name_upper
+        + "_fields_) / sizeof(Tlm_"
+        + tlm_name_upper
+        + "_fields_[0]));\n"
+    )
+    body_c.Emit("  if (ack != TF_TLM_FUNC_ACK_SUCCESS) return ack;\n")
+    body_c.Emit("\n")
+    body_c.Emit("#ifndef BUILD_SETTINGS_FAST_BUILD\n")
+    body_c.Emit("  // root の要素のうち，DB の型で直接読めない（DB の型より小さい，整数でないなど）ものは，\n")
+    body_c.Emit('  // packer では読まず（TLM_PACKER_ROOT_FUNC_），ここで "function" と同じコードで生成する\n')
+    body_c.Emit("  // 条件は定数式なので，直接読める要素のコードは最適化で除かれる\n")
+    for readable_check, field in fallbacks:
+        body_c.Emit(
+            "  if (!"
+            + readable_check
+            + ") "
+            + CONV_TYPE_TO_COPY_FUNC[field.var_type]
+            + "(&packet["
+            + str(field.oct_pos)
+            + "], "
+            + field.code
+            + ");\n"
+        )
+    body_c.Emit("#endif\n")
+    body_c.Emit("\n")
+    body_c.Emit("  return ack;\n")
+    body_c.Emit("}\n")
+
+
+def GenerateTlmReadableCheck_(expr, var_type):
+    # root の要素 expr を DB の型 var_type として直接読めるかの，定数式
+    # 浮動小数点数は型が一致すること，整数は DB の型以上 4 byte 以下の大きさの整数型であること（packer で切り詰める）
+    if var_type == "double":
+        return "TLM_PACKER_IS_DOUBLE_READABLE_(" + expr + ")"
+    if var_type == "float":
+        return "TLM_PACKER_IS_FLOAT_READABLE_(" + expr + ")"
+    return "TLM_PACKER_IS_INT_READABLE_(" + expr + ", " + str(CONV_TYPE_TO_SIZE[var_type]) + ")"
+
+
+def GenerateTlmTypeKindCheck_(expr, var_type):
+    # expr が，DB の型 var_type と同じく整数か浮動小数点数（float / double）かの，定数式
+    # 同じ大きさの整数と浮動小数点数は，int64_t や float との演算結果の大きさで区別する
+    if var_type == "double":
+        return "sizeof((" + expr + ") + 0.0f) == 8"
+    if var_type == "float":
+        return "sizeof((" + expr + ") + (int64_t)0) == 4"
+    return "sizeof((" + expr + ") + (int64_t)0) == 8"
+
+
+def ParseTlmRootMember_(code, var_type, root_types):
+    # "hoge->fuga.piyo[3]" のような，root_types にある root ポインタの要素（添字は整数リテラルのみ）であれば，
+    # (root, 要素) を返す．それ以外の式（関数呼び出しなど）は None
+    # DB の型と同じ整数型へのキャストは，packer での切り詰めと同じなので外す
+    code = StripEnclosingParen_(code)
+    cast = _int_cast_pattern.match(code)
+    if cast is not None:
+        if cast.group(1) != var_type:
+            return None
+        code = StripEnclosingParen_(cast.group(2))
+    match = _root_member_pattern.match(code)
+    if match is None or match.group(1) not in root_types:
+        return None
+    return match.group(1), re.sub(r"\s+", "", match.group(2))
+
+
+def StripEnclosingParen_(code):
+    code = code.strip()
+    enclosed = _enclosed_pattern.match(code)
+    if enclosed is not None:
+        code = enclosed.group(1).strip()
+    return code
+
+
+def GetTlmRootTypes_(settings):
+    # 戻り値: {root ポインタ名: 型名}
+    # C2A では，アプリなどの状態は "extern const Hoge* const hoge;" として公開されているので，
+    # c2a-core（この code-generator を含むリポジトリ）と src_user のヘッダから，その宣言を集める
+    core_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    search_dirs = [
+        os.path.join(core_path, core_dir)
+        for core_dir in ["applications", "component_driver", "hal", "library", "system", "tlm_cmd"]
+    ]
+    search_dirs.append(settings["path_to_src"] + "src_user")
+
+    root_types = {}
+    for search_dir in search_dirs:
+        for root, _, files in sorted(os.walk(search_dir)):
+            for file in sorted(files):
+                if not file.endswith(".h"):
+                    continue
+                with open(os.path.join(root, file), encoding="utf-8", errors="replace") as fh:
+                    for match in _root_decl_pattern.finditer(fh.read()):
+                        root_types[match.group(2)] = match.group(1)
+    return root_types
+
+
+def GenerateTlmPacker_(body_c, body_c_packer, packer):
+    # 記述子テーブルで生成するテレメが共通で使う型，root，getter と packer
+    body_c.Emit(
+        """
+
+typedef union
+{
+  int8_t i8;
+  int16_t i16;
+  int32_t i32;
+  uint8_t u8;
+  uint16_t u16;
+  uint32_t u32;
+  float f;
+  double d;
+} TlmPackerValue_;
+
+typedef enum
+{
+  TLM_PACKER_TYPE_I8_,
+  TLM_PACKER_TYPE_I16_,
+  TLM_PACKER_TYPE_I32_,
+  TLM_PACKER_TYPE_U8_,
+  TLM_PACKER_TYPE_U16_,
+  TLM_PACKER_TYPE_U32_,
+  TLM_PACKER_TYPE_FLOAT_,
+  TLM_PACKER_TYPE_DOUBLE_
+} TLM_PACKER_TYPE_;
+
+#define TLM_PACKER_ROOT_NONE_ (0xff)  //!< root ではなく getter で値を取得する
+#define TLM_PACKER_ROOT_FUNC_ (0xfe)  //!< root の要素を DB の型で直接読めないため，テレメ関数で生成する
+#define TLM_PACKER_SRC_SIZE_(type, member) (sizeof(((type*)0)->member) << 4)  //!< root の要素の大きさ
+
+// root の要素 expr を DB の型で直接読めるか？（定数式）
+// 整数は DB の型以上 4 byte 以下の大きさの整数型（packer で切り詰める），浮動小数点数は同じ型であること
+// 同じ大きさの整数と浮動小数点数は，int64_t や float との演算結果の大きさで区別する
+#define TLM_PACKER_IS_INT_READABLE_(expr, size) \\
+  (sizeof(expr) >= (size) && sizeof(expr) <= 4 && sizeof((expr) + (int64_t)0) == 8)
+#define TLM_PACKER_IS_FLOAT_READABLE_(expr) (sizeof(expr) == 4 && sizeof((expr) + (int64_t)0) == 4)
+#define TLM_PACKER_IS_DOUBLE_READABLE_(expr) (sizeof(expr) == 8 && sizeof((expr) + 0.0f) == 8)
+
+typedef struct
+{
+  uint16_t offset;   //!< パケット内のオフセット
+  uint8_t type;      //!< 下位 4 bit: TLM_PACKER_TYPE_，上位 4 bit: root の要素の大きさ
+  uint8_t root;      //!< Tlm_packer_roots_ の index．TLM_PACKER_ROOT_NONE_ の場合は getter を使う．TLM_PACKER_ROOT_FUNC_ の場合は生成しない
+  uint32_t index;    //!< root からのバイトオフセット，または Tlm_packer_getters_ の index
+} TlmPackerField_;
+"""[
+            1:
+        ]  # 最初の改行を除く
+    )
+
+    roots = sorted(packer["roots"].items(), key=lambda x: x[1])
+    if len(roots) > 0xFF:
+        raise my_mod.util.GenerateError("too many roots for tlm_packer_mode table")
+    if roots:
+        body_c.Emit("\n")
+        for root, index in roots:
+            body_c.Emit(
+                "static const void* Tlm_root_" + str(index) + "_(void) { return " + root + "; }\n"
+            )
+        body_c.Emit("\n")
+        body_c.Emit("static const void* (* const Tlm_packer_roots_[])(void) =\n")
+        body_c.Emit("{\n")
+        for _, index in roots:
+            body_c.Emit("  Tlm_root_" + str(index) + "_,\n")
+        body_c.Emit("};\n")
+        body_c.Emit(
+            """
+
+static const uint8_t Tlm_packer_type_size_[] = { 1, 2, 4, 1, 2, 4, 4, 8 };  //!< TLM_PACKER_TYPE_ ごとの大きさ
+
+// root の要素を読む．DB の型より大きい整数型の要素は，DB の型に切り詰める
+static void Tlm_read_root_(const TlmPackerField_* field, TlmPackerValue_* value)
+{
+  const uint8_t* src = (const uint8_t*)Tlm_packer_roots_[field->root]() + field->index;
+  uint8_t size = Tlm_packer_type_size_[field->type & 0x0f];
+  uint8_t src_size = (uint8_t)(field->type >> 4);
+  uint8_t src_u8;
+  uint16_t src_u16;
+  uint32_t src_u32;
+
+  if (src_size == size)
+  {
+    memcpy(value, src, size);
+    return;
+  }
+
+  switch (src_size)
+  {
+  case 1:
+    memcpy(&src_u8, src, 1);
+    src_u32 = src_u8;
+    break;
+  case 2:
+    memcpy(&src_u16, src, 2);
+    src_u32 = src_u16;
+    break;
+  default:
+    memcpy(&src_u32, src, 4);
+    break;
+  }
+
+  if (size == 1)
+  {
+    value->u8 = (uint8_t)src_u32;
+  }
+  else
+  {
+    value->u16 = (uint16_t)src_u32;
+  }
+}
+"""[
+                1:
+            ]  # 最初の改行を除く
+        )
+
+    if packer["getters"]:
+        body_c.Emit("\n")
+        body_c.Extend(body_c_packer)
+        body_c.Emit("\n")
+        body_c.Emit("static void (* const Tlm_packer_getters_[])(TlmPackerValue_* value) =\n")
+        body_c.Emit("{\n")
+        for index in range(len(packer["getters"])):
+            body_c.Emit("  Tlm_get_" + str(index) + "_,\n")
+        body_c.Emit("};\n")
+
+    body_c.Emit(
+        """
+
+static TF_TLM_FUNC_ACK Tlm_pack_fields_(uint8_t* packet, uint16_t* len, uint16_t max_len, uint16_t packet_len, const TlmPackerField_* fields, uint16_t field_num)
+{
+  uint16_t i;
+  TlmPackerValue_ value;
+
+  if (packet_len > max_len) return TF_TLM_FUNC_ACK_TOO_SHORT_LEN;
+
+#ifndef BUILD_SETTINGS_FAST_BUILD
+  for (i = 0; i < field_num; ++i)
+  {
+    const TlmPackerField_* field = &fields[i];
+    uint8_t* dest = &packet[field->offset];
+"""[
+            1:
+        ]  # 最初の改行を除く
+    )
+    if roots:
+        body_c.Emit("\n")
+        body_c.Emit("    if (field->root == TLM_PACKER_ROOT_FUNC_) continue;  // テレメ関数で生成する\n")
+        body_c.Emit("\n")
+    # root, getter の一方しか使われない場合は，他方のテーブルは生成されない
+    if roots and packer["getters"]:
+        body_c.Emit(
+            """
+    if (field->root == TLM_PACKER_ROOT_NONE_)
+    {
+      Tlm_packer_getters_[field->index](&value);
+    }
+    else
+    {
+      Tlm_read_root_(field, &value);
+    }
+"""[
+                1:
+            ]  # 最初の改行を除く
+        )
+    elif roots:
+        body_c.Emit("    Tlm_read_root_(field, &value);\n")
+    else:
+        body_c.Emit("    Tlm_packer_getters_[field->index](&value);\n")
+    body_c.Emit(
+        """
+    switch (field->type & 0x0f)
+    {
+    case TLM_PACKER_TYPE_I8_:
+      TF_copy_i8(dest, value.i8);
+      break;
+    case TLM_PACKER_TYPE_I16_:
+      TF_copy_i16(dest, value.i16);
+      break;
+    case TLM_PACKER_TYPE_I32_:
+      TF_copy_i32(dest, value.i32);
+      break;
+    case TLM_PACKER_TYPE_U8_:
+      TF_copy_u8(dest, value.u8);
+      break;
+    case TLM_PACKER_TYPE_U16_:
+      TF_copy_u16(dest, value.u16);
+      break;
+    case TLM_PACKER_TYPE_U32_:
+      TF_copy_u32(dest, value.u32);
+      break;
+    case TLM_PACKER_TYPE_FLOAT_:
+      TF_copy_float(dest, value.f);
+      break;
+    case TLM_PACKER_TYPE_DOUBLE_:
+      TF_copy_double(dest, value.d);
+      break;
+    default:
+      break;
+    }
+  }
+#else
+  (void)i;
+  (void)value;
+  (void)fields;
+  (void)field_num;
+#endif
+
+  *len = packet_len;
+  return TF_TLM_FUNC_ACK_SUCCESS;
+}
+
+"""[
+            1:
+        ]  # 最初の改行を除く
+    )
 
 
 def GenerateOtherObcTlmDef(settings, other_obc_dbs):
@@ -124,146 +743,165 @@ def GenerateOtherObcTlmDef(settings, other_obc_dbs):
         if not settings["other_obc_data"][i]["is_enable"]:
             continue
         obc_name = settings["other_obc_data"][i]["name"]
+        GenerateOtherObcTlmDefOfObc(settings, i, other_obc_dbs[obc_name])
 
-        tlm_db = other_obc_dbs[obc_name]
 
-        body_h = ""
-        # "  TOBC_Tlm_CODE_HK = 0xf0,"
-        for tlm in tlm_db:
-            body_h += (
-                "  {_obc_name_upper}_Tlm_CODE_"
-                + tlm["tlm_name"].upper()
-                + " = "
-                + tlm["tlm_id"]
-                + ",\n"
-            )
-        output_file_path = (
-            settings["path_to_src"]
-            + r"src_user/component_driver/"
-            + settings["other_obc_data"][i]["driver_path"]
-            + obc_name.lower()
-            + "_telemetry_definitions.h"
+def GenerateOtherObcTlmDefOfObc(settings, obc_idx, tlm_db):
+    # OBC ごとに独立しているので，OBC ごとに並列に実行してよい
+    obc_name = settings["other_obc_data"][obc_idx]["name"]
+
+    body_h = my_mod.emitter.Emitter(obc_name)
+    # "  TOBC_Tlm_CODE_HK = 0xf0,"
+    for tlm in tlm_db:
+        body_h.Emit(
+            "  {_obc_name_upper}_Tlm_CODE_" + tlm.tlm_name.upper() + " = " + tlm.tlm_id + ",\n"
         )
-        OutputOtherObcTlmDefH(output_file_path, obc_name, body_h, settings, i)
+    output_file_path = (
+        settings["path_to_src"]
+        + r"src_user/component_driver/"
+        + settings["other_obc_data"][obc_idx]["driver_path"]
+        + obc_name.lower()
+        + "_telemetry_definitions.h"
+    )
+    OutputOtherObcTlmDefH(output_file_path, obc_name, body_h, settings, obc_idx)
 
 
 def OutputTlmDefC_(file_path, body, settings):
-    output = ""
-    output += """
+    output = my_mod.emitter.Emitter()
+    output.Emit(
+        """
 #pragma section REPRO
 /**
  * @file
  * @brief テレメトリ定義
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += my_mod.util.GenerateSettingNote(settings)
+    output.Emit(my_mod.util.GenerateSettingNote(settings))
 
-    output += """
+    output.Emit(
+        """
  */
 #include <src_core/tlm_cmd/telemetry_frame.h>
 #include "telemetry_definitions.h"
 #include "telemetry_source.h"
-
 """[
-        1:
-    ]  # 最初の改行を除く
-
-    output += body
-
-    output += """
+            1:
+        ]  # 最初の改行を除く
+    )
+    if settings.get("is_tlm_bulk_copy_enabled", 0):
+        # memcpy と，ENDIAN_memcpy と同じエンディアンの判定のため
+        output.Emit("#include <string.h>\n")
+        output.Emit("#include <src_user/settings/build_settings.h>\n")
+    elif IsTlmPackerTableUsed_(settings):
+        output.Emit("#include <string.h>\n")
+    if IsTlmPackerTableUsed_(settings):
+        output.Emit("#include <stddef.h>\n")  # offsetof
+    output.Emit("\n")
+
+    output.Extend(body)
+
+    output.Emit(
+        """
 
 #pragma section
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    with open(file_path, mode="w", encoding=settings["output_file_encoding"]) as fh:
-        fh.write(output)
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
 
 
 def OutputTlmDefH_(file_path, body, settings):
-    output = ""
-    output += """
+    output = my_mod.emitter.Emitter()
+    output.Emit(
+        """
 /**
  * @file
  * @brief テレメトリ定義
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += my_mod.util.GenerateSettingNote(settings)
+    output.Emit(my_mod.util.GenerateSettingNote(settings))
 
-    output += """
+    output.Emit(
+        """
  */
 #ifndef TELEMETRY_DEFINITIONS_H_
 #define TELEMETRY_DEFINITIONS_H_
 
-typedef enum
-{
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
+    if settings.get("is_tlm_len_table_enabled", 0):
+        output.Emit("// TF_tlm_len_table を telemetry_definitions.c で定義する\n")
+        output.Emit("#define TLM_LEN_TABLE_ENABLED\n")
+        output.Emit("\n")
+    output.Emit("typedef enum\n")
+    output.Emit("{\n")
 
-    output += body
+    output.Extend(body)
 
-    output += """
+    output.Emit(
+        """
 
   TLM_CODE_MAX
 } TLM_CODE;
 
 #endif
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    with open(file_path, mode="w", encoding=settings["output_file_encoding"]) as fh:
-        fh.write(output)
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
 
 
 def OutputOtherObcTlmDefH(file_path, name, body, settings, obc_idx):
-    name_upper = name.upper()
-    name_lower = name.lower()
-    name_capit = name.capitalize()
-
-    output = ""
-    output += """
+    output = my_mod.emitter.Emitter(name)
+    output.Emit(
+        """
 /**
  * @file
  * @brief テレメトリ定義
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += my_mod.util.GenerateSubObcSettingNote(settings, obc_idx)
+    output.Emit(my_mod.util.GenerateSubObcSettingNote(settings, obc_idx))
 
-    output += """
+    output.Emit(
+        """
  */
 #ifndef {_obc_name_upper}_TELEMETRY_DEFINITIONS_H_
 #define {_obc_name_upper}_TELEMETRY_DEFINITIONS_H_
 
 typedef enum
-{{
+{
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    output += body
+    output.Extend(body)
 
-    output += """
+    output.Emit(
+        """
 
   {_obc_name_upper}_TLM_CODE_MAX
-}} {_obc_name_upper}_TLM_CODE;
+} {_obc_name_upper}_TLM_CODE;
 
 #endif
 """[
-        1:
-    ]  # 最初の改行を除く
+            1:
+        ]  # 最初の改行を除く
+    )
 
-    with open(file_path, mode="w", encoding=settings["output_file_encoding"]) as fh:
-        fh.write(
-            output.format(
-                _obc_name_upper=name_upper, _obc_name_lower=name_lower, _obc_name_capit=name_capit
-            )
-        )
+    my_mod.util.WriteOutputFile(file_path, output.GetOutput(), settings)
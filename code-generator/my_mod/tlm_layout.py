@@ -0,0 +1,276 @@
+# coding: UTF-8
+"""
+テレメのメモリレイアウト解析
+テレメ生成関数の一括コピー（配列の連続した要素を 1 回でコピーする）の検出と，
+DB 作成者向けのレイアウトレポート（隙間，重なり，max_pos，一括コピーにならない理由）の生成
+"""
+
+import re
+
+import my_mod.emitter
+import my_mod.util
+
+VAR_TYPE_TO_SIZE = {
+    "int8_t": 1,
+    "int16_t": 2,
+    "int32_t": 4,
+    "uint8_t": 1,
+    "uint16_t": 2,
+    "uint32_t": 4,
+    "float": 4,
+    "double": 8,
+}
+
+# "hoge->fuga.piyo[12]" のような，添字が定数の配列要素
+# 関数呼び出しやキャストを含むもの，添字が式のものは対象外
+_array_elem_pattern = re.compile(r"^([A-Za-z_][\w.\[\]]*(?:->[\w.\[\]]+)*)\[(\d+)\]$")
+
+# 一括コピーにならない理由
+REASON_NOT_ARRAY_ELEM = "not a constant-index array element"
+REASON_BIT_FIELD = "bit field"
+REASON_INDEX = "index not consecutive"
+REASON_TYPE = "type differs from neighbour"
+REASON_POSITION = "packet position not contiguous"
+REASON_ALONE = "no neighbouring element of the same array"
+
+
+def GetCopyFields(tlm):
+    # テレメ生成関数でコピーされる要素（GenerateTlmFunc_ で TF_copy_* が生成されるもの）
+    return [
+        field
+        for field in tlm.fields
+        if field.var_type != "" and field.code != "" and field.oct_pos is not None
+    ]
+
+
+def FindBulkCopyRuns(fields):
+    # fields: GetCopyFields の戻り値
+    # 戻り値: [(開始 index, 要素数, 配列名, 開始添字)]．要素数 1 の run は含まない
+    # 同じ配列の連続した添字で，型が同じで，パケット上でも隙間なく並ぶ要素をまとめる
+    # ここでは DB の型しか見ないため，配列の要素の C の型が DB の型と（大きさと，整数か浮動小数点数かが）一致することは，
+    # 生成するコードでコンパイル時にチェックする（tlm_def.GenerateTlmBulkCopy_）
+    runs = []
+    i = 0
+    while i < len(fields):
+        array_elem = ParseArrayElem_(fields[i])
+        if array_elem is None:
+            i += 1
+            continue
+        base, index = array_elem
+        num = 1
+        while i + num < len(fields):
+            if GetBreakReason_(fields[i + num - 1], fields[i + num]) is not None:
+                break
+            num += 1
+        if num > 1:
+            runs.append((i, num, base, index))
+        i += num
+    return runs
+
+
+def AnalyzeTlmLayout(tlm):
+    # 戻り値: レイアウトの解析結果の dict
+    #   max_pos:      生成コードのパケット長（DB 上で最後の要素の末尾）
+    #   max_end:      全要素の末尾の最大値．max_pos より大きい場合，パケットに入らない要素がある
+    #   gaps:         [(開始 bit, 終了 bit)]．ヘッダを含め，どの要素にも使われていない bit 範囲
+    #   overlaps:     [(開始 bit, 終了 bit)]．複数の要素に使われている bit 範囲
+    #   copy_num:     コピーする要素数
+    #   runs:         FindBulkCopyRuns の戻り値
+    #   miss_reasons: {一括コピーにならない理由: [要素名]}
+    fields = GetCopyFields(tlm)
+    result = {
+        "max_pos": 0,
+        "max_end": 0,
+        "gaps": [],
+        "overlaps": [],
+        "copy_num": len(fields),
+        "runs": [],
+        "miss_reasons": {},
+    }
+    if fields:
+        result["max_pos"] = fields[-1].oct_pos + VAR_TYPE_TO_SIZE[fields[-1].var_type]
+
+    # bit 単位の使用状況
+    usage = []
+    for field in tlm.fields:
+        if field.oct_pos is None or field.bit_pos is None or field.bit_len is None:
+            continue
+        start = field.oct_pos * 8 + field.bit_pos
+        usage.append((start, start + field.bit_len))
+    if usage:
+        result["max_end"] = (max(end for _, end in usage) + 7) // 8
+    result["gaps"], result["overlaps"] = FindGapsAndOverlaps_(
+        usage, max(result["max_pos"], result["max_end"]) * 8
+    )
+
+    runs = FindBulkCopyRuns(fields)
+    result["runs"] = runs
+    in_run = set()
+    for start, num, _, _ in runs:
+        in_run.update(range(start, start + num))
+    for i, field in enumerate(fields):
+        if i in in_run:
+            continue
+        reason = GetMissReason_(fields, i)
+        result["miss_reasons"].setdefault(reason, []).append(field.name)
+    return result
+
+
+def GenerateTlmLayoutReport(settings, tlm_db):
+    output = my_mod.emitter.Emitter()
+    output.Emit("TLM layout report\n")
+    output.Emit("db_prefix: " + settings["db_prefix"] + "\n")
+    output.Emit("positions are [start, end) in byte.bit\n")
+
+    total_copy_num = 0
+    total_bulk_num = 0
+    for tlm in tlm_db:
+        layout = AnalyzeTlmLayout(tlm)
+        fields = GetCopyFields(tlm)
+        bulk_num = sum(num for _, num, _, _ in layout["runs"])
+        total_copy_num += layout["copy_num"]
+        total_bulk_num += bulk_num
+
+        output.Emit("\n")
+        output.Emit(tlm.tlm_name.upper() + " (" + tlm.tlm_id + ")\n")
+        output.Emit("  max_pos:   " + str(layout["max_pos"]) + "\n")
+        if layout["max_end"] > layout["max_pos"]:
+            output.Emit(
+                "  WARNING:   fields end at "
+                + str(layout["max_end"])
+                + ", beyond max_pos (the last field is not the last in the packet)\n"
+            )
+        output.Emit("  gaps:      " + FormatBitRanges_(layout["gaps"]) + "\n")
+        output.Emit("  overlaps:  " + FormatBitRanges_(layout["overlaps"]) + "\n")
+        output.Emit(
+            "  bulk copy: "
+            + str(bulk_num)
+            + " / "
+            + str(layout["copy_num"])
+            + " fields in "
+            + str(len(layout["runs"]))
+            + " run(s)\n"
+        )
+        for start, num, base, index in layout["runs"]:
+            field = fields[start]
+            size = VAR_TYPE_TO_SIZE[field.var_type]
+            output.Emit(
+                "    packet["
+                + str(field.oct_pos)
+                + ", "
+                + str(field.oct_pos + size * num)
+                + ") <- "
+                + base
+                + "["
+                + str(index)
+                + ", "
+                + str(index + num)
+                + ") ("
+                + field.var_type
+                + " x "
+                + str(num)
+                + ")\n"
+            )
+        for reason, names in layout["miss_reasons"].items():
+            output.Emit("  not bulk:  " + reason + ": " + str(len(names)) + " field(s)")
+            output.Emit(" (" + ", ".join(names[:3]) + (", ..." if len(names) > 3 else "") + ")\n")
+
+    output.Emit("\n")
+    output.Emit(
+        "total: bulk copy "
+        + str(total_bulk_num)
+        + " / "
+        + str(total_copy_num)
+        + " fields in "
+        + str(len(tlm_db))
+        + " packets\n"
+    )
+
+    my_mod.util.WriteOutputFile(settings["tlm_layout_report_path"], output.GetOutput(), settings)
+
+
+def ParseArrayElem_(field):
+    # 戻り値: (配列名, 添字) or None
+    if field.is_bit_field:
+        return None
+    match = _array_elem_pattern.match(field.code.strip())
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def GetBreakReason_(prev_field, field):
+    # prev_field と field を続けてコピーできない理由．同じ配列の要素でない場合は REASON_ALONE
+    # 続けてコピーできる場合は None
+    prev_array_elem = ParseArrayElem_(prev_field)
+    array_elem = ParseArrayElem_(field)
+    if prev_array_elem is None or array_elem is None or prev_array_elem[0] != array_elem[0]:
+        return REASON_ALONE
+    if array_elem[1] != prev_array_elem[1] + 1:
+        return REASON_INDEX
+    if field.var_type != prev_field.var_type:
+        return REASON_TYPE
+    if field.oct_pos != prev_field.oct_pos + VAR_TYPE_TO_SIZE[prev_field.var_type]:
+        return REASON_POSITION
+    return None
+
+
+def GetMissReason_(fields, i):
+    if fields[i].is_bit_field:
+        return REASON_BIT_FIELD
+    if ParseArrayElem_(fields[i]) is None:
+        return REASON_NOT_ARRAY_ELEM
+    # 前後の要素と続けられない理由のうち，同じ配列の要素との間のものを優先する
+    reasons = []
+    if i > 0:
+        reasons.append(GetBreakReason_(fields[i - 1], fields[i]))
+    if i + 1 < len(fields):
+        reasons.append(GetBreakReason_(fields[i], fields[i + 1]))
+    for reason in reasons:
+        if reason != REASON_ALONE:
+            return reason
+    return REASON_ALONE
+
+
+def FindGapsAndOverlaps_(usage, end_bit):
+    # usage: [(開始 bit, 終了 bit)]
+    # 戻り値: (gaps, overlaps)．[0, end_bit) の範囲で，使用数が 0 の範囲と 2 以上の範囲
+    events = {}
+    for start, end in usage:
+        events[start] = events.get(start, 0) + 1
+        events[end] = events.get(end, 0) - 1
+    events.setdefault(0, 0)
+    events.setdefault(end_bit, 0)
+
+    gaps = []
+    overlaps = []
+    count = 0
+    points = sorted(events)
+    for point, next_point in zip(points, points[1:]):
+        count += events[point]
+        if point >= end_bit:
+            break
+        if count == 0:
+            AppendRange_(gaps, point, next_point)
+        elif count > 1:
+            AppendRange_(overlaps, point, next_point)
+    return gaps, overlaps
+
+
+def AppendRange_(ranges, start, end):
+    if ranges and ranges[-1][1] == start:
+        ranges[-1] = (ranges[-1][0], end)
+    else:
+        ranges.append((start, end))
+
+
+def FormatBitRanges_(ranges):
+    if not ranges:
+        return "none"
+    return ", ".join(
+        "[" + FormatBitPos_(start) + ", " + FormatBitPos_(end) + ")" for start, end in ranges
+    )
+
+
+def FormatBitPos_(bit):
+    return str(bit // 8) + "." + str(bit % 8)
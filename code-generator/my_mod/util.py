@@ -7,6 +7,64 @@ import subprocess
 import sys
 import os
 import hashlib
+import threading
+import contextlib
+
+import my_mod.db_fingerprint
+import my_mod.git_repo
+
+
+_output_recorder = threading.local()
+
+
+class GenerateError(Exception):
+    # DB の不整合などで生成できない場合に送出する（メッセージは "Error: " を除いたもの）
+    # 呼び出し元でまとめて報告する
+    pass
+
+
+@contextlib.contextmanager
+def RecordOutputs():
+    # with ブロック内で WriteOutputFile された {ファイルパス: MD5} を集める
+    outputs = {}
+    prev_outputs = getattr(_output_recorder, "outputs", None)
+    _output_recorder.outputs = outputs
+    try:
+        yield outputs
+    finally:
+        _output_recorder.outputs = prev_outputs
+
+
+def WriteOutputFile(file_path, output, settings):
+    # 中身が変わらない場合は書き込まない（mtime を更新して C のリビルドを誘発しないため）
+    # 改行コードは open(mode="w") と同様に OS 依存とする
+    if os.linesep != "\n":
+        output = output.replace("\n", os.linesep)
+    data = output.encode(settings["output_file_encoding"])
+
+    try:
+        with open(file_path, mode="rb") as fh:
+            is_changed = fh.read() != data
+    except OSError:
+        is_changed = True
+
+    if is_changed:
+        with open(file_path, mode="wb") as fh:
+            fh.write(data)
+
+    outputs = getattr(_output_recorder, "outputs", None)
+    if outputs is not None:
+        outputs[file_path] = hashlib.md5(data).hexdigest()
+
+
+# settings の省略可能なパラメータ
+OPTIONAL_SETTING_KEYS = [
+    "is_cmd_table_const",
+    "tlm_packer_mode",
+    "tlm_packer_mode_of_tlm",
+    "is_tlm_bulk_copy_enabled",
+    "is_tlm_len_table_enabled",
+]
 
 
 def GenerateSettingNote(settings):
@@ -14,7 +72,11 @@ def GenerateSettingNote(settings):
     note += " * @note  このコードは自動生成されています！\n"
     note += " * @note  コード生成元 tlm-cmd-db:\n"
     note += " *          repository:    " + GetRepo_(settings["path_to_db"]) + "\n"
-    note += " *          CSV files MD5: " + GetDbHash_(settings["path_to_db"]) + "\n"
+    note += (
+        " *          CSV files MD5: "
+        + my_mod.db_fingerprint.GetDbHash(settings["path_to_db"])
+        + "\n"
+    )
     note += " * @note  コード生成パラメータ:\n"
     note += " *          db_prefix:             " + settings["db_prefix"] + "\n"
     note += " *          tlm_id_range:          "
@@ -22,12 +84,25 @@ def GenerateSettingNote(settings):
     note += " *          is_cmd_prefixed_in_db: " + str(settings["is_cmd_prefixed_in_db"]) + "\n"
     note += " *          input_file_encoding:   " + settings["input_file_encoding"] + "\n"
     note += " *          output_file_encoding:  " + settings["output_file_encoding"] + "\n"
+    # 省略可能なパラメータは，指定されている場合のみ出力する（省略時の生成コードを変えないため）
+    for key in OPTIONAL_SETTING_KEYS:
+        if key in settings:
+            note += " *          " + (key + ":").ljust(22) + " " + str(settings[key]) + "\n"
     # is_main_obc については，生成状況によって異なるので出力しない
     # path_to_src, path_to_db については，実行環境によって異なるので出力しない
 
     return note
 
 
+# other_obc_data の省略可能なパラメータ
+OPTIONAL_SUB_OBC_SETTING_KEYS = [
+    "is_tlm_analyze_coalesced",
+    "is_tlm_dispatch_table",
+    "tlm_buffer_pool_num",
+    "is_tlm_decode_lazy",
+]
+
+
 def GenerateSubObcSettingNote(settings, obc_idx):
     sub_obc_settings = settings["other_obc_data"][obc_idx]
 
@@ -36,7 +111,11 @@ def GenerateSubObcSettingNote(settings, obc_idx):
     note += " * @note  コード生成元 tlm-cmd-db:\n"
     note += " *          repository:     "
     note += GetRepo_(sub_obc_settings["path_to_db"]) + "\n"
-    note += " *          CSV files MD5:  " + GetDbHash_(sub_obc_settings["path_to_db"]) + "\n"
+    note += (
+        " *          CSV files MD5:  "
+        + my_mod.db_fingerprint.GetDbHash(sub_obc_settings["path_to_db"])
+        + "\n"
+    )
     note += " *          db commit hash: " + GetCommitHash_(sub_obc_settings["path_to_db"]) + "\n"
     note += " * @note  コード生成パラメータ:\n"
     note += " *          name:                    " + sub_obc_settings["name"] + "\n"
@@ -62,12 +141,33 @@ def GenerateSubObcSettingNote(settings, obc_idx):
     note += (
         " *          code_when_tlm_not_found: " + sub_obc_settings["code_when_tlm_not_found"] + "\n"
     )
+    # 省略可能なパラメータは，指定されている場合のみ出力する（省略時の生成コードを変えないため）
+    for key in OPTIONAL_SUB_OBC_SETTING_KEYS:
+        if key in sub_obc_settings:
+            note += " *          " + (key + ":").ljust(24) + " " + str(sub_obc_settings[key]) + "\n"
     # path_to_db については，実行環境によって異なるので出力しない
 
     return note
 
 
+def GetSettingNoteInputs(path_to_db, is_sub_obc):
+    # GenerateSettingNote / GenerateSubObcSettingNote が出力する値のうち，settings 以外のもの
+    # DB 全体の MD5 などは，generator の入力の CSV 以外の変化でも変わるので，差分生成の入力ハッシュに含める
+    inputs = [my_mod.db_fingerprint.GetDbHash(path_to_db)]
+    if is_sub_obc:
+        inputs.append(GetCommitHash_(path_to_db))
+    return inputs
+
+
 def GetCommitHash_(path):
+    repo_info = my_mod.git_repo.GetRepoInfo(path)
+    if repo_info is not None:
+        if repo_info["commit_hash"] is None:
+            print("Warn: failed to get commit hash(" + path + ")", file=sys.stderr)
+            return "unknown"
+        return repo_info["commit_hash"]
+
+    # .git を直接解決できない構成の場合は git コマンドにフォールバック
     try:
         result = subprocess.run(
             ["git", "rev-parse", "HEAD"], cwd=path, text=True, capture_output=True, check=True
@@ -89,6 +189,14 @@ def GetRepo_(path):
     # GitHub などの場合: github.com/user/repo のようにする
     # 取得に失敗した場合（Git 管理していないものなど）: unknown を返し，warning を出す
 
+    repo_info = my_mod.git_repo.GetRepoInfo(path)
+    if repo_info is not None:
+        if repo_info["remote_url"] is None:
+            print("Warn: failed to get git remote", file=sys.stderr)
+            return "unknown/unknown/unknown"
+        return NormalizeRemoteUrl_(repo_info["remote_url"])
+
+    # .git を直接解決できない構成の場合は git コマンドにフォールバック
     try:
         subprocess.run(["git", "--version"], capture_output=True, check=True)
     except subprocess.CalledProcessError:
@@ -113,47 +221,20 @@ def GetRepo_(path):
             check=True,
         ).stdout.strip()
 
-        # HTTPS と SSH の remote URL の差異を吸収（削除）
-        remote_url = RemovePrefix_(remote_url, "git@")
-        remote_url = RemovePrefix_(remote_url, "https://")
-        remote_url = remote_url.replace(":", "/")
-
-        # URLの末尾に.gitがなければ追加
-        if not remote_url.endswith(".git"):
-            remote_url += ".git"
-
-        return remote_url
+        return NormalizeRemoteUrl_(remote_url)
     except subprocess.CalledProcessError:
         print("Warn: failed to execute: git remote", file=sys.stderr)
         return "unknown/unknown/unknown"
 
 
-# 入力 DB の csv をファイル名でソートし MD5 を計算，その MD5 をすべて cat して MD5 を計算したものを返す
-def GetDbHash_(path):
-    csv_files_info = FindCsvFilesAndCalculateMd5_(path)
-
-    # ファイル名でソートし，MD5 を結合したのち，その MD5 を計算
-    sorted_info = sorted(csv_files_info, key=lambda x: x["filepath"])
-    concatenated_md5s = "".join(info["md5"] for info in sorted_info)
-    final_md5 = hashlib.md5(concatenated_md5s.encode()).hexdigest()
-    return final_md5
-
-
-def CalcMd5_(path):
-    # Windows 環境で改行コードが CRLF になっているとハッシュ値が変わってしまう
-    # そのため，MD5 の計算は CRLF -> LF してから行う
-    with open(path, "r", encoding="utf-8") as file:
-        content = file.read()
-    content_lf = content.replace("\r\n", "\n")
-    return hashlib.md5(content_lf.encode("utf-8")).hexdigest()
+def NormalizeRemoteUrl_(remote_url):
+    # HTTPS と SSH の remote URL の差異を吸収（削除）
+    remote_url = RemovePrefix_(remote_url, "git@")
+    remote_url = RemovePrefix_(remote_url, "https://")
+    remote_url = remote_url.replace(":", "/")
 
+    # URLの末尾に.gitがなければ追加
+    if not remote_url.endswith(".git"):
+        remote_url += ".git"
 
-def FindCsvFilesAndCalculateMd5_(path):
-    csv_files_info = []
-    for root, dirs, files in os.walk(path):
-        for name in files:
-            if name.endswith(".csv"):
-                file_path = os.path.join(root, name)
-                md5 = CalcMd5_(file_path)
-                csv_files_info.append({"filepath": file_path, "md5": md5})
-    return csv_files_info
+    return remote_url
@@ -0,0 +1,255 @@
+/**
+ * @file
+ * @brief  code-generator の opt-in の生成オプションで生成したコードが，既定の生成コードと同じ出力となるかのテスト
+ * @note   check_option_equivalence.sh から，生成オプションごとに examples/mobc とリンクしてビルド・実行される
+ *         - telemetry_definitions.c, command_definitions.c:
+ *           既定の設定で生成したもの（CODEGEN_TEST_load_default_* にリネームしてリンクする）と，同じプロセス内で
+ *           テレメのパケット，TF_tlm_len_table，コマンドテーブルを比較する
+ *         - aobc_telemetry_buffer.c:
+ *           同じパケットを AOBC_buffer_tlm_packet に与え，解析された tlm_data と中継バッファから pick up したテレメを
+ *           argv[1] のファイルに出力する．既定の設定でのビルドの出力との比較はスクリプトで行う
+ */
+#include <stdio.h>
+#include <string.h>
+#include <src_core/c2a_core_main.h>
+#include <src_core/library/endian.h>
+#include <src_core/system/time_manager/time_manager.h>
+#include <src_core/tlm_cmd/telemetry_frame.h>
+#include <src_core/tlm_cmd/command_analyze.h>
+#include <src_core/tlm_cmd/ccsds/space_packet_protocol/tlm_space_packet.h>
+#include <src_core/component_driver/cdrv_eb90_frame.h>
+#include <src_core/applications/tl_bct_digest.h>
+#include <src_user/component_driver/aocs/aobc.h>
+#include <src_user/component_driver/aocs/aobc_telemetry_buffer.h>
+#include <src_user/applications/component_service/csrv_uart_test.h>
+
+#define CODEGEN_TEST_TLM_PACKET_LEN  (4096)  //!< テレメ生成関数に与えるバッファの大きさ
+#define CODEGEN_TEST_SHORT_MAX_LEN   (10)    //!< TF_TLM_FUNC_ACK_TOO_SHORT_LEN を確認するための max_len
+#define CODEGEN_TEST_AOBC_TRIAL_NUM  (16)    //!< AOBC のテレメを受信させる回数
+
+void CODEGEN_TEST_load_default_tlm_table(TF_TlmInfo tlm_table[TF_MAX_TLMS]);
+void CODEGEN_TEST_load_default_cmd_table(CA_CmdInfo cmd_table[CA_MAX_CMDS]);
+
+static int CODEGEN_TEST_check_tlm_(void);
+static int CODEGEN_TEST_check_cmd_table_(void);
+static void CODEGEN_TEST_setup_tlm_source_(void);
+static void CODEGEN_TEST_dump_aobc_(FILE* fp);
+static CDS_ERR_CODE CODEGEN_TEST_receive_aobc_tlm_(AOBC_Driver* aobc, AOBC_TLM_CODE tlm_id);
+static uint8_t CODEGEN_TEST_rand_(void);
+
+static TF_TlmInfo CODEGEN_TEST_default_tlm_table_[TF_MAX_TLMS];
+static CA_CmdInfo CODEGEN_TEST_default_cmd_table_[CA_MAX_CMDS];
+static uint8_t CODEGEN_TEST_default_packet_[CODEGEN_TEST_TLM_PACKET_LEN];
+static uint8_t CODEGEN_TEST_packet_[CODEGEN_TEST_TLM_PACKET_LEN];
+static uint32_t CODEGEN_TEST_rand_state_ = 0x12345678;
+
+// AOBC_buffer_tlm_packet に与える EB90 Frame の受信バッファ
+static uint8_t CODEGEN_TEST_rx_frame_[CDRV_EB90_FRAME_HEADER_SIZE + CTP_MAX_LEN + CDRV_EB90_FRAME_FOOTER_SIZE];
+static CDS_StreamRecBuffer CODEGEN_TEST_rx_buffer_;
+static CDS_StreamConfig CODEGEN_TEST_stream_config_;
+static AOBC_Driver CODEGEN_TEST_aobc_;
+
+int main(int argc, char* argv[])
+{
+  int err_num = 0;
+  FILE* fp;
+
+  if (argc != 2)
+  {
+    fprintf(stderr, "usage: %s <AOBC の出力ファイル>\n", argv[0]);
+    return 2;
+  }
+
+  TMGR_init();
+  C2A_core_init();
+  CODEGEN_TEST_setup_tlm_source_();
+
+  err_num += CODEGEN_TEST_check_tlm_();
+  err_num += CODEGEN_TEST_check_cmd_table_();
+
+  fp = fopen(argv[1], "wb");
+  if (fp == NULL)
+  {
+    fprintf(stderr, "failed to open %s\n", argv[1]);
+    return 2;
+  }
+  CODEGEN_TEST_dump_aobc_(fp);
+  fclose(fp);
+
+  printf("codegen option test: %d error(s)\n", err_num);
+  return (err_num == 0) ? 0 : 1;
+}
+
+static int CODEGEN_TEST_check_tlm_(void)
+{
+  int err_num = 0;
+  int i;
+
+  CODEGEN_TEST_load_default_tlm_table(CODEGEN_TEST_default_tlm_table_);
+
+  for (i = 0; i < TF_MAX_TLMS; ++i)
+  {
+    TF_TLM_FUNC_ACK (*default_func)(uint8_t*, uint16_t*, uint16_t) = CODEGEN_TEST_default_tlm_table_[i].tlm_func;
+    TF_TLM_FUNC_ACK (*tlm_func)(uint8_t*, uint16_t*, uint16_t) = telemetry_frame->tlm_table[i].tlm_func;
+    TF_TLM_FUNC_ACK default_ack;
+    TF_TLM_FUNC_ACK ack;
+    uint16_t default_len = 0;
+    uint16_t len = 0;
+    const TF_TlmLenInfo* len_info;
+
+    if (default_func == NULL && tlm_func == NULL) continue;
+    if (default_func == NULL || tlm_func == NULL)
+    {
+      printf("TLM 0x%02x: tlm_func is registered only in one table\n", i);
+      ++err_num;
+      continue;
+    }
+
+    // パケット長を超えて書き込んでいないかも確認するため，バッファ全体を比較する
+    memset(CODEGEN_TEST_default_packet_, 0xaa, sizeof(CODEGEN_TEST_default_packet_));
+    memset(CODEGEN_TEST_packet_, 0xaa, sizeof(CODEGEN_TEST_packet_));
+    default_ack = default_func(CODEGEN_TEST_default_packet_, &default_len, sizeof(CODEGEN_TEST_default_packet_));
+    ack = tlm_func(CODEGEN_TEST_packet_, &len, sizeof(CODEGEN_TEST_packet_));
+    if (ack != default_ack || len != default_len ||
+        memcmp(CODEGEN_TEST_packet_, CODEGEN_TEST_default_packet_, sizeof(CODEGEN_TEST_packet_)) != 0)
+    {
+      printf("TLM 0x%02x: packet differs (ack %d/%d, len %d/%d)\n", i, ack, default_ack, len, default_len);
+      ++err_num;
+    }
+
+    default_ack = default_func(CODEGEN_TEST_default_packet_, &default_len, CODEGEN_TEST_SHORT_MAX_LEN);
+    ack = tlm_func(CODEGEN_TEST_packet_, &len, CODEGEN_TEST_SHORT_MAX_LEN);
+    if (ack != default_ack)
+    {
+      printf("TLM 0x%02x: ack with short max_len differs (%d/%d)\n", i, ack, default_ack);
+      ++err_num;
+    }
+
+    // TF_tlm_len_table が生成されていない場合は，常に NULL となる
+    len_info = TF_get_tlm_len_info((TLM_CODE)i);
+    if (len_info == NULL) continue;
+    default_ack = default_func(CODEGEN_TEST_default_packet_, &default_len, sizeof(CODEGEN_TEST_default_packet_));
+    if (len_info->tlm_func != tlm_func || (default_ack == TF_TLM_FUNC_ACK_SUCCESS && len_info->len != default_len))
+    {
+      printf("TLM 0x%02x: TF_tlm_len_table differs (len %d/%d)\n", i, len_info->len, default_len);
+      ++err_num;
+    }
+  }
+
+  return err_num;
+}
+
+static int CODEGEN_TEST_check_cmd_table_(void)
+{
+  int err_num = 0;
+  int i;
+
+  memset(CODEGEN_TEST_default_cmd_table_, 0x00, sizeof(CODEGEN_TEST_default_cmd_table_));
+  CODEGEN_TEST_load_default_cmd_table(CODEGEN_TEST_default_cmd_table_);
+
+  for (i = 0; i < CA_MAX_CMDS; ++i)
+  {
+    const CA_CmdInfo* default_info = &CODEGEN_TEST_default_cmd_table_[i];
+    const CA_CmdInfo* info = &command_analyze->cmd_table[i];
+
+    if (info->cmd_func != default_info->cmd_func ||
+        memcmp(info->param_size_infos, default_info->param_size_infos, sizeof(info->param_size_infos)) != 0)
+    {
+      printf("CMD 0x%04x: cmd_table differs\n", i);
+      ++err_num;
+    }
+  }
+
+  return err_num;
+}
+
+static void CODEGEN_TEST_setup_tlm_source_(void)
+{
+  TlBctDigest* digest = (TlBctDigest*)tl_bct_digest;
+  int i;
+
+  // UART_TEST のテレメは，コマンドで driver を初期化するまで NULL の受信バッファを参照する
+  Cmd_UART_TEST_INIT_CSRV(NULL);
+
+  // 配列の要素を一括でコピーする場合も確認できるように，値がすべて 0 の配列にならないようにしておく
+  for (i = 0; i < TL_BCT_DIGEST_TL_DIGEST_PAGE_SIZE; ++i)
+  {
+    digest->tl.digests[i] = (uint16_t)(0x1234 + i * 0x0101);
+  }
+  for (i = 0; i < BCT_MAX_CMD_NUM; ++i)
+  {
+    digest->bct.digests[i] = (uint16_t)(0xa1b2 + i);
+  }
+}
+
+static void CODEGEN_TEST_dump_aobc_(FILE* fp)
+{
+  // TLM DB で定義されているテレメと，定義されていないテレメ（tlm_buffer_pool_num 以下の種類）を受信させる
+  const AOBC_TLM_CODE tlm_ids[] = {AOBC_Tlm_CODE_AOBC_AOBC, AOBC_Tlm_CODE_AOBC_HK, (AOBC_TLM_CODE)0x10, (AOBC_TLM_CODE)0xfe};
+  AOBC_Driver* aobc = &CODEGEN_TEST_aobc_;
+  int trial;
+  size_t i;
+  int tlm_id;
+
+  memset(aobc, 0x00, sizeof(*aobc));
+  AOBC_init_tlm_buffer(aobc);
+  CDS_init_stream_rec_buffer(&CODEGEN_TEST_rx_buffer_, CODEGEN_TEST_rx_frame_, sizeof(CODEGEN_TEST_rx_frame_));
+  CODEGEN_TEST_stream_config_.settings.rx_buffer_ = &CODEGEN_TEST_rx_buffer_;
+
+  for (trial = 0; trial < CODEGEN_TEST_AOBC_TRIAL_NUM; ++trial)
+  {
+    for (i = 0; i < sizeof(tlm_ids) / sizeof(tlm_ids[0]); ++i)
+    {
+      CDS_ERR_CODE ret = CODEGEN_TEST_receive_aobc_tlm_(aobc, tlm_ids[i]);
+      fprintf(fp, "rx %d %d %d\n", tlm_ids[i], ret, aobc->info.comm.rx_err_code);
+    }
+
+#ifdef CODEGEN_TEST_TLM_DECODE_LAZY
+    // tlm_data は読み出されたときにパースされる
+    AOBC_get_tlm_data_aobc_aobc(aobc);
+    AOBC_get_tlm_data_aobc_hk(aobc);
+#endif
+    fwrite(&aobc->tlm_data, sizeof(aobc->tlm_data), 1, fp);
+
+    for (tlm_id = 0; tlm_id < AOBC_MAX_TLM_NUM; ++tlm_id)
+    {
+      uint16_t len = 0;
+      TF_TLM_FUNC_ACK ack;
+
+      memset(CODEGEN_TEST_packet_, 0x00, sizeof(CODEGEN_TEST_packet_));
+      ack = AOBC_pick_up_tlm_buffer(aobc, (AOBC_TLM_CODE)tlm_id, CODEGEN_TEST_packet_, &len, sizeof(CODEGEN_TEST_packet_));
+      fprintf(fp, "tlm %d %d %d\n", tlm_id, ack, len);
+      if (ack == TF_TLM_FUNC_ACK_SUCCESS) fwrite(CODEGEN_TEST_packet_, len, 1, fp);
+    }
+  }
+}
+
+static CDS_ERR_CODE CODEGEN_TEST_receive_aobc_tlm_(AOBC_Driver* aobc, AOBC_TLM_CODE tlm_id)
+{
+  CommonTlmPacket packet;
+  uint16_t len = CTP_MAX_LEN;
+  size_t i;
+
+  for (i = 0; i < sizeof(packet.packet); ++i)
+  {
+    packet.packet[i] = CODEGEN_TEST_rand_();
+  }
+  TSP_set_packet_len(&packet, len);
+  CTP_set_id(&packet, (TLM_CODE)tlm_id);
+
+  memset(CODEGEN_TEST_rx_frame_, 0x00, sizeof(CODEGEN_TEST_rx_frame_));
+  ENDIAN_memcpy(&CODEGEN_TEST_rx_frame_[CDRV_EB90_FRAME_STX_SIZE], &len, CDRV_EB90_FRAME_LEN_SIZE);
+  memcpy(&CODEGEN_TEST_rx_frame_[CDRV_EB90_FRAME_HEADER_SIZE], packet.packet, len);
+
+  aobc->info.comm.rx_err_code = AOBC_RX_ERR_CODE_OK;
+  return AOBC_buffer_tlm_packet(&CODEGEN_TEST_stream_config_, aobc);
+}
+
+static uint8_t CODEGEN_TEST_rand_(void)
+{
+  // 環境によらず同じ系列となるように，xorshift32 を使う
+  CODEGEN_TEST_rand_state_ ^= CODEGEN_TEST_rand_state_ << 13;
+  CODEGEN_TEST_rand_state_ ^= CODEGEN_TEST_rand_state_ >> 17;
+  CODEGEN_TEST_rand_state_ ^= CODEGEN_TEST_rand_state_ << 5;
+  return (uint8_t)(CODEGEN_TEST_rand_state_ >> 24);
+}
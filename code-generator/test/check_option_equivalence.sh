@@ -0,0 +1,119 @@
+#!/bin/bash
+# opt-in の生成オプションごとに examples/mobc のコードを生成し直し，check_option_equivalence.c とリンクして実行する
+# - 既定の設定で生成した telemetry_definitions.c, command_definitions.c と同じテレメ・コマンドテーブルとなること
+# - 既定の設定で生成した aobc_telemetry_buffer.c と同じパケットから同じ tlm_data, 中継テレメが得られること
+# を確認する
+# 使い方: ./test/check_option_equivalence.sh [作業ディレクトリ]（code-generator から実行する．事前に ./setup.sh が必要）
+# 終了時に，examples/mobc は既定の設定で生成し直され，settings.json は元に戻される
+# cmake の追加のオプションは環境変数 CMAKE_ARGS で指定する（例: CMAKE_ARGS="-DC2A_BUILD_FOR_32BIT=OFF"）
+
+set -eu
+
+cd "$(dirname "$0")/.."
+
+OPTIONS=(
+  tlm_analyze_coalesced
+  tlm_dispatch_table
+  tlm_buffer_pool
+  tlm_decode_lazy
+  cmd_table_const
+  tlm_packer_table
+  tlm_bulk_copy
+  tlm_len_table
+)
+
+WORK_DIR=$(realpath -m "${1:-./build_option_test}")
+TLM_CMD_DIR=../examples/mobc/src/src_user/tlm_cmd
+
+mkdir -p "$WORK_DIR"
+if [ -e settings.json ]; then
+  cp settings.json "$WORK_DIR/settings.json.bak"
+fi
+
+restore() {
+  cp ./settings_mobc.json ./settings.json
+  python GenerateC2ACode.py --force > /dev/null
+  if [ -e "$WORK_DIR/settings.json.bak" ]; then
+    mv "$WORK_DIR/settings.json.bak" settings.json
+  else
+    rm -f settings.json
+  fi
+}
+trap restore EXIT
+
+# $1: 生成オプション（default の場合は既定の設定）
+generate() {
+  local filter
+  case "$1" in
+    default)               filter='.' ;;
+    tlm_analyze_coalesced) filter='.other_obc_data[].is_tlm_analyze_coalesced = 1' ;;
+    tlm_dispatch_table)    filter='.other_obc_data[].is_tlm_dispatch_table = 1' ;;
+    tlm_buffer_pool)       filter='.other_obc_data[].tlm_buffer_pool_num = 4' ;;
+    tlm_decode_lazy)       filter='.other_obc_data[].is_tlm_decode_lazy = 1' ;;
+    cmd_table_const)       filter='.is_cmd_table_const = 1' ;;
+    tlm_packer_table)      filter='.tlm_packer_mode = "table"' ;;
+    tlm_bulk_copy)         filter='.is_tlm_bulk_copy_enabled = 1' ;;
+    tlm_len_table)         filter='.is_tlm_len_table_enabled = 1' ;;
+    *) echo "unknown option: $1"; exit 1 ;;
+  esac
+  jq "$filter" < ./settings_mobc.json > settings.json
+  python GenerateC2ACode.py --force > /dev/null
+}
+
+# $1: 生成オプション
+build_and_run() {
+  local c99=OFF
+  local lazy=OFF
+  # is_cmd_table_const は C99 でのビルドが必要
+  if [ "$1" = "cmd_table_const" ]; then
+    c99=ON
+  fi
+  if [ "$1" = "tlm_decode_lazy" ]; then
+    lazy=ON
+  fi
+
+  local build_dir="$WORK_DIR/build_c99_$c99"
+  # shellcheck disable=SC2086
+  cmake -S ./test -B "$build_dir" \
+    -DCODEGEN_TEST_DEFAULT_DIR="$WORK_DIR/default" \
+    -DCODEGEN_TEST_TLM_DECODE_LAZY="$lazy" \
+    -DC2A_BUILD_AS_C99="$c99" \
+    ${CMAKE_ARGS:-} > "$WORK_DIR/cmake_$1.log" 2>&1 || {
+    cat "$WORK_DIR/cmake_$1.log"
+    return 1
+  }
+  cmake --build "$build_dir" --target CODEGEN_OPTION_TEST -j "$(nproc)" > "$WORK_DIR/build_$1.log" 2>&1 || {
+    cat "$WORK_DIR/build_$1.log"
+    return 1
+  }
+  "$build_dir/CODEGEN_OPTION_TEST" "$WORK_DIR/aobc_$1.bin" > "$WORK_DIR/run_$1.log" || {
+    grep -v "^C2A_init:" "$WORK_DIR/run_$1.log"
+    return 1
+  }
+  tail -n 1 "$WORK_DIR/run_$1.log"
+}
+
+generate default
+mkdir -p "$WORK_DIR/default"
+cp "$TLM_CMD_DIR"/telemetry_definitions.[ch] "$TLM_CMD_DIR"/command_definitions.[ch] "$WORK_DIR/default/"
+
+echo "[default]"
+build_and_run default
+
+failed=()
+for option in "${OPTIONS[@]}"; do
+  echo "[$option]"
+  generate "$option"
+  if ! build_and_run "$option"; then
+    failed+=("$option")
+  elif ! cmp -s "$WORK_DIR/aobc_default.bin" "$WORK_DIR/aobc_$option.bin"; then
+    echo "AOBC tlm_data or relayed tlm differs from default"
+    failed+=("$option")
+  fi
+done
+
+if [ ${#failed[@]} -ne 0 ]; then
+  echo "failed: ${failed[*]}"
+  exit 1
+fi
+echo "all options are equivalent to default"
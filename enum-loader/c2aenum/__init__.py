@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from .enum_loader import C2aEnum, load_enum
+from .enum_loader import C2aEnum, C2aEnumType, load_enum
 
-__all__ = ["C2aEnum", "load_enum"]
+__all__ = ["C2aEnum", "C2aEnumType", "load_enum"]
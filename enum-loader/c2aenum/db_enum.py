@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# tlm-cmd-db の CSV から，code-generator が生成する enum を直接作る
+# 列の解釈は code-generator (my_mod/db_model.py) と同じにすること
+
+import csv
+import itertools
+import os
+
+CMD_DB_DATA_START_ROW = 3
+BCT_DB_DATA_START_ROW = 2
+
+# DB から作る enum を定義している，code-generator が生成するファイル（c2a_src_path からの相対パス）
+DB_GENERATED_FILES = (
+    "/src_user/tlm_cmd/command_definitions.h",
+    "/src_user/tlm_cmd/telemetry_definitions.h",
+    "/src_user/tlm_cmd/block_command_definitions.h",
+)
+
+
+def load_db_enums(db_settings):
+    # db_settings: code-generator の settings と同じキー
+    #   path_to_db, db_prefix, is_cmd_prefixed_in_db, input_file_encoding
+    # 戻り値: [[typedef 名, [[enum 名, 値]]]]
+    path_to_db = db_settings["path_to_db"]
+    db_prefix = db_settings["db_prefix"]
+    encoding = db_settings.get("input_file_encoding", "utf-8")
+
+    cmd_db_path = path_to_db + "CMD_DB/" + db_prefix + "_CMD_DB_"
+    return [
+        [
+            "CMD_CODE",
+            _load_cmd_enum(
+                cmd_db_path + "CMD_DB.csv", encoding, db_settings.get("is_cmd_prefixed_in_db", 0)
+            ),
+        ],
+        ["TLM_CODE", _load_tlm_enum(path_to_db + "TLM_DB/calced_data/", db_prefix, encoding)],
+        ["BC_DEFAULT_ID", _load_bct_enum(cmd_db_path + "BCT.csv", encoding)],
+    ]
+
+
+def _load_cmd_enum(path, encoding, is_cmd_prefixed_in_db):
+    sheet = _read_csv(path, encoding)
+    name_col = _find_column(sheet[0], "Name", 1)
+    code_col = _find_column(sheet[0], "Code", 3)
+
+    ret = []
+    for row in sheet[CMD_DB_DATA_START_ROW:]:
+        comment = row[0]
+        name = row[name_col]
+        if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
+            break
+        if comment != "":  # Comment
+            continue
+
+        if not is_cmd_prefixed_in_db:
+            name = "Cmd_" + name
+        ret.append([name.replace("Cmd_", "Cmd_CODE_"), _parse_enum_id(row[code_col])])
+
+    return _append_max(ret, "Cmd_CODE_MAX")
+
+
+def _load_tlm_enum(tlm_db_path, db_prefix, encoding):
+    sheet_prefix = db_prefix + "_TLM_DB_"
+    tlms = []
+    for file in sorted(os.listdir(tlm_db_path)):
+        if not file.startswith(sheet_prefix) or not file.endswith(".csv"):
+            continue
+        # TLM ID と Enable/Disable はテレメ定義の先頭 3 行にあるので，残りは読まない
+        sheet = _read_csv(tlm_db_path + file, encoding, 3)
+        if sheet[2][2] != "ENABLE":  # Enable/Disable
+            continue
+        tlm_name = file[len(sheet_prefix) : -len(".csv")]
+        tlms.append((sheet[1][2], "Tlm_CODE_" + tlm_name.upper()))  # (PacketID, enum 名)
+
+    # code-generator と同じく，DB の表記のままの TLM ID 順
+    tlms.sort(key=lambda x: x[0])
+    return _append_max([[name, _parse_enum_id(tlm_id)] for tlm_id, name in tlms], "TLM_CODE_MAX")
+
+
+def _load_bct_enum(path, encoding):
+    sheet = _read_csv(path, encoding)
+    name_col = _find_column(sheet[0], "Name", 1)
+    bc_id_col = _find_column(sheet[0], "BCID", 3)
+
+    ret = []
+    for row in sheet[BCT_DB_DATA_START_ROW:]:
+        comment = row[0]
+        name = row[name_col].replace("@@", ",")
+        if comment == "" and name == "":  # CommentもNameも空白なら打ち切り
+            break
+        if comment != "":  # Comment
+            continue
+
+        ret.append([name, _parse_enum_id(row[bc_id_col])])
+
+    return _append_max(ret, "BC_ID_MAX")
+
+
+def _append_max(members, max_name):
+    # 生成される enum の末尾の XXX_MAX は，最後の enum の次の値
+    max_id = members[-1][1] + 1 if members else 0
+    return members + [[max_name, max_id]]
+
+
+def _read_csv(path, encoding, row_num=None):
+    with open(path, encoding=encoding) as f:
+        return [[s.strip() for s in row] for row in itertools.islice(csv.reader(f), row_num)]
+
+
+def _find_column(header_row, label, default):
+    try:
+        return header_row.index(label)
+    except ValueError:
+        return default
+
+
+def _parse_enum_id(text):
+    if text[:2] == "0x":
+        return int(text, base=16)
+    return int(text, base=10)
@@ -1,14 +1,123 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import collections.abc
+import concurrent.futures
+import hashlib
+import json
 import os
 import re
 
+from .db_enum import DB_GENERATED_FILES, load_db_enums
+
+# キャッシュファイルの形式を変えた場合は上げる
+CACHE_VERSION = 2
+
+# 解析するファイルがこれより少ない場合は，プロセスの起動のほうが遅いので並列化しない
+PARALLEL_MIN_FILE_NUM = 200
+
+# 文字列リテラル，文字リテラル，/* */ コメント，// コメント を先頭から順に 1 回の走査で切り出す
+_comment_pattern = re.compile(
+    r"""
+      "(?:\\.|[^"\\\n])*"  # 文字列リテラル
+    | '(?:\\.|[^'\\\n])*'  # 文字リテラル
+    | /\*.*?(?:\*/|\Z)     # /* */ コメント
+    | //[^\n]*            # // コメント
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+
+def _replace_comment(match):
+    token = match.group(0)
+    if token[0] == "/":
+        return ""
+    return token
+
+
+class C2aEnumType:
+    # typedef enum 1 つ分の enum
+    # C2aEnumType.Cmd_CODE_NOP, c2a_enum_type["Cmd_CODE_NOP"] で値を，name_of(値) で enum 名を得る
+    def __init__(self, name, members):
+        # members: [[enum 名, 値]]．定義順
+        self.name = name
+        self.name_to_value = dict(members)
+        # 同じ値の enum が複数ある場合は，最初に定義されたもの
+        self.value_to_name = {}
+        for enum_name, enum_id in members:
+            self.value_to_name.setdefault(enum_id, enum_name)
+
+    def __getattr__(self, enum_name):
+        # name などのインスタンスの属性が優先される
+        name_to_value = self.__dict__.get("name_to_value", {})
+        if enum_name in name_to_value:
+            return name_to_value[enum_name]
+        raise AttributeError(self.__dict__.get("name", "C2aEnumType") + " has no enum " + enum_name)
+
+    def __getitem__(self, enum_name):
+        return self.name_to_value[enum_name]
+
+    def __contains__(self, enum_name):
+        return enum_name in self.name_to_value
+
+    def __iter__(self):
+        return iter(self.name_to_value)
+
+    def __len__(self):
+        return len(self.name_to_value)
+
+    def __repr__(self):
+        return "C2aEnumType(" + repr(self.name) + ", " + repr(list(self.items())) + ")"
+
+    def items(self):
+        return self.name_to_value.items()
+
+    def name_of(self, enum_id):
+        return self.value_to_name[enum_id]
+
+
+class _EnumTypes(collections.abc.Mapping):
+    # C2aEnum.enum_types．{typedef 名: C2aEnumType} の読み取り専用の mapping
+    # db_settings を指定した場合，DB から作ったものにない typedef 名の参照や，全体の走査（for, len など）で，
+    # ソースツリーの enum を読み込む（C2aEnum の属性と同じ）
+    def __init__(self, c2a_enum):
+        self._c2a_enum = c2a_enum
+        self._enum_types = {}
+
+    def __getitem__(self, type_name):
+        if type_name not in self._enum_types:
+            self._c2a_enum.load_src_enum()
+        return self._enum_types[type_name]
+
+    def __iter__(self):
+        self._c2a_enum.load_src_enum()
+        return iter(self._enum_types)
+
+    def __len__(self):
+        self._c2a_enum.load_src_enum()
+        return len(self._enum_types)
+
+    def __repr__(self):
+        return repr(self._enum_types)
+
+    def _set(self, type_name, enum_type):
+        self._enum_types[type_name] = enum_type
+
 
 class C2aEnum:
-    def __init__(self, c2a_src_path, encoding):
+    def __init__(self, c2a_src_path, encoding, cache_path=None, max_workers=None, db_settings=None):
         self.path = c2a_src_path
         self.encoding = encoding
+        # 解析結果のキャッシュファイル．None の場合はキャッシュしない
+        self.cache_path = cache_path
+        # ファイルの解析に使うプロセス数．None の場合は CPU 数．1 の場合は並列化しない
+        self.max_workers = max_workers
+        # {typedef 名: C2aEnumType}．enum は従来どおり，このインスタンスの属性としても参照できる
+        self.enum_types = _EnumTypes(self)
+        # tlm-cmd-db から CMD_CODE, TLM_CODE, BC_DEFAULT_ID を作る場合に指定する（load_db_enums を参照）
+        # 指定した場合，ソースツリーは DB にない enum が初めて参照されたときに読み込む
+        self.db_settings = db_settings
+        self.is_src_enum_loaded = False
         self.search_dirs = [
             "/src_user/",
             "/src_core/applications/",
@@ -19,41 +128,196 @@ class C2aEnum:
             "/src_core/tlm_cmd/",
         ]
 
+        if db_settings is None:
+            self.load_src_enum()
+        else:
+            self._db_enums = load_db_enums(db_settings)
+            self._set_db_enums()
+
+    def __getattr__(self, name):
+        # インスタンスの属性にない場合のみ呼ばれる
+        if name.startswith("__") or self.__dict__.get("is_src_enum_loaded", True):
+            raise AttributeError(name)
+        self.load_src_enum()
+        return getattr(self, name)
+
+    def load_src_enum(self):
+        # ソースツリーの enum を読み込む．読み込み済みの場合は何もしない
+        if self.is_src_enum_loaded:
+            return
+        self.is_src_enum_loaded = True
         self._get_all_enum()
+        # DB から作ったものを優先する
+        if self.db_settings is not None:
+            self._set_db_enums()
+
+    def _set_db_enums(self):
+        for type_name, members in self._db_enums:
+            self._set_enum_type(type_name, members)
+
+    def _set_enum_type(self, type_name, members):
+        for enum_name, enum_id in members:
+            self.__setattr__(enum_name, enum_id)
+        self.enum_types._set(type_name, C2aEnumType(type_name, members))
 
     def _get_all_enum(self):
-        for search_dir in self.search_dirs:
-            search_dir = self.path + search_dir
-
-            for root, dirs, files in os.walk(search_dir):
-                for file in files:
-                    ext = (os.path.splitext(file))[1]
-                    if ext != ".h" and ext != ".c" and ext != ".hpp" and ext != ".cpp":
-                        continue
-                    path = root + r"/" + file
-                    path = path.replace("\\", "/")
-                    enum_codes = self._search_enum_from_file(path)
-
-                    for code_lines in enum_codes:
-                        self._load_enum(code_lines)
-
-    def _search_enum_from_file(self, path):
+        cached_files = self._read_cache()
+        src_files = self._find_src_files()
+        file_infos = self._get_file_infos(
+            [(path, cached_files.get(rel_path)) for path, rel_path in src_files]
+        )
+
+        # 後から読み込んだものが優先されるように，search_dirs の順，os.walk の順に登録する
+        files = {}
+        is_cache_updated = False
+        for (path, rel_path), file_info in zip(src_files, file_infos):
+            if file_info is not cached_files.get(rel_path):
+                is_cache_updated = True
+            files[rel_path] = file_info
+
+            for type_name, members in file_info["enums"]:
+                self._set_enum_type(type_name, members)
+
+        if is_cache_updated or files.keys() != cached_files.keys():
+            self._write_cache(files)
+
+    def _find_src_files(self):
+        # 戻り値: [(path, c2a_src_path からの相対パス)]．search_dirs の順，os.walk の順
+        with concurrent.futures.ThreadPoolExecutor(len(self.search_dirs)) as executor:
+            src_files_of_dirs = list(executor.map(self._find_src_files_in_dir, self.search_dirs))
+        return [src_file for src_files in src_files_of_dirs for src_file in src_files]
+
+    def _find_src_files_in_dir(self, search_dir):
         ret = []
-        with open(path, encoding=self.encoding) as f:
-            code_lines = f.read().split("\n")
+        search_dir = self.path + search_dir
+
+        for root, dirs, files in os.walk(search_dir):
+            for file in files:
+                ext = (os.path.splitext(file))[1]
+                if ext != ".h" and ext != ".c" and ext != ".hpp" and ext != ".cpp":
+                    continue
+                path = root + r"/" + file
+                path = path.replace("\\", "/")
+                # キャッシュのキーは c2a_src_path からの相対パス
+                rel_path = path[len(self.path.replace("\\", "/")) :]
+                # DB から作る場合，生成されたファイルは解析しない
+                if self.db_settings is not None and rel_path in DB_GENERATED_FILES:
+                    continue
+                ret.append((path, rel_path))
+
+        return ret
+
+    def _get_file_infos(self, targets):
+        # targets: [(path, キャッシュされていたファイルの情報 or None)]
+        # 戻り値: targets と同じ順の，ファイルの情報
+        file_infos = [
+            cached_file if self._is_cached_file_valid(path, cached_file) else None
+            for path, cached_file in targets
+        ]
+        stale_indexes = [i for i, file_info in enumerate(file_infos) if file_info is None]
+
+        max_workers = self.max_workers or os.cpu_count() or 1
+        if max_workers > 1 and len(stale_indexes) >= PARALLEL_MIN_FILE_NUM:
+            with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+                results = list(
+                    executor.map(
+                        _get_file_info_in_worker,
+                        [(self.encoding,) + targets[i] for i in stale_indexes],
+                        chunksize=max(1, len(stale_indexes) // (max_workers * 4)),
+                    )
+                )
+        else:
+            results = [self._get_file_info(*targets[i]) for i in stale_indexes]
+
+        for i, file_info in zip(stale_indexes, results):
+            file_infos[i] = file_info
+        return file_infos
+
+    def _is_cached_file_valid(self, path, cached_file):
+        if cached_file is None:
+            return False
+        stat = os.stat(path)
+        return cached_file["size"] == stat.st_size and cached_file["mtime"] == stat.st_mtime_ns
+
+    def _get_file_info(self, path, cached_file):
+        # 戻り値: {"size", "mtime", "hash", "enums": [[typedef 名, [[enum 名, 値]]]]}
+        # size, hash が一致する場合は，ファイルを解析せずにキャッシュを使う
+        stat = os.stat(path)
+
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        if (
+            cached_file is not None
+            and cached_file["size"] == stat.st_size
+            and cached_file["hash"] == digest
+        ):
+            return dict(cached_file, mtime=stat.st_mtime_ns)
+
+        # open の universal newlines と同様に改行を揃える
+        code = data.decode(self.encoding).replace("\r\n", "\n").replace("\r", "\n")
+        enums = []
+        for type_name, code_lines in self._search_enum_from_code(code):
+            enums.append([type_name, self._load_enum(code_lines)])
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": digest, "enums": enums}
+
+    def _read_cache(self):
+        # 戻り値: このソースツリーのファイルごとの情報．キャッシュが使えない場合は空
+        cache = self._read_cache_file()
+        tree = cache["trees"].get(os.path.abspath(self.path))
+        if tree is None or tree["encoding"] != self.encoding:
+            return {}
+        return tree["files"]
 
+    def _read_cache_file(self):
+        empty_cache = {"version": CACHE_VERSION, "trees": {}}
+        if self.cache_path is None:
+            return empty_cache
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            # キャッシュが無い，壊れている場合は作り直す
+            return empty_cache
+        if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+            return empty_cache
+        return cache
+
+    def _write_cache(self, files):
+        if self.cache_path is None:
+            return
+        # 同じキャッシュファイルを使う，他のソースツリーの情報は残す
+        cache = self._read_cache_file()
+        cache["trees"][os.path.abspath(self.path)] = {"encoding": self.encoding, "files": files}
+
+        # 複数のプロセスから同時に使われても壊れないように，別ファイルに書いてから置き換える
+        tmp_path = self.cache_path + "." + str(os.getpid()) + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # キャッシュが書けなくても，enum の読み込みには影響しない
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _search_enum_from_code(self, code):
+        # 戻り値: [(typedef 名, enum の中身の行)]
+        ret = []
+        code_lines = code.split("\n")
         code_lines = self._delete_multiline_comment(code_lines)
         code_lines = self._delete_preprocessor(code_lines)
 
         p_enum_begin = re.compile(r"^ *typedef +enum")
-        p_enum_end = re.compile(r"^ *} +\w+")
+        p_enum_end = re.compile(r"^ *} +(\w+)")
 
         is_in_enum = False
         enum = []
         for line in code_lines:
             if is_in_enum:
-                if p_enum_end.search(line):
-                    ret.append(enum)
+                m_enum_end = p_enum_end.search(line)
+                if m_enum_end:
+                    ret.append((m_enum_end.group(1), enum))
                     enum = []
                     is_in_enum = False
                 else:
@@ -70,31 +334,18 @@ class C2aEnum:
 
     def _delete_multiline_comment(self, code_lines):
         # TODO: #if 0 - #endif のものはのこってしまう．
+        # /* */ と // のコメントを削除する．文字列リテラル，文字リテラル中のものはコメントとみなさない
+        # /* */ は改行も含めて削除する（閉じられていない場合はファイル末尾まで）．// は改行の手前まで削除する
         code = "\n".join(code_lines)
-        ret = ""
-        pre = " "
-        is_in_comment = False
-        for char in code:
-            if is_in_comment:
-                if pre == "*" and char == "/":
-                    is_in_comment = False
-            else:
-                if pre == "/" and char == "*":
-                    is_in_comment = True
-                    # 前の1文字を削除
-                    ret = ret[:-1]
-                else:
-                    ret += char
-
-            pre = char
-
-        return ret.split("\n")
+        return _comment_pattern.sub(_replace_comment, code).split("\n")
 
     def _load_enum(self, code_lines):
         # TODO: ここの最初の 2 空白については要議論
         p_with_id = re.compile(r"^  (\w+) += +(\w+)")
         p_without_id = re.compile(r"^  (\w+)")
 
+        # 戻り値: [[enum 名, 値]]
+        ret = []
         last_enum_id = -1
         for line in code_lines:
             m_with_id = p_with_id.search(line)
@@ -114,12 +365,24 @@ class C2aEnum:
             else:
                 enum_id = int(enum_id, base=10)
 
-            self.__setattr__(enum_name, enum_id)
+            ret.append([enum_name, enum_id])
             last_enum_id = enum_id
 
+        return ret
+
+
+def _get_file_info_in_worker(args):
+    # ProcessPoolExecutor で実行する．enum を読み込まずに C2aEnum を作り，ファイルの解析だけを行う
+    encoding, path, cached_file = args
+    c2a_enum = C2aEnum.__new__(C2aEnum)
+    c2a_enum.encoding = encoding
+    return c2a_enum._get_file_info(path, cached_file)
+
 
-def load_enum(c2a_src_path, encoding) -> C2aEnum:
-    c2a_enum = C2aEnum(c2a_src_path, encoding)
+def load_enum(
+    c2a_src_path, encoding, cache_path=None, max_workers=None, db_settings=None
+) -> C2aEnum:
+    c2a_enum = C2aEnum(c2a_src_path, encoding, cache_path, max_workers, db_settings)
     return c2a_enum
 
 
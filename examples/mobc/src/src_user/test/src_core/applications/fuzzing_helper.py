@@ -236,6 +236,14 @@ def get_all_cmd_codes_from_enum(c2a_enum):
         dict: {cmd_name: cmd_code} 형태의 딕셔너리
     """
     cmd_codes = {}
+    # typedef 별 enum 테이블이 있으면 dir() 스캔 없이 CMD_CODE 를 바로 사용
+    enum_types = getattr(c2a_enum, 'enum_types', {})
+    if 'CMD_CODE' in enum_types:
+        for attr_name, cmd_code in sorted(enum_types['CMD_CODE'].items()):
+            if attr_name.startswith('Cmd_CODE_'):
+                cmd_codes[attr_name.replace('Cmd_CODE_', '')] = cmd_code
+        return cmd_codes
+
     for attr_name in dir(c2a_enum):
         if attr_name.startswith('Cmd_CODE_'):
             cmd_name = attr_name.replace('Cmd_CODE_', '')
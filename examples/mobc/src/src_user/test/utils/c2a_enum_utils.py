@@ -16,4 +16,5 @@ def get_c2a_enum():
             os.path.dirname(__file__).replace("\\", "/") + "/../" + json_dict["c2a_src_rel_path"]
         )
 
-    return c2a.load_enum(c2a_src_abs_path, "utf-8")
+    # 環境変数が設定されている場合は，そのファイルに解析結果をキャッシュし，変更されたファイルのみ解析し直す
+    return c2a.load_enum(c2a_src_abs_path, "utf-8", os.environ.get("C2A_ENUM_CACHE_PATH"))
@@ -22,15 +22,38 @@ TF_TLM_FUNC_ACK TF_generate_contents(TLM_CODE tlm_id,
                                      uint16_t max_len)
 {
   TF_TLM_FUNC_ACK (*tlm_func)(uint8_t*, uint16_t*, uint16_t) = telemetry_frame->tlm_table[tlm_id].tlm_func;
+  const TF_TlmLenInfo* len_info;
 
-  if (tlm_func != NULL)
+  if (tlm_func == NULL)
   {
-    return tlm_func(packet, len, max_len);
+    return TF_TLM_FUNC_ACK_NOT_DEFINED;
   }
-  else
+
+  // 長さが既知であれば，tlm_func を呼ぶ前に弾く
+  len_info = TF_get_tlm_len_info(tlm_id);
+  if (len_info != NULL && len_info->len > max_len)
   {
-    return TF_TLM_FUNC_ACK_NOT_DEFINED;
+    return TF_TLM_FUNC_ACK_TOO_SHORT_LEN;
   }
+
+  return tlm_func(packet, len, max_len);
+}
+
+const TF_TlmLenInfo* TF_get_tlm_len_info(TLM_CODE tlm_id)
+{
+#ifdef TLM_LEN_TABLE_ENABLED
+  const TF_TlmLenInfo* len_info;
+
+  if (tlm_id >= TLM_CODE_MAX) return NULL;
+  len_info = &TF_tlm_len_table[tlm_id];
+  if (len_info->tlm_func == NULL) return NULL;
+  // Cmd_TF_REGISTER_TLM などで別の tlm_func が登録されている場合は，長さは不明
+  if (len_info->tlm_func != telemetry_frame->tlm_table[tlm_id].tlm_func) return NULL;
+  return len_info;
+#else
+  (void)tlm_id;
+  return NULL;
+#endif
 }
 
 void TF_initialize(void)
@@ -37,6 +37,26 @@ typedef struct
   TF_TLM_FUNC_ACK (*tlm_func)(uint8_t*, uint16_t*, uint16_t);   //!< tlm packet の中身を生成する関数
 } TF_TlmInfo;
 
+/**
+ * @struct TF_TlmLenInfo
+ * @brief  tlm_func を呼ばずに得られる，tlm の固定長の情報
+ * @note   code-generator が TLM DB から生成する（settings の is_tlm_len_table_enabled）
+ */
+typedef struct
+{
+  TF_TLM_FUNC_ACK (*tlm_func)(uint8_t*, uint16_t*, uint16_t);   //!< この情報に対応する tlm_func
+  uint16_t len;                                                 //!< 生成される tlm packet 長
+  uint16_t field_num;                                           //!< tlm の要素数
+} TF_TlmLenInfo;
+
+#ifdef TLM_LEN_TABLE_ENABLED
+/**
+ * @brief  Tlm ID ごとの TF_TlmLenInfo
+ * @note   定義は /src_user/tlm_cmd/telemetry_definitions.c にある
+ */
+extern const TF_TlmLenInfo TF_tlm_len_table[TLM_CODE_MAX];
+#endif
+
 /**
  * @struct TelemetryFrame
  * @brief  TelemetryFrame の Info 構造体
@@ -70,6 +90,17 @@ TF_TLM_FUNC_ACK TF_generate_contents(TLM_CODE tlm_id,
                                      uint16_t* len,
                                      uint16_t max_len);
 
+/**
+ * @brief  tlm_func を呼ばずに，テレメの固定長の情報を取得する
+ * @note   テレメトリマネージャでのダウンリンク量の見積もりなどに使う
+ * @param[in]  tlm_id: Tlm ID
+ * @return 固定長の情報．以下の場合は NULL
+ *         - 固定長の情報が生成されていない（TLM_LEN_TABLE_ENABLED でない）
+ *         - 定義されていないテレメ
+ *         - 固定長の情報と異なる tlm_func が登録されている（Cmd_TF_REGISTER_TLM など）
+ */
+const TF_TlmLenInfo* TF_get_tlm_len_info(TLM_CODE tlm_id);
+
 /**
  * @brief  Tlm Tableのロード
  * @note   定義は /src_user/tlm_cmd/telemetry_definitions.c にある